@@ -25,6 +25,9 @@
 
 from shutil import rmtree, copy
 from aflcov import *
+from tempfile import NamedTemporaryFile
+import importlib.machinery
+import importlib.util
 import unittest
 import time
 import signal
@@ -119,6 +122,53 @@ class TestAflCov(unittest.TestCase):
                 in ''.join(self.do_cmd("%s --line-search 1234" % (self.afl_cov_cmd))),
                 "--afl-fuzzing-dir missing from --line-search mode")
 
+    def parse_tracefile(self, content):
+        ### Tracefile of the afl-cov script itself, aflcov.py predates it
+        loader = importlib.machinery.SourceFileLoader('afl_cov',
+                self.afl_cov_cmd)
+        afl_cov = importlib.util.module_from_spec(
+                importlib.util.spec_from_loader('afl_cov', loader))
+        loader.exec_module(afl_cov)
+        with NamedTemporaryFile('w', suffix='.info') as f:
+            f.write(content)
+            f.flush()
+            return afl_cov.Tracefile.parse(f.name)
+
+    def test_tracefile_lcov2(self):
+        ### lcov >= 2.0 writes FN:<start>,<end>,<name>, lcov >= 2.2 writes
+        ### FNL:<index>,<start>,<end> and FNA:<index>,<count>,<name>
+        trace = self.parse_tracefile("TN:\nSF:/src/a.c\n"
+                "FN:3,9,main\nFN:11,14,add(int, int)\n"
+                "FNDA:1,main\nFNDA:0,add(int, int)\nFNF:2\nFNH:1\n"
+                "DA:3,1\nDA:4,1\nDA:11,0\nDA:12,0\nLF:4\nLH:2\n"
+                "end_of_record\n"
+                "SF:/src/b.c\nFNL:0,5,7\nFNA:0,2,helper\n"
+                "DA:6,0\nDA:5,2\nend_of_record\n")
+        self.assertEqual(trace.files['/src/a.c']['function'],
+                {'main': [3, 1], 'add(int, int)': [11, 0]})
+        self.assertEqual(trace.files['/src/b.c']['function'],
+                {'helper': [5, 2]})
+        self.assertEqual(trace.hit('/src/a.c'),
+                {'line': {3, 4}, 'function': {'main()'}})
+        self.assertEqual(trace.hit('/src/b.c'),
+                {'line': {5}, 'function': {'helper()'}})
+        self.assertEqual(trace.zero_cov()['/src/a.c'],
+                {'line': {11, 12}, 'function': {'add(int, int)()'}})
+        totals = trace.totals()
+        self.assertEqual((totals['line']['count'], totals['line']['total']),
+                (3, 6))
+        self.assertEqual((totals['function']['count'],
+                totals['function']['total']), (2, 3))
+
+        ### merged with the lcov 1.x tracefile of another run
+        trace.merge(self.parse_tracefile("TN:\nSF:/src/a.c\n"
+                "FN:11,add(int, int)\nFNDA:2,add(int, int)\n"
+                "DA:11,2\nDA:13,1\nend_of_record\n"))
+        self.assertEqual(trace.files['/src/a.c']['function'],
+                {'main': [3, 1], 'add(int, int)': [11, 2]})
+        self.assertEqual(trace.hit('/src/a.c'),
+                {'line': {3, 4, 11, 13}, 'function': {'main()', 'add(int, int)()'}})
+
     def test_live_parallel(self):
 
         if not self.live_init():
@@ -0,0 +1,49 @@
+'''
+datatype.Bitmap and evaluator.AFLBitmap operations
+'''
+from rcfuzz.datatype import Bitmap
+from rcfuzz.evaluator import AFLBitmap
+
+from conftest import virgin_bits
+
+
+def bench_bitmap_construct(benchmark, bitmap_pair):
+    a, _ = bitmap_pair
+    benchmark(Bitmap, a)
+
+
+def bench_bitmap_load(benchmark, bitmap_pair, tmp_path):
+    path = tmp_path / 'bitmap'
+    Bitmap(bitmap_pair[0]).save(path, 1)
+    benchmark(Bitmap, bitmap_path=path)
+
+
+def bench_bitmap_count(benchmark, bitmap_pair):
+    a = Bitmap(bitmap_pair[0])
+    benchmark(a.count)
+
+
+def bench_bitmap_delta(benchmark, bitmap_pair):
+    a, b = Bitmap(bitmap_pair[0]), Bitmap(bitmap_pair[1])
+    benchmark(a.delta, b)
+
+
+def bench_bitmap_union(benchmark, bitmap_pair):
+    a, b = Bitmap(bitmap_pair[0]), Bitmap(bitmap_pair[1])
+    benchmark(a.union, b)
+
+
+def bench_bitmap_intersect(benchmark, bitmap_pair):
+    a, b = Bitmap(bitmap_pair[0]), Bitmap(bitmap_pair[1])
+    benchmark(a.intersect, b)
+
+
+def bench_aflbitmap_normalize(benchmark, edges):
+    raw = virgin_bits(edges)
+    # includes the bytes to array conversion done for every trace
+    benchmark(AFLBitmap, raw)
+
+
+def bench_aflbitmap_has_new_bits(benchmark, bitmap_pair):
+    a, b = AFLBitmap(bitmap_pair[0]), AFLBitmap(bitmap_pair[1])
+    benchmark(a.has_new_bits, b)
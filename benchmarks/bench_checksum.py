@@ -0,0 +1,20 @@
+'''
+test case checksums, the memo is cleared so every round hashes the file
+'''
+from rcfuzz import evaluator, sync
+
+
+def bench_sync_checksum(benchmark, seed_file):
+    def run():
+        sync.hashmap.clear()
+        return sync.checksum(seed_file)
+
+    benchmark(run)
+
+
+def bench_evaluator_checksum(benchmark, seed_file):
+    def run():
+        evaluator.hashmap.clear()
+        return evaluator.checksum(seed_file)
+
+    benchmark(run)
@@ -0,0 +1,23 @@
+'''
+crash triage: ASAN report parsing and bug hashes
+'''
+from rcfuzz import evaluator
+
+
+def bench_parse_asan(benchmark, asan_log):
+    benchmark(evaluator.parse_asan, asan_log)
+
+
+def bench_hash_trace(benchmark, asan_log):
+    trace = evaluator.parse_asan(asan_log)['trace']
+    benchmark(evaluator.hash_trace, trace)
+
+
+def bench_hash_trace3(benchmark, asan_log):
+    trace = evaluator.parse_asan(asan_log)['trace']
+    benchmark(evaluator.hash_trace3, trace)
+
+
+def bench_hash_ip(benchmark, asan_log):
+    trace = evaluator.parse_asan(asan_log)['trace']
+    benchmark(evaluator.hash_ip, trace)
@@ -0,0 +1,78 @@
+'''
+synthetic inputs shaped like the ones the scheduler and evaluator handle
+'''
+import numpy as np
+import pytest
+
+from rcfuzz.datatype import Bitmap
+
+MAP_SIZE = Bitmap.BITMAP_SIZE
+
+# edges hit by a fuzzer, from a fresh target to a long campaign
+EDGES = [5000, 50000]
+
+ASAN_FRAMES = 40
+
+
+def sparse_map(edges, seed=0) -> np.ndarray:
+    '''
+    normalized map (0/1) with edges set, like eval/<fuzzer>/bitmap
+    '''
+    rng = np.random.default_rng(seed)
+    bitmap = np.zeros(MAP_SIZE, dtype='uint8')
+    bitmap[rng.choice(MAP_SIZE, size=edges, replace=False)] = 1
+    return bitmap
+
+
+def virgin_bits(edges, seed=0) -> bytes:
+    '''
+    AFL virgin_bits: 0xff for untouched edges, cleared bits elsewhere
+    '''
+    rng = np.random.default_rng(seed)
+    bitmap = np.full(MAP_SIZE, 0xff, dtype='uint8')
+    bitmap[rng.choice(MAP_SIZE, size=edges,
+                      replace=False)] = rng.integers(0, 0xff, size=edges)
+    return bitmap.tobytes()
+
+
+@pytest.fixture(params=EDGES, ids=lambda edges: f'{edges}edges')
+def edges(request):
+    return request.param
+
+
+@pytest.fixture
+def bitmap_pair(edges):
+    # two fuzzers sharing about half of their edges
+    a = sparse_map(edges, seed=1)
+    b = sparse_map(edges // 2, seed=2) | sparse_map(edges // 2, seed=1)
+    return a, b
+
+
+@pytest.fixture(params=[1024, 1024 * 1024], ids=['1KiB', '1MiB'])
+def seed_file(request, tmp_path):
+    path = tmp_path / 'id:000000,orig:seed'
+    path.write_bytes(np.random.default_rng(0).bytes(request.param))
+    return str(path)
+
+
+@pytest.fixture
+def asan_log(tmp_path):
+    '''
+    stderr of an ASAN build run with evaluator.ASAN_OPTIONS
+    '''
+    lines = [
+        '=================================================================\n',
+        '==4242==ERROR: AddressSanitizer: heap-buffer-overflow on address '
+        '0x602000000011 at pc 0x0000004f1c2a bp 0x7ffd5b7e8f30 '
+        'sp 0x7ffd5b7e8f28\n',
+        'READ of size 1 at 0x602000000011 thread T0\n',
+    ]
+    for i in range(ASAN_FRAMES):
+        lines.append(f'####0x{0x4f1c2a + i * 0x40:x}####parse_chunk_{i}'
+                     f'####/src/target/lib/parse_{i % 7}.c:{100 + i}:13'
+                     f'####{i}####\n')
+    lines.append('SUMMARY: AddressSanitizer: heap-buffer-overflow '
+                 '/src/target/lib/parse_0.c:100:13 in parse_chunk_0\n')
+    path = tmp_path / 'crash.stderr'
+    path.write_text(''.join(lines))
+    return str(path)
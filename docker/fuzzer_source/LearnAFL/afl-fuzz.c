@@ -57,8 +57,8 @@
 #include <sys/mman.h>
 #include <sys/ioctl.h>
 #include <sys/file.h>
-
-#include <python2.7/Python.h>
+#include <sys/socket.h>
+#include <sys/un.h>
 
 #if defined(__APPLE__) || defined(__FreeBSD__) || defined (__OpenBSD__)
 #  include <sys/sysctl.h>
@@ -89,6 +89,7 @@ EXP_ST u8 *in_dir,                    /* Input directory with test cases  */
           *out_dir,                   /* Working & output directory       */
           *knowledge_file_name,       /* Name of knowledge file           */
           *time_file_name,            /* Name of time file                */
+          *learning_sock_name,        /* Learning engine daemon socket    */
           *information_file_name,     /* Information file name            */
           *execution_file_name,       /* Execution file name              */
           *sync_dir,                  /* Synchronization directory        */
@@ -133,7 +134,8 @@ EXP_ST u8  skip_deterministic,        /* Skip deterministic stages?       */
            deferred_mode,             /* Deferred forkserver mode?        */
            fast_cal,                  /* Try to calibrate faster?         */
            knowledge_res,             /* Result of running target         */
-           knowledge_hnb;             /* Result of finding new path       */
+           knowledge_hnb,             /* Result of finding new path       */
+           knowledge_streamed;        /* Knowledge sent (1) or lost (2)?  */
 
 static s32 out_fd,                    /* Persistent fd for out_file       */
            dev_urandom_fd = -1,       /* Persistent fd for /dev/urandom   */
@@ -143,6 +145,7 @@ static s32 out_fd,                    /* Persistent fd for out_file       */
            information_fd,            /* Persistent fd for out-file       */
            execution_fd,              /* Persistent fd for execution      */
            knowledge_fd,              /* Fd for knowledge                 */
+           learning_fd = -1,          /* Connection to learning engine    */
            time_fd,                   /* Fd for time                      */
            model_fd;                  /* Fd for model                     */
 
@@ -899,6 +902,7 @@ static u32 determine_whether_to_mutate(u32* begin_index, u32* end_index, u32 len
 static void read_model_files(u8* mname);
 static void setup_knowledge_dirs_fds(void);
 static void write_to_information_file(u8* items_name);
+static u8 learning_send(u8* buf, u32 len);
 
 /* Calculate length of string */
 static u32 calculate_length(char *str){
@@ -939,6 +943,8 @@ static void skip_generate_model(struct queue_entry* q){
 
   PyRun_SimpleString("import os.system");
 */
+  if (knowledge_streamed == 1) learning_send("skip\n", 5);
+
   ACTF("Deleting knowledge files.");
   commanding = ck_alloc((10+calculate_length(knowledge_file_name))*sizeof(u8));
   sprintf(commanding, "rm %s", knowledge_file_name);
@@ -954,6 +960,100 @@ static void skip_generate_model(struct queue_entry* q){
   setup_knowledge_dirs_fds();
 
 }
+/* Start the learning engine daemon, it keeps models in memory and takes
+   the knowledge records as they are made. Until it listens, the records go
+   to the knowledge file and generate_model() runs the script on it. */
+static void setup_learning_engine(void) {
+
+  u8* cmd;
+
+  if (getenv("AFL_NO_LEARNING_DAEMON")) return;
+
+  learning_sock_name = alloc_printf("%s/learning_engine.sock", out_dir);
+  unlink(learning_sock_name);
+
+  cmd = alloc_printf("learning_engine.py --daemon %s %d >/dev/null 2>&1 &",
+                     learning_sock_name, getpid());
+  if (system(cmd)) WARNF("Unable to start the learning engine daemon.");
+  ck_free(cmd);
+
+}
+
+/* Connect to the learning engine daemon. Returns 0 while it is not
+   listening yet. */
+static u8 learning_connect(void) {
+
+  struct sockaddr_un addr;
+
+  if (learning_fd >= 0) return 1;
+  if (!learning_sock_name) return 0;
+
+  learning_fd = socket(AF_UNIX, SOCK_STREAM, 0);
+  if (learning_fd < 0) return 0;
+
+  memset(&addr, 0, sizeof(addr));
+  addr.sun_family = AF_UNIX;
+  strncpy(addr.sun_path, (char*)learning_sock_name, sizeof(addr.sun_path) - 1);
+
+  if (connect(learning_fd, (struct sockaddr*)&addr, sizeof(addr))) {
+    close(learning_fd);
+    learning_fd = -1;
+    return 0;
+  }
+
+  return 1;
+
+}
+
+/* Send to the learning engine daemon, the connection is dropped if it
+   went away. */
+static u8 learning_send(u8* buf, u32 len) {
+
+  s32 r;
+
+  while (len) {
+    r = send(learning_fd, buf, len, MSG_NOSIGNAL);
+    if (r <= 0) {
+      close(learning_fd);
+      learning_fd = -1;
+      return 0;
+    }
+    buf += r;
+    len -= r;
+  }
+
+  return 1;
+
+}
+
+/* Ask the learning engine daemon for the model of the streamed knowledge.
+   Returns 1 once the model file is up to date. */
+static u8 request_model(struct queue_entry* q) {
+
+  u8 reply[16];
+  s32 n = 0, r;
+
+  if (knowledge_streamed != 1 || !learning_send("end\n", 4)) return 0;
+
+  /* The reply only comes after the model is written. */
+  while (n < sizeof(reply) - 1) {
+    r = read(learning_fd, reply + n, sizeof(reply) - 1 - n);
+    if (r <= 0) break;
+    n += r;
+    if (memchr(reply, '\n', n)) break;
+  }
+  reply[n] = 0;
+
+  if (strcmp((char*)reply, "ok\n")) {
+    close(learning_fd);
+    learning_fd = -1;
+    return 0;
+  }
+
+  return 1;
+
+}
+
 /* Execve python script to generate model. */
 static void generate_model(struct queue_entry* q){
   u8 *commanding;
@@ -983,12 +1083,18 @@ static void generate_model(struct queue_entry* q){
 
   if ((tm_now = localtime(&now_time)) == NULL) PFATAL("Unable to transfer seconds to local time.");
 
-  commanding = ck_alloc((45+calculate_length(knowledge_file_name)+calculate_length(q->mname)+calculate_length(time_file_name))*sizeof(u8));
-  sprintf(commanding, "learning_engine.py %s %s %s", knowledge_file_name, q->mname, time_file_name);
-  system(commanding);
+  if (knowledge_streamed) {
+    /* A lost stream keeps the last model. */
+    request_model(q);
+    unlink(knowledge_file_name);
+  } else {
+    commanding = ck_alloc((45+calculate_length(knowledge_file_name)+calculate_length(q->mname)+calculate_length(time_file_name))*sizeof(u8));
+    sprintf(commanding, "learning_engine.py %s %s %s", knowledge_file_name, q->mname, time_file_name);
+    system(commanding);
+    ck_free(commanding);
+  }
   q->has_model = 1;
 
-  ck_free(commanding);
   ck_free(knowledge_file_name);
   setup_knowledge_dirs_fds();
 
@@ -2744,11 +2850,26 @@ static u8 run_target(char** argv, u32 timeout) {
 
 }
 
-/* Write information to knowledge output file*/
+/* Write information to knowledge output file, or stream it to the learning
+   engine daemon once it listens */
 static void write_to_knowledge_file( u8* items_name, u8* str, s32 length) {
 
+  u8 header[64], *begin;
+
   if(!strcmp(items_name,"Seed")){
 
+    knowledge_streamed = 0;
+
+    if (learning_connect()) {
+      begin = alloc_printf("begin %s %s\nseed %u %d\n", queue_cur->mname,
+                           time_file_name, queue_cur->exec_cksum, length);
+      if (learning_send(begin, strlen((char*)begin)) && learning_send(str, length))
+        knowledge_streamed = 1;
+      ck_free(begin);
+      /* Nothing of this round is in the file yet, fall back to it. */
+      if (knowledge_streamed) return;
+    }
+
     fprintf(knowledge_file, "%s:", items_name);
 
     ck_write(knowledge_fd, str, length, knowledge_file_name);
@@ -2758,14 +2879,24 @@ static void write_to_knowledge_file( u8* items_name, u8* str, s32 length) {
   }
 
   else {
+    temp_cksum = hash32(trace_bits, MAP_SIZE, HASH_CONST);
+
+    if (knowledge_streamed) {
+      /* Once the stream is lost, the rest of the round is dropped. */
+      if (knowledge_streamed != 1) return;
+      sprintf((char*)header, "case %d %d %u %d\n", knowledge_res, knowledge_hnb,
+              temp_cksum, length);
+      if (!learning_send(header, strlen((char*)header)) ||
+          !learning_send(str, length)) knowledge_streamed = 2;
+      return;
+    }
+
     fprintf(knowledge_file, "Stage name:%s\n", stage_name);
 
     fprintf(knowledge_file, "%s:", items_name);
 
     ck_write(knowledge_fd, str, length, knowledge_file_name);
 
-    temp_cksum = hash32(trace_bits, MAP_SIZE, HASH_CONST);
-
     fprintf(knowledge_file, "\nFault case:%d\nFinding:%d\nCksum:%u\n", knowledge_res, knowledge_hnb, temp_cksum);
 
   }
@@ -9152,6 +9283,7 @@ int main(int argc, char** argv) {
 
   setup_dirs_fds();
   setup_knowledge_dirs_fds();
+  setup_learning_engine();
   setup_information_fds();
   setup_execution_fds();
   setup_time_fds();
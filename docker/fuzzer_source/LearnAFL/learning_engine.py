@@ -1,9 +1,9 @@
-#!/usr/bin/env python2
+#!/usr/bin/env python3
 import os
 import sys
 import math
 import time
-from _weakrefset import WeakSet
+import socketserver
 
 MAXCACULATE = 250000000
 HardCode = {}
@@ -12,11 +12,18 @@ NewFault = []
 LengthCount = {}
 Process = []
 Finding = []
-Paths = []
+Paths = set()
 Matrix = []
 current_time = time.time()
 time_out = 0
 
+#Knowledge and model files hold raw test case bytes.
+FILE_ENCODING = 'latin-1'
+#Models kept in memory by the daemon, model file name => PathInformation.
+Models = {}
+#Text last written to each model file.
+Snapshots = {}
+
 #Defining data struct to store data nodes.
 class PathInformation:
     minLength = 0
@@ -93,9 +100,9 @@ class PathInformation:
             tempPos = []
             lastReg = self.reg
             lastPos = self.pos
-            print "[*] Getting format."
+            print("[*] Getting format.")
             if self.nums * self.maxLength * self.maxLength > MAXCACULATE:
-                tempNum = MAXCACULATE / (self.maxLength * self.maxLength)
+                tempNum = MAXCACULATE // (self.maxLength * self.maxLength)
                 tempReg, tempPos = get_format(self.testcases[0:tempNum])
             else:
                 tempReg, tempPos = get_format(self.testcases)
@@ -142,8 +149,7 @@ def get_hardcode(testcases):
     return hardcode
 
 def splice_testcases(testcases, hardcode):
-    order1 = hardcode.keys()
-    order1.sort()
+    order1 = sorted(hardcode.keys())
     order2 = []
     for i in order1:
         order2.append(i+len(hardcode[i]))
@@ -190,53 +196,153 @@ def get_dictionary(strings):
         j += 1
     return  dic
 
-def get_subString(s1, s2, dic):
-    i = 0
-    subString = []
-    while i < len(s1):
-        flag = False
-        j = 0
-        maxLength = 0
-        maxString = ''
-        while j < len(s2):
-            tempString = ''
-            k = 0
-            while (i + k < len(s1) and j + k < len(s2) and s1[i+k] == s2[j + k] and s1[i + k] in dic):
-                flag = True
-                tempString += s1[i + k]
-                k += 1
-            if k > maxLength:
-                maxLength = k
-                maxString = tempString
+#Suffix automaton of a string, every substring of it is a path from state 0.
+class SuffixAutomaton:
+    def __init__(self, s):
+        self.next = [{}]
+        self.link = [-1]
+        self.length = [0]
+        #End position of the first occurrence of the strings of a state
+        self.first = [-1]
+        #End position of the last occurrence of the strings of a state
+        self.last = [-1]
+        last = 0
+        for i in range(0, len(s)):
+            c = s[i]
+            cur = self.add_state(self.length[last] + 1, i, i)
+            p = last
+            while p != -1 and c not in self.next[p]:
+                self.next[p][c] = cur
+                p = self.link[p]
+            if p == -1:
+                self.link[cur] = 0
+            else:
+                q = self.next[p][c]
+                if self.length[p] + 1 == self.length[q]:
+                    self.link[cur] = q
+                else:
+                    clone = self.add_state(self.length[p] + 1, self.first[q])
+                    self.next[clone] = dict(self.next[q])
+                    self.link[clone] = self.link[q]
+                    while p != -1 and self.next[p].get(c) == q:
+                        self.next[p][c] = clone
+                        p = self.link[p]
+                    self.link[q] = clone
+                    self.link[cur] = clone
+            last = cur
+        #A state also ends wherever the states linking to it end.
+        for v in sorted(range(1, len(self.length)), key=lambda v: -self.length[v]):
+            if self.last[v] > self.last[self.link[v]]:
+                self.last[self.link[v]] = self.last[v]
+        self.s = s
+
+    #lastEnd is left -1 for clones, they only end where the states linking
+    #to them end.
+    def add_state(self, length, first, lastEnd=-1):
+        self.next.append({})
+        self.link.append(-1)
+        self.length.append(length)
+        self.first.append(first)
+        self.last.append(lastEnd)
+        return len(self.length) - 1
+
+    #Longest prefix of t[i:] that is a substring of s[offset:], and where it
+    #first starts there
+    def longest_prefix(self, t, i, offset=0):
+        v = 0
+        k = 0
+        while i + k < len(t):
+            u = self.next[v].get(t[i + k])
+            if u is None or self.last[u] - k < offset:
+                break
+            v = u
+            k += 1
+        start = self.first[v] - k + 1
+        if k != 0 and start < offset:
+            start = self.s.find(t[i:i + k], offset)
+        return k, start
+
+    #For every start i of t, the longest prefix of t[i:] that is a substring
+    #and where it first starts, in one pass over t
+    def longest_prefixes(self, t):
+        ends = []
+        v = 0
+        l = 0
+        for e in range(0, len(t)):
+            while v != 0 and t[e] not in self.next[v]:
+                v = self.link[v]
+                l = self.length[v]
+            if t[e] in self.next[v]:
+                v = self.next[v][t[e]]
+                l += 1
+            ends.append((l, v))
+        result = []
+        e = -1
+        for i in range(0, len(t)):
+            #The longest match starting at i ends at the last e whose longest
+            #match starts at i or before it.
+            if e < i - 1:
+                e = i - 1
+            while e + 1 < len(t) and e + 1 - ends[e + 1][0] < i:
+                e += 1
+                u = ends[e][1]
+            k = e - i + 1
             if k == 0:
-                j += 1
+                result.append((0, -1))
+                continue
+            while self.length[self.link[u]] >= k:
+                u = self.link[u]
+            result.append((k, self.first[u] - k + 1))
+        return result
+
+    #For every end position e of t, the length of the longest suffix of
+    #t[:e+1] that is a substring. Characters not in allowed never match.
+    def matching_lengths(self, t, allowed=None):
+        result = [0] * len(t)
+        v = 0
+        l = 0
+        for e in range(0, len(t)):
+            c = t[e]
+            if allowed is not None and c not in allowed:
+                v = 0
+                l = 0
+                continue
+            while v != 0 and c not in self.next[v]:
+                v = self.link[v]
+                l = self.length[v]
+            if c in self.next[v]:
+                v = self.next[v][c]
+                l += 1
             else:
-                j += k
+                v = 0
+                l = 0
+            result[e] = l
+        return result
 
-        if flag == False:
+#Splitting s1 greedily into the longest substrings (of characters in dic)
+#that also occur in s2, in linear time.
+def get_subString(s1, s2, dic):
+    #Longest match starting at s1[i] is the longest match ending at the
+    #mirrored position when both strings are reversed.
+    reversed1 = s1[::-1]
+    lengths = SuffixAutomaton(s2[::-1]).matching_lengths(reversed1, set(dic))
+    n = len(s1)
+    i = 0
+    subString = []
+    while i < n:
+        maxLength = lengths[n - 1 - i]
+        if maxLength == 0:
             i += 1
         else:
-            subString.append(maxString)
+            subString.append(s1[i:i + maxLength])
             i += maxLength
     return subString
 
 
+#The first split with the fewest characters.
 def find_min_string(strings):
-    min_sub = strings[0]
-    minLength = 0
-    for sub in min_sub:
-        minLength += len(sub)
-
-    for s in strings:
-        length = 0
-        for sub in s:
-            length += len(sub)
-
-        if length < minLength:
-            minLength = length
-            min_sub = s
-
-    return min_sub
+    lengths = [sum(map(len, s)) for s in strings]
+    return strings[lengths.index(min(lengths))]
 
 def get_position(testcases, minString):
     regular = minString
@@ -271,11 +377,8 @@ def generate_regular(testcases, time_limit):
         subString.append(get_subString(testcases[i], testcases[(i+1)%len(testcases)], dictionary))
     minString = find_min_string(subString)
 
-    if minString != []:
-        for i in range(0, num):
-            for r in minString:
-                if r not in testcases[i]:
-                    minString.remove(r)
+    #Substrings of the shortest split that are in all the test cases.
+    minString = [r for r in minString if all(r in tc for tc in testcases[0:num])]
     if minString != []:
         reg, pos = get_position(testcases[0:num], minString)
     if reg != []:
@@ -284,15 +387,16 @@ def generate_regular(testcases, time_limit):
             j = 0
             while i < len(reg):
                 if pos[i] == -2:
-                    if reg[i] in tc[j:]:
-                        j = j + tc[j:].index(reg[i]) + len(reg[i])
+                    index = tc.find(reg[i], j)
+                    if index != -1:
+                        j = index + len(reg[i])
                         i += 1
                     else:
                         reg.pop(i)
                         pos.pop(i)
                         continue
                 elif pos[i] == -1:
-                    if tc[-len(reg[i]):] == reg[i]:
+                    if tc.endswith(reg[i]):
                         i += 1
                     else:
                         reg.pop(i)
@@ -308,8 +412,7 @@ def get_regular(testcases, hardcode):
     splice = splice_testcases(testcases,hardcode)
     tempReg = []
     tempPos = []
-    tempKey = hardcode.keys()
-    tempKey.sort()
+    tempKey = sorted(hardcode.keys())
     if len(splice) > 0:
         time_limit = 15.0 / len(splice)
     for i in range(0,len(splice)):
@@ -410,36 +513,49 @@ def transfer_reg(reg,pos,hardcode):
 
     return newReg, newPos
 
+#Splitting s1[i:] greedily into the longest substrings that occur in s2 in
+#the same order, each match is searched for after the previous one in s2.
+#Returns the split with the most characters, of the first start i that has
+#it. A split is a chain of (position in s1, offset in s2) states, chains of
+#different starts share their tails, so every state is followed once.
 def get_max_substring(s1, s2):
-    i = 0
-    subString = []
-    lastJ = 0
-    while i < len(s1):
-        flag = False
-        j = lastJ
-        maxLength = 0
-        maxString = ''
-        while j < len(s2):
-            tempString = ''
-            k = 0
-            while (i + k < len(s1) and j + k < len(s2) and s1[i+k] == s2[j+k]):
-                flag = True
-                tempString += s1[i + k]
-                k += 1
-            if k > maxLength:
-                maxLength = k
-                maxString = tempString
-            if k == 0:
-                j += 1
+    automaton = SuffixAutomaton(s2)
+    #Every split starts at offset 0.
+    prefixes = automaton.longest_prefixes(s1)
+    #state => (characters matched from it, length of its match, next state)
+    chains = {}
+    for i in range(len(s1) - 1, -1, -1):
+        pending = []
+        state = (i, 0)
+        while state not in chains:
+            p, offset = state
+            if p >= len(s1) or offset >= len(s2):
+                chains[state] = (0, 0, None)
+                break
+            if offset == 0:
+                maxLength, start = prefixes[p]
             else:
-                lastJ = lastJ+k
-                j += k
-
-        if flag == False:
-            i += 1
-        else:
-            subString.append(maxString)
-            i += maxLength
+                maxLength, start = automaton.longest_prefix(s1, p, offset)
+            if maxLength == 0:
+                nextState = (p + 1, offset)
+            else:
+                nextState = (p + maxLength, start + maxLength)
+            pending.append((state, maxLength, nextState))
+            state = nextState
+        for state, maxLength, nextState in reversed(pending):
+            chains[state] = (chains[nextState][0] + maxLength, maxLength, nextState)
+    maxLength = 0
+    state = None
+    for i in range(0, len(s1)):
+        if chains[(i, 0)][0] > maxLength:
+            maxLength = chains[(i, 0)][0]
+            state = (i, 0)
+    subString = []
+    while state is not None:
+        total, length, nextState = chains[state]
+        if length != 0:
+            subString.append(s1[state[0]:state[0] + length])
+        state = nextState
     return subString
 
 def generate_sub_regular(reg1,reg2):
@@ -449,35 +565,26 @@ def generate_sub_regular(reg1,reg2):
     pos = []
     s1 = ''
     s2 = ''
-    i1 = []
-    i2 = []
+    i1 = set()
+    i2 = set()
     lastIndex1 = 0
     lastIndex2 = 0
     for i in range(0,len(reg1)):
         s1 += reg1[i]
-        i1.append(lastIndex1)
+        i1.add(lastIndex1)
         lastIndex1 += len(reg1[i])
-    i1.append(lastIndex1)
+    i1.add(lastIndex1)
     for i in range(0,len(reg2)):
         s2 += reg2[i]
-        i2.append(lastIndex2)
+        i2.add(lastIndex2)
         lastIndex2 += len(reg2[i])
-    i2.append(lastIndex2)
-    maxLength = 0
-    maxS = []
-    for i in range(0,len(s1)):
-        s = get_max_substring(s1[i:],s2)
-        tempLength = 0
-        for j in s:
-            tempLength += len(j)
-        if tempLength > maxLength:
-            maxLength = tempLength
-            maxS = s
+    i2.add(lastIndex2)
+    maxS = get_max_substring(s1, s2)
     lastIndex1 = 0
     lastIndex2 = 0
     for s in maxS:
-        index1 = lastIndex1+s1[lastIndex1:].index(s)
-        index2 = lastIndex2+s2[lastIndex2:].index(s)
+        index1 = s1.index(s, lastIndex1)
+        index2 = s2.index(s, lastIndex2)
         lastI = 0
         for i in range(0,len(s)):
             if i+index1 not in i1 and i+index2 not in i2:
@@ -515,8 +622,7 @@ def generate_new_reg_from_two_regs(reg1,pos1,reg2,pos2):
     numsOfSplice = len(hardcode.keys())
     lastindex1 = 0
     lastindex2 = 0
-    tempKey = hardcode.keys()
-    tempKey.sort()
+    tempKey = sorted(hardcode.keys())
     for i in range(0,numsOfSplice):
         index1 = newPos1.index(tempKey[i])
         index2 = newPos2.index(tempKey[i])
@@ -549,7 +655,7 @@ def generate_new_reg_from_two_regs(reg1,pos1,reg2,pos2):
 
 #Printing error message and shuting down programs
 def sys_error(message):
-    print message
+    print(message)
     exit(1)
 
 #Creating file to store information
@@ -573,8 +679,7 @@ def read_information_file(information_file):
             sys_error("Can't open information file!")
             for line in fl.readlines():
                 cksum, trans = line.split(':')[0]
-                if cksum not in Paths:
-                    Paths.append(cksum)
+                Paths.add(cksum)
                 tempList = []
                 t = trans.split(' ')
                 for i in range(0, len(t)):
@@ -584,38 +689,50 @@ def read_information_file(information_file):
 
 
 
-#Creating file to store models
+#Formatting a model the way read_model_files() in afl-fuzz.c reads it
+def model_text(path):
+    text = ('Cksum:{cksum}\n'
+            'TotalExec:{totalExec}\n'
+            'FaultCase:{fault}\n'
+            'MinLength:{minLength}\n'
+            'MaxLength:{maxLength}\n'
+            'UseModel:{useModel}\n'
+            'Diff:{diff}\n'.format(cksum=path.cksum,
+                            totalExec=path.totalExec,
+                            fault=path.fault,
+                            minLength=path.minLength,
+                            maxLength=path.maxLength,
+                            useModel=path.useModel,
+                            diff=path.diff))
+    text += 'PositionLength:{positionLength}\n'.format(positionLength=len(path.pos))
+    for i in range(0, len(path.reg)):
+        text += 'Position:{position}\nLength:{length}\nRegular:{regular}\n'.format(position=path.pos[i],length=len(path.reg[i]),regular=path.reg[i])
+    return text
+
+#Creating file to store models, skipped if the model did not change
 def write_model_to_file(filename, path):
-    if os.path.exists(filename):
-        os.remove(filename)
+    text = model_text(path)
+    if Snapshots.get(filename) == text and os.path.exists(filename):
+        print("[*] Model not changed.")
+        return False
+    tempFilename = filename + '.tmp'
     try:
-        fl = open(filename, 'w')
+        fl = open(tempFilename, 'w', encoding=FILE_ENCODING, newline='\n')
     except IOError:
         sys_error("IOError: create file failed!")
     else:
-        fl.write('Cksum:{cksum}\n'
-                 'TotalExec:{totalExec}\n'
-                 'FaultCase:{fault}\n'
-                 'MinLength:{minLength}\n'
-                 'MaxLength:{maxLength}\n'
-                 'UseModel:{useModel}\n'
-                 'Diff:{diff}\n'.format(cksum=path.cksum,
-                                 totalExec=path.totalExec,
-                                 fault=path.fault,
-                                 minLength=path.minLength,
-                                 maxLength=path.maxLength,
-                                 useModel=path.useModel,
-                                 diff=path.diff))
-        fl.write('PositionLength:{positionLength}\n'.format(positionLength=len(path.pos)))
-        for i in range(0, len(path.reg)):
-            fl.write('Position:{position}\nLength:{length}\nRegular:{regular}\n'.format(position=path.pos[i],length=len(path.reg[i]),regular=path.reg[i]))
-
-        print "[*] Writing model to model file."
+        with fl:
+            fl.write(text)
+        os.replace(tempFilename, filename)
+        Snapshots[filename] = text
+
+        print("[*] Writing model to model file.")
+        return True
 
 #Opening files
 def open_file(filename):
     try:
-        fl = open(filename, 'r')
+        fl = open(filename, 'r', encoding=FILE_ENCODING, newline='\n')
     except IOError:
         sys_error("IOError: open file failed! Couldn't find file or Permission denied")
     else:
@@ -632,7 +749,7 @@ def delete_file(filename):
 #Reading and handling last model file
 def read_and_handle_last_model(file):
     recordRegular = False
-    for line in file.readlines():
+    for line in file:
         if line.startswith("Cksum:"):
             newPath = PathInformation('', line[6:-1])
         elif line.startswith("TotalExec:"):
@@ -667,6 +784,37 @@ def read_and_handle_last_model(file):
 
     return newPath
 
+#Getting the model of a path, from memory if the daemon has seen it before
+def load_model(lastModelFileName):
+    path = Models.get(lastModelFileName)
+    if path is not None and os.path.exists(lastModelFileName):
+        #Same state as reading the model back: only the test cases of the
+        #new knowledge file are analysed.
+        path.testcases = []
+        path.nums = 0
+    elif os.path.exists(lastModelFileName):
+        with open_file(lastModelFileName) as lastModelFile:
+            path = read_and_handle_last_model(lastModelFile)
+    else:
+        path = PathInformation('', '')
+    return path
+
+#Adding the seed record of a round to the model of its path
+def add_seed(path, seed, stageCksum):
+    path.testcases.append(seed)
+    path.cksum = stageCksum
+
+#Adding a test case record to the model of its path
+def add_testcase(path, node):
+    Paths.add(node['Cksum'])
+    if node['Fault case'] != '0':
+        NewFault.append(node)
+
+    if node['Finding'] != '0':
+        Finding.append(node)
+
+    path.add_node(node)
+
 #Handling knowledge files, generating seednodes and process.
 def generate_pathnodes_and_process(knowledgeFile,lastModelFileName):
     recordSeed = False
@@ -674,12 +822,9 @@ def generate_pathnodes_and_process(knowledgeFile,lastModelFileName):
     startRecording = True
     node = {}
     lastNode = {}
-    if os.path.exists(lastModelFileName):
-        lastModelFile = open_file(lastModelFileName)
-        path = read_and_handle_last_model(lastModelFile)
-    else:
-        path = PathInformation('', '')
-    for line in knowledgeFile.readlines():
+    path = load_model(lastModelFileName)
+    #Records are applied to the model while the file is streamed.
+    for line in knowledgeFile:
         if line.startswith("Seed:"):
             startRecording = True
             recordSeed = True
@@ -691,8 +836,7 @@ def generate_pathnodes_and_process(knowledgeFile,lastModelFileName):
             recordSeed = False
             node['Seed'] = node['Seed'][:-1]
             node['Stage cksum'] = line[12:-1]
-            path.testcases.append(node['Seed'])
-            path.cksum = node['Stage cksum']
+            add_seed(path, node['Seed'], node['Stage cksum'])
 
         elif line.startswith("Stage name:"):
             tempSeed = node['Seed']
@@ -721,9 +865,6 @@ def generate_pathnodes_and_process(knowledgeFile,lastModelFileName):
             startRecording = False
             node['Cksum'] = line[6:-1]
 
-            if node['Cksum'] not in Paths:
-                Paths.append(node['Cksum'])
-
         else:
             if recordSeed:
                 node['Seed'] += line
@@ -732,13 +873,7 @@ def generate_pathnodes_and_process(knowledgeFile,lastModelFileName):
                 node['Testcase'] += line
 
         if startRecording == False:
-            if node['Fault case'] != '0':
-                NewFault.append(node)
-
-            if node['Finding'] != '0':
-                Finding.append(node)
-
-            path.add_node(node)
+            add_testcase(path, node)
             lastNode = node
 
     return path
@@ -747,11 +882,9 @@ def generate_pathnodes_and_process(knowledgeFile,lastModelFileName):
 #Handling knowledge files.
 def handle_knowledge_file(knowledgeFileName, modelFileName):
     knowledgeFile = open_file(knowledgeFileName)  #Opening knowledge files
-    print "[*] Handling knowledge file."
-    path = generate_pathnodes_and_process(knowledgeFile, modelFileName)
-
-    print "[*] Generating model."
-    path.analysis_feature()
+    print("[*] Handling knowledge file.")
+    with knowledgeFile:
+        path = generate_pathnodes_and_process(knowledgeFile, modelFileName)
 
     return path
 #Writing time information to files
@@ -763,21 +896,109 @@ def write_to_time_file(timeFile, lastTime):
             sys_error("Can't open information file!")
         fl.write(str(lastTime)+"\n")
 
+#Generating the model of a path from the records of a round, the model
+#file is only written again if the model changed
+def update_model(path, modelFile, timeFile, startTime):
+    print("[*] Generating model.")
+    path.analysis_feature()
+    write_model_to_file(modelFile, path)
+    Models[modelFile] = path
+    #Only needed while handling one round.
+    del NewFault[:]
+    del Finding[:]
+    write_to_time_file(timeFile, time.time() - startTime)
+
+#Learning from one knowledge file and updating the model of its path
+def learn(knowledgeFile, modelFile, timeFile):
+    current_time = time.time()
+    path = handle_knowledge_file(knowledgeFile,  modelFile)
+    update_model(path, modelFile, timeFile, current_time)
+    delete_file(knowledgeFile)
+
+#Handling the knowledge records afl-fuzz streams while it fuzzes a seed,
+#each record is added to the model of the path as it arrives:
+#  begin <model file> <time file>
+#  seed <stage cksum> <length>         followed by the seed
+#  case <fault> <finding> <cksum> <length>   followed by the test case
+#  end                                 replied "ok" once the model is written
+#  skip                                the round is dropped
+class LearningRequestHandler(socketserver.StreamRequestHandler):
+    def read_record(self, length):
+        record = self.rfile.read(int(length))
+        if len(record) != int(length):
+            sys_error("Truncated record.")
+        return record.decode(FILE_ENCODING)
+
+    def handle(self):
+        path = None
+        modelFile = None
+        for line in self.rfile:
+            args = line.decode(FILE_ENCODING).split()
+            try:
+                if args[0] == 'begin' and len(args) == 3:
+                    modelFile, timeFile = args[1], args[2]
+                    path = load_model(modelFile)
+                elif args[0] == 'seed' and len(args) == 3:
+                    add_seed(path, self.read_record(args[2]), args[1])
+                elif args[0] == 'case' and len(args) == 5:
+                    node = {'Testcase': self.read_record(args[4]),
+                            'Fault case': args[1],
+                            'Finding': args[2],
+                            'Cksum': args[3]}
+                    add_testcase(path, node)
+                elif args[0] == 'end' and len(args) == 1:
+                    current_time = time.time()
+                    update_model(path, modelFile, timeFile, current_time)
+                    path = None
+                    self.wfile.write(b"ok\n")
+                    self.wfile.flush()
+                elif args[0] == 'skip' and len(args) == 1:
+                    #The records went into the cached model, read it back.
+                    Models.pop(modelFile, None)
+                    path = None
+                else:
+                    sys_error("Bad request.")
+            except (Exception, SystemExit) as e:
+                print("[-] Learning failed: {}".format(e))
+                #The cached model may be half updated.
+                Models.pop(modelFile, None)
+                del NewFault[:]
+                del Finding[:]
+                #The rest of the stream can not be trusted.
+                self.wfile.write(b"error\n")
+                self.wfile.flush()
+                return
+
+#Serving afl-fuzz until it exits, models stay in memory between requests
+def run_daemon(socketFile, parentPid):
+    if os.path.exists(socketFile):
+        os.remove(socketFile)
+    server = socketserver.UnixStreamServer(socketFile, LearningRequestHandler)
+    server.timeout = 1
+    print("[*] Learning engine listening on {}.".format(socketFile))
+    with server:
+        while True:
+            if parentPid:
+                try:
+                    os.kill(parentPid, 0)
+                except OSError:
+                    break
+            server.handle_request()
+    os.remove(socketFile)
+
 def main(argv):
+    if len(argv) in (2, 3) and argv[0] == '--daemon':
+        run_daemon(argv[1], int(argv[2]) if len(argv) == 3 else 0)
+        return
     if len(argv) == 3:
         knowledgeFile = argv[0]
         modelFile = argv[1]
         timeFile = argv[2]
     else:
         sys_error("")
-    print "[*] Starting python script."
-    current_time = time.time()
+    print("[*] Starting python script.")
     #information_file = create_information_file(modelFile)
-    path = handle_knowledge_file(knowledgeFile,  modelFile)
-    write_model_to_file(modelFile, path)
-    delete_file(knowledgeFile)
-    last_time = time.time() - current_time
-    write_to_time_file(timeFile,last_time)
+    learn(knowledgeFile, modelFile, timeFile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+'''
+crash and unique bug store of the evaluator
+
+one table of crashes and one table per dedup key, replaces the
+unique_bugs* symlink farms which can be exported on demand
+'''
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import peewee
+from tap import Tap
+
+logger = logging.getLogger('rcfuzz.bugdb')
+
+db = peewee.SqliteDatabase(None)
+
+
+class BaseModel(peewee.Model):
+    class Meta:
+        database = db
+
+
+class Crash(BaseModel):
+    fuzzer = peewee.CharField(index=True)
+    # directory under eval/<fuzzer>/crashes, None if ASAN triage was skipped
+    crash_id = peewee.IntegerField(null=True)
+    path = peewee.CharField()
+    fingerprint = peewee.CharField(null=True)
+    unique_bugs = peewee.CharField()
+    unique_bugs_ip = peewee.CharField()
+    unique_bugs_trace = peewee.CharField()
+    unique_bugs_trace3 = peewee.CharField()
+
+
+class BugKeyModel(BaseModel):
+    fuzzer = peewee.CharField()
+    key = peewee.CharField()
+    bug_id = peewee.IntegerField()
+    first_crash = peewee.ForeignKeyField(Crash, null=True)
+
+    class Meta:
+        indexes = ((('fuzzer', 'key'), True), )
+
+
+class UniqueBug(BugKeyModel):
+    pass
+
+
+class UniqueBugIP(BugKeyModel):
+    pass
+
+
+class UniqueBugTrace(BugKeyModel):
+    pass
+
+
+class UniqueBugTrace3(BugKeyModel):
+    pass
+
+
+KINDS = {
+    'unique_bugs': UniqueBug,
+    'unique_bugs_ip': UniqueBugIP,
+    'unique_bugs_trace': UniqueBugTrace,
+    'unique_bugs_trace3': UniqueBugTrace3,
+}
+
+# kind => fuzzer => # of unique bugs, kept in sync with the tables
+COUNT: Dict[str, Dict[str, int]] = {}
+
+
+def init(db_path):
+    global COUNT
+    db.init(str(db_path),
+            pragmas={
+                'journal_mode': 'wal',
+                'synchronous': 'normal'
+            })
+    db.connect(reuse_if_open=True)
+    db.create_tables([Crash] + list(KINDS.values()))
+    COUNT = {kind: {} for kind in KINDS}
+    for kind, model in KINDS.items():
+        query = (model.select(model.fuzzer,
+                              peewee.fn.COUNT(model.id).alias('n')).group_by(
+                                  model.fuzzer))
+        for row in query:
+            COUNT[kind][row.fuzzer] = row.n
+
+
+def count(fuzzer, kind='unique_bugs') -> int:
+    return COUNT[kind].get(fuzzer, 0)
+
+
+def add_key(kind, fuzzer, key, crash) -> int:
+    '''
+    return the bug id of key, allocate one if it is new for fuzzer
+    '''
+    model = KINDS[kind]
+    row = model.get_or_none((model.fuzzer == fuzzer) & (model.key == key))
+    if row:
+        return row.bug_id
+    bug_id = count(fuzzer, kind)
+    model.create(fuzzer=fuzzer, key=key, bug_id=bug_id, first_crash=crash)
+    COUNT[kind][fuzzer] = bug_id + 1
+    return bug_id
+
+
+def add_crash(fuzzer,
+              crash_id: Optional[int],
+              path,
+              ID,
+              ID_ip,
+              ID_trace,
+              ID_trace3,
+              fingerprint=None) -> Dict[str, int]:
+    '''
+    record a crash of fuzzer, its bugs are also counted for global
+    return bug id of each kind for fuzzer
+    '''
+    keys = {
+        'unique_bugs': ID,
+        'unique_bugs_ip': ID_ip,
+        'unique_bugs_trace': ID_trace,
+        'unique_bugs_trace3': ID_trace3,
+    }
+    ret = {}
+    with db.atomic():
+        crash = Crash.create(fuzzer=fuzzer,
+                             crash_id=crash_id,
+                             path=str(path),
+                             fingerprint=fingerprint,
+                             **keys)
+        for kind, key in keys.items():
+            ret[kind] = add_key(kind, fuzzer, key, crash)
+            add_key(kind, 'global', key, crash)
+    return ret
+
+
+def symlink(src, dst):
+    if os.path.lexists(dst):
+        os.remove(dst)
+    os.symlink(src, dst)
+
+
+def export(eval_root: Path):
+    '''
+    recreate eval/<fuzzer>/<kind>/<bug id>/<crash id> symlinks
+    '''
+    total = 0
+    for kind, model in KINDS.items():
+        for row in model.select():
+            # NOTE: bugs only seen through skipped crashes have no directory
+            crashes = (Crash.select().where(
+                (getattr(Crash, kind) == row.key)
+                & (Crash.crash_id.is_null(False))))
+            if row.fuzzer != 'global':
+                crashes = crashes.where(Crash.fuzzer == row.fuzzer)
+            bug_dir = eval_root / row.fuzzer / kind / str(row.bug_id)
+            for crash in crashes:
+                crash_dir = eval_root / crash.fuzzer / 'crashes' / str(
+                    crash.crash_id)
+                os.makedirs(bug_dir, exist_ok=True)
+                rel_path = os.path.relpath(crash_dir, bug_dir)
+                name = str(crash.crash_id)
+                # crash ids are per fuzzer
+                if row.fuzzer == 'global':
+                    name = f'{crash.fuzzer}_{name}'
+                symlink(rel_path, bug_dir / name)
+                total += 1
+    logger.info(f'exported {total} crash links to {eval_root}')
+
+
+class ArgsParser(Tap):
+    output: Path
+
+    def configure(self):
+        self.add_argument("-o",
+                          "--output",
+                          help="rcfuzz output directory",
+                          required=True)
+
+
+def main():
+    args = ArgsParser().parse_args()
+    eval_root = args.output / 'eval'
+    db_path = eval_root / 'bugs.db'
+    assert db_path.exists(), f'{db_path} not found'
+    init(db_path)
+    export(eval_root)
+    for fuzzer, n in sorted(COUNT['unique_bugs'].items()):
+        print(f'{fuzzer}: {n} unique bugs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+'''
+multi-target campaigns under one supervisor
+
+main.py keeps one target in module globals, so every target runs in its
+own rcfuzz process, OUTPUT/<target>, with its fuzzer cgroups under the
+cgroup subtree rcfuzz/<target>. the supervisor owns the quota of each
+subtree: every interval it reads the edges of each target from its
+eval/cov.json and moves cores to the targets gaining the most edges per
+core-second, every target keeps at least --min-cores. a target starts
+with --cores and reads later changes from OUTPUT/<target>/cores, so its
+scheduler hands all of its cores to its fuzzers
+
+cgroup /rcfuzz is created by /init.sh as for a single target
+'''
+import json
+import logging
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# FIXME
+if not __package__:
+    sys.path.append(
+        os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    __package__ = "rcfuzz"
+
+from tap import Tap
+
+from . import cgroup_utils
+from . import config as Config
+from . import utils
+from .mytype import Fuzzer
+
+config = Config.CONFIG
+
+logger = logging.getLogger('rcfuzz.campaign')
+
+# weight of the latest interval in the smoothed rate
+SMOOTHING = 0.5
+
+
+def allocate(rates: Dict[str, Optional[float]], total_cores: float,
+             min_cores: float) -> Dict[str, float]:
+    '''
+    cores per target, min_cores each and the rest by rate
+    targets without a rate yet are given the mean rate
+    '''
+    if not rates:
+        return {}
+    n = len(rates)
+    if total_cores <= min_cores * n:
+        return {target: total_cores / n for target in rates}
+    known = [r for r in rates.values() if r is not None]
+    mean = sum(known) / len(known) if known else 0
+    weights = {
+        target: max(mean if rate is None else rate, 0)
+        for target, rate in rates.items()
+    }
+    spare = total_cores - min_cores * n
+    total_weight = sum(weights.values())
+    if not total_weight:
+        return {target: total_cores / n for target in rates}
+    return {
+        target: min_cores + spare * weight / total_weight
+        for target, weight in weights.items()
+    }
+
+
+class TargetCampaign(object):
+    def __init__(self, target: str, output: Path, args: List[str]):
+        self.target = target
+        self.output = output
+        self.args = args
+        self.cgroup = f'rcfuzz/{target}'
+        self.process: Optional[subprocess.Popen] = None
+        self.cores = 0.0
+        # edges per core-second, smoothed
+        self.rate: Optional[float] = None
+        self.last_edges: Optional[int] = None
+        self.last_time: Optional[float] = None
+
+    def start(self):
+        command = [
+            sys.executable, '-m', 'rcfuzz.main', '--target', self.target,
+            '--output',
+            str(self.output), '--cgroup', self.cgroup, '--cores',
+            str(self.cores)
+        ] + self.args
+        logger.info(f'start {self.target}: {shlex.join(command)}')
+        self.process = subprocess.Popen(command)
+
+    def write_cores(self):
+        # NOTE: rcfuzz creates its output directory itself, until then
+        #       it got the cores on its command line
+        if not self.output.is_dir():
+            return
+        tmp_path = self.output / 'cores.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(self.cores))
+        os.replace(tmp_path, self.output / 'cores')
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.is_alive():
+            assert self.process
+            # NOTE: rcfuzz stops its fuzzers on SIGTERM
+            self.process.send_signal(signal.SIGTERM)
+
+    def get_edges(self) -> Optional[int]:
+        cov_path = self.output / 'eval' / 'cov.json'
+        try:
+            with open(cov_path) as f:
+                cov = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # not evaluated yet, or being rewritten
+            return None
+        return cov['coverage'].get('global')
+
+    def sample(self, now: float):
+        edges = self.get_edges()
+        if edges is None:
+            return
+        if self.last_edges is not None and self.last_time is not None:
+            core_seconds = self.cores * (now - self.last_time)
+            if core_seconds > 0:
+                rate = (edges - self.last_edges) / core_seconds
+                if self.rate is None:
+                    self.rate = rate
+                else:
+                    self.rate = SMOOTHING * rate + (1 -
+                                                    SMOOTHING) * self.rate
+        self.last_edges = edges
+        self.last_time = now
+
+    def toJSON(self):
+        return {
+            'cores': self.cores,
+            'rate': self.rate,
+            'edges': self.last_edges,
+            'alive': self.is_alive()
+        }
+
+
+def get_cgroup_node(name: str, create=False):
+    from cgroupspy import trees
+    cgroup_path = cgroup_utils.get_cgroup_path()
+    t = trees.Tree()
+    path = os.path.join('/cpu', cgroup_path[1:], name)
+    node = t.get_node_by_path(path)
+    if node is None and create:
+        parent = t.get_node_by_path(os.path.dirname(path))
+        if parent is None:
+            logger.critical(
+                'rcfuzz cgroup not exists. make sure to run /init.sh first')
+            sys.exit(1)
+        node = parent.create_cgroup(os.path.basename(path))
+    return node
+
+
+class Supervisor(object):
+    def __init__(self, targets: Dict[str, TargetCampaign], total_cores: float,
+                 min_cores: float, interval: int, timeout: int, output: Path):
+        self.targets = targets
+        self.total_cores = total_cores
+        self.min_cores = min_cores
+        self.interval = interval
+        self.timeout = timeout
+        self.output = output
+        self.log: List[Dict] = []
+
+    def set_cores(self, campaign: TargetCampaign, cores: float):
+        node = get_cgroup_node(campaign.cgroup, create=True)
+        period = node.controller.cfs_period_us
+        node.controller.cfs_quota_us = max(int(period * cores), 1000)
+        campaign.cores = cores
+        campaign.write_cores()
+
+    def reallocate(self, now: float):
+        alive = {
+            name: campaign
+            for name, campaign in self.targets.items()
+            if campaign.is_alive()
+        }
+        for campaign in alive.values():
+            campaign.sample(now)
+        cores = allocate({name: c.rate
+                          for name, c in alive.items()}, self.total_cores,
+                         self.min_cores)
+        for name, campaign in alive.items():
+            self.set_cores(campaign, cores[name])
+        entry = {
+            'timestamp': now,
+            'targets': {
+                name: campaign.toJSON()
+                for name, campaign in self.targets.items()
+            }
+        }
+        self.log.append(entry)
+        logger.info(f'cores: {cores}')
+        self.write_log()
+
+    def write_log(self):
+        path = self.output / 'campaign.json'
+        tmp_path = self.output / 'campaign.json.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.log, f)
+        os.replace(tmp_path, path)
+
+    def run(self):
+        cores = allocate({name: None
+                          for name in self.targets}, self.total_cores,
+                         self.min_cores)
+        for name, campaign in self.targets.items():
+            self.set_cores(campaign, cores[name])
+            campaign.start()
+        start_time = time.time()
+        try:
+            while any(c.is_alive() for c in self.targets.values()):
+                time.sleep(self.interval)
+                now = time.time()
+                # NOTE: the targets stop by themselves, 300s after timeout
+                if now - start_time > self.timeout + 600:
+                    break
+                self.reallocate(now)
+        finally:
+            for campaign in self.targets.values():
+                campaign.stop()
+            for campaign in self.targets.values():
+                if campaign.process:
+                    campaign.process.wait()
+            self.write_log()
+
+
+class ArgsParser(Tap):
+    target: List[str]
+    fuzzer: List[Fuzzer]
+    output: Path
+    input: Optional[Path]
+    timeout: str
+    cores: float
+    min_cores: float
+    interval: int
+    rcfuzz_args: str
+
+    def configure(self):
+        available_targets = list(config['target'].keys())
+        available_fuzzers = list(config['fuzzer'].keys())
+        self.add_argument("--target",
+                          "-t",
+                          nargs='+',
+                          choices=available_targets,
+                          required=True,
+                          help="targets fuzzed side by side")
+        self.add_argument("--fuzzer",
+                          "-f",
+                          nargs='+',
+                          choices=available_fuzzers + ['all'],
+                          required=True,
+                          help="baseline fuzzers of every target")
+        self.add_argument("--output",
+                          "-o",
+                          required=True,
+                          help="output directory, one subdirectory per target")
+        self.add_argument("--input",
+                          "-i",
+                          default=None,
+                          help="Optional input (seed) directory")
+        self.add_argument("--timeout", "-T", default='24h')
+        self.add_argument("--cores",
+                          type=float,
+                          default=float(os.cpu_count() or 1),
+                          help="cores shared by all targets")
+        self.add_argument("--min-cores",
+                          type=float,
+                          default=0.5,
+                          help="cores every target keeps")
+        self.add_argument("--interval",
+                          type=int,
+                          default=600,
+                          help="seconds between core reallocations")
+        self.add_argument("--rcfuzz-args",
+                          default='',
+                          help="extra arguments of every rcfuzz process")
+
+
+def main():
+    args = ArgsParser().parse_args()
+    output = args.output.resolve()
+    try:
+        os.makedirs(output, exist_ok=False)
+    except FileExistsError:
+        logger.error(f'remove {output}')
+        exit(1)
+    extra = ['--fuzzer'] + args.fuzzer + ['--timeout', args.timeout]
+    if args.input:
+        extra += ['--input', str(args.input.resolve())]
+    extra += shlex.split(args.rcfuzz_args)
+    targets = {
+        target: TargetCampaign(target, output / target, extra)
+        for target in args.target
+    }
+    supervisor = Supervisor(targets, args.cores, args.min_cores,
+                            args.interval,
+                            utils.time_to_seconds(args.timeout), output)
+    signal.signal(signal.SIGTERM, lambda x, frame: sys.exit(0))
+    supervisor.run()
+
+
+def test():
+    import tempfile
+    cores = allocate({'a': 3.0, 'b': 1.0, 'c': 0.0}, 10, 1)
+    assert cores == {'a': 6.25, 'b': 2.75, 'c': 1}
+    # no rate yet: the mean of the others
+    cores = allocate({'a': 2.0, 'b': None}, 4, 1)
+    assert cores == {'a': 2, 'b': 2}
+    assert allocate({'a': None, 'b': None}, 4, 1) == {'a': 2, 'b': 2}
+    assert allocate({'a': 5.0, 'b': 1.0}, 1, 1) == {'a': 0.5, 'b': 0.5}
+    with tempfile.TemporaryDirectory() as d:
+        campaign = TargetCampaign('t', Path(d), [])
+        os.makedirs(Path(d) / 'eval')
+        campaign.cores = 2
+        campaign.sample(0)
+        assert campaign.last_edges is None
+
+        def write(edges):
+            with open(Path(d) / 'eval' / 'cov.json', 'w') as f:
+                json.dump({'coverage': {'global': edges}}, f)
+
+        write(100)
+        campaign.sample(10)
+        assert campaign.rate is None
+        write(140)
+        campaign.sample(20)
+        assert campaign.rate == 2
+        write(140)
+        campaign.sample(30)
+        assert campaign.rate == 1
+
+        campaign.cores = 2.5
+        campaign.write_cores()
+        assert (Path(d) / 'cores').read_text() == '2.5'
+        missing = TargetCampaign('t', Path(d) / 'missing', [])
+        missing.write_cores()
+        assert not (Path(d) / 'missing').exists()
+    print('ok')
+
+
+if __name__ == '__main__':
+    main()
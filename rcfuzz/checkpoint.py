@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+'''
+atomic checkpoints of the scheduler state, OUTPUT/checkpoint
+
+plain values go to state.json, bitmaps to bitmaps.<generation>.npz. the
+npz of a new generation is written first and state.json, which names its
+generation, is replaced afterwards, so a crash at any point leaves the
+previous checkpoint intact. the evaluator needs no checkpoint of its own:
+its bitmaps are saved atomically, crashes are in bugs.db and known seeds
+are replayed from the seed store (see evaluator.restore)
+'''
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('rcfuzz.checkpoint')
+
+STATE_NAME = 'state.json'
+
+
+def _bitmaps_name(generation: int) -> str:
+    return f'bitmaps.{generation}.npz'
+
+
+def _write_atomic(path: Path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def save(directory, state: Dict, bitmaps: Dict[str, np.ndarray]) -> int:
+    '''
+    return the generation written
+    '''
+    directory = Path(directory)
+    os.makedirs(directory, exist_ok=True)
+    previous = read_generation(directory)
+    generation = 0 if previous is None else previous + 1
+    _write_atomic(directory / _bitmaps_name(generation),
+                  lambda f: np.savez_compressed(f, **bitmaps))
+    content = json.dumps({'generation': generation, 'state': state}).encode()
+    _write_atomic(directory / STATE_NAME, lambda f: f.write(content))
+    if previous is not None:
+        old_path = directory / _bitmaps_name(previous)
+        if old_path.exists():
+            os.remove(old_path)
+    return generation
+
+
+def read_generation(directory) -> Optional[int]:
+    try:
+        with open(Path(directory) / STATE_NAME) as f:
+            return json.load(f)['generation']
+    except FileNotFoundError:
+        return None
+
+
+def load(directory) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+    '''
+    return (state, bitmaps) of the latest checkpoint, None if there is none
+    '''
+    directory = Path(directory)
+    try:
+        with open(directory / STATE_NAME) as f:
+            content = json.load(f)
+    except FileNotFoundError:
+        return None
+    with np.load(directory / _bitmaps_name(content['generation'])) as npz:
+        bitmaps = {name: npz[name] for name in npz.files}
+    return content['state'], bitmaps
+
+
+def test():
+    with tempfile.TemporaryDirectory() as d:
+        assert load(d) is None
+        bitmap = np.zeros(1024, dtype=np.uint8)
+        bitmap[[1, 7]] = 1
+        assert save(d, {'round_num': 3}, {'afl': bitmap}) == 0
+        assert save(d, {'round_num': 4}, {'afl': bitmap}) == 1
+        state, bitmaps = load(d)
+        assert state == {'round_num': 4}
+        assert np.array_equal(bitmaps['afl'], bitmap)
+        # only the latest generation is kept
+        assert sorted(os.listdir(d)) == ['bitmaps.1.npz', STATE_NAME]
+
+        # a crash while writing state.json keeps the last checkpoint
+        def crash(f):
+            raise KeyboardInterrupt
+
+        try:
+            _write_atomic(Path(d) / STATE_NAME, crash)
+        except KeyboardInterrupt:
+            pass
+        assert load(d)[0] == {'round_num': 4}
+        assert sorted(os.listdir(d)) == ['bitmaps.1.npz', STATE_NAME]
+    print('ok')
+
+
+if __name__ == '__main__':
+    test()
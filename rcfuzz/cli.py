@@ -32,6 +32,17 @@ class ArgsParser(Tap):
     diff: int
     threshold: int
     tar: bool
+    sync_mode: str
+    sync_budget: int
+    cmin_interval: int
+    cgroup: str
+    cores: float
+    coordinator: Optional[str]
+    node: Optional[str]
+    resume: bool
+    checkpoint_interval: int
+    metrics_port: Optional[int]
+    metrics_socket: Optional[Path]
 
     def configure(self):
         global config
@@ -111,8 +122,70 @@ class ArgsParser(Tap):
                           default=10,
                           help="the bitmap difference threshold")
 
+        self.add_argument(
+            "--sync-mode",
+            type=str,
+            choices=['all', 'coverage'],
+            default='all',
+            help=
+            "all: sync every new seed to every fuzzer, coverage: only seeds with edges the fuzzer has not covered")
+
+        self.add_argument(
+            "--sync-budget",
+            type=int,
+            default=100,
+            help="--sync-mode coverage: seeds synced per fuzzer and sync (0 no limit)")
+
+        self.add_argument(
+            "--cmin-interval",
+            type=int,
+            default=0,
+            help="seconds between publishing a minimised corpus to OUTPUT/cmin, new fuzzer instances start from it (0 disables)")
+
+        self.add_argument(
+            "--cgroup",
+            default='rcfuzz',
+            help="cpu cgroup of the fuzzers, created by /init.sh or by rcfuzz.campaign")
+
+        self.add_argument(
+            "--cores",
+            type=float,
+            default=1,
+            help="cores shared by the fuzzers, rcfuzz.campaign updates them through OUTPUT/cores")
+
+        self.add_argument(
+            "--coordinator",
+            default=None,
+            help="host:port or unix:/path of a rcfuzz.distributed coordinator, which then assigns the cpu of this node")
+
+        self.add_argument("--node",
+                          default=None,
+                          help="node name for the coordinator (hostname)")
+
+        self.add_argument(
+            "--resume",
+            action="store_true",
+            default=False,
+            help="continue the campaign in the existing output directory from its last checkpoint")
+
+        self.add_argument(
+            "--checkpoint-interval",
+            type=int,
+            default=300,
+            help="seconds between scheduler checkpoints in OUTPUT/checkpoint (0 disables)")
+
         self.add_argument("--tar",
                           action="store_true",
                           default=False,
                           help="tar fuzzer/eval directories")
 
+        self.add_argument(
+            "--metrics-port",
+            type=int,
+            default=None,
+            help="serve Prometheus metrics on 127.0.0.1:<port>/metrics")
+
+        self.add_argument("--metrics-socket",
+                          default=None,
+                          help="serve Prometheus metrics on a unix socket")
+
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+'''
+coverage preserving corpus minimisation, afl-cmin style
+
+the evaluator traces every seed it executes and hands the edges, the file
+size and the exec time to the minimizer. like afl-cmin, only the cheapest
+seed of every edge (weight: size * exec time, AFL's favourite factor) can
+be part of the minimised corpus. a greedy weighted set cover over those
+seeds, with their edges read back from the seed store, gives the corpus,
+which is published periodically as a directory of hard links, OUTPUT/cmin
+
+new fuzzer instances start from OUTPUT/cmin instead of the initial seeds
+plus the whole sync history, coverage sync drops candidates the published
+corpus does not need
+'''
+import errno
+import heapq
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from . import metrics
+from .datatype import Bitmap
+
+logger = logging.getLogger('rcfuzz.cmin')
+
+# OUTPUT/cmin is a symlink to the latest generation, the one before is
+# kept for fuzzers still reading it at startup
+VIEW_NAME = 'cmin'
+KEEP_GENERATIONS = 2
+
+
+def _link(src, dst):
+    '''
+    hard link, AFL skips symlinks in its input directory
+    '''
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        # e.g. the initial seeds on another file system
+        shutil.copyfile(src, dst)
+
+
+class CorpusMinimizer(object):
+    def __init__(self,
+                 get_edges: Callable[[str], Optional[np.ndarray]],
+                 map_size=Bitmap.BITMAP_SIZE):
+        self.get_edges = get_edges
+        self.map_size = map_size
+        self.lock = threading.Lock()
+        # edge => cheapest seed hitting it and its weight
+        self.best_seed = np.full(map_size, -1, dtype=np.int32)
+        self.best_weight = np.full(map_size, np.inf, dtype=np.float32)
+        # seed id => (checksum, path), every seed added
+        self.seeds: List[Tuple[str, str]] = []
+        self.ids: Dict[str, int] = {}
+        # seed id => weight and # edges it is the cheapest for, only for
+        # seeds that are still the cheapest for some edge
+        self.weights: Dict[int, float] = {}
+        self.wins: Dict[int, int] = {}
+        # checksums in the published corpus, seeds before view_seeds were
+        # considered for it
+        self.view: Set[str] = set()
+        self.view_seeds = 0
+        self.generation = 0
+
+    def add(self, checksum_f, path, edges: np.ndarray, size: int,
+            exec_time: float) -> bool:
+        '''
+        return whether the seed is now the cheapest one for some edge
+        '''
+        weight = max(size, 1) * max(exec_time, 1e-6)
+        with self.lock:
+            if checksum_f in self.ids:
+                return False
+            seed_id = len(self.seeds)
+            self.seeds.append((checksum_f, str(path)))
+            self.ids[checksum_f] = seed_id
+            if not len(edges):
+                return False
+            better = edges[self.best_weight[edges] > weight]
+            if not len(better):
+                return False
+            losers, counts = np.unique(self.best_seed[better],
+                                       return_counts=True)
+            for loser, count in zip(losers.tolist(), counts.tolist()):
+                if loser < 0:
+                    continue
+                self.wins[loser] -= count
+                if not self.wins[loser]:
+                    del self.wins[loser]
+                    del self.weights[loser]
+            self.best_seed[better] = seed_id
+            self.best_weight[better] = weight
+            self.weights[seed_id] = weight
+            self.wins[seed_id] = len(better)
+            return True
+
+    def minimize(self) -> Tuple[List[int], int]:
+        '''
+        lazy greedy set cover, lowest weight per new edge first
+        return (seed ids, # seeds considered)
+        '''
+        with self.lock:
+            considered = len(self.seeds)
+            candidates = [(s, self.seeds[s][0], self.weights[s])
+                          for s in self.wins]
+        heap = []
+        for seed_id, checksum_f, weight in candidates:
+            edges = self.get_edges(checksum_f)
+            if edges is None or not len(edges):
+                continue
+            heap.append((weight / len(edges), seed_id, weight, edges))
+        heapq.heapify(heap)
+        covered = np.zeros(self.map_size, dtype=bool)
+        selected: List[int] = []
+        while heap:
+            _, seed_id, weight, edges = heapq.heappop(heap)
+            gain = int(np.count_nonzero(~covered[edges]))
+            if not gain:
+                continue
+            cost = weight / gain
+            # costs only grow, recheck against the next best
+            if heap and cost > heap[0][0]:
+                heapq.heappush(heap, (cost, seed_id, weight, edges))
+                continue
+            covered[edges] = True
+            selected.append(seed_id)
+        return selected, considered
+
+    def redundant(self, checksum_f) -> bool:
+        '''
+        the seed was considered for the published corpus and left out
+        '''
+        seed_id = self.ids.get(checksum_f)
+        if seed_id is None or seed_id >= self.view_seeds:
+            return False
+        return checksum_f not in self.view
+
+    def publish(self, root) -> Optional[Path]:
+        '''
+        link the minimised corpus into root/cmin.<generation> and point
+        root/cmin to it, return the new directory
+        '''
+        selected, considered = self.minimize()
+        if not selected:
+            return None
+        root = Path(root)
+        self.generation += 1
+        generation_dir = root / f'{VIEW_NAME}.{self.generation}'
+        tmp_dir = root / f'{VIEW_NAME}.{self.generation}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        view = set()
+        for seed_id in selected:
+            checksum_f, path = self.seeds[seed_id]
+            try:
+                _link(path, tmp_dir / checksum_f)
+            except FileNotFoundError:
+                logger.debug(f'{path} is gone, not in the corpus')
+                continue
+            view.add(checksum_f)
+        os.rename(tmp_dir, generation_dir)
+        link_tmp = root / f'{VIEW_NAME}.link'
+        if os.path.lexists(link_tmp):
+            os.remove(link_tmp)
+        os.symlink(generation_dir.name, link_tmp)
+        os.replace(link_tmp, root / VIEW_NAME)
+        old_dir = root / f'{VIEW_NAME}.{self.generation - KEEP_GENERATIONS}'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        self.view = view
+        self.view_seeds = considered
+        metrics.set_gauge('rcfuzz_cmin_seeds', len(view))
+        metrics.set_gauge('rcfuzz_cmin_considered', considered)
+        logger.info(f'cmin {self.generation}: {len(view)} of {considered} '
+                    f'seeds in {generation_dir}')
+        return generation_dir
+
+
+def view_dir(root) -> Optional[Path]:
+    '''
+    latest published corpus under root, resolved so that it stays valid
+    for a fuzzer starting up while the next one is published
+    '''
+    view = Path(root) / VIEW_NAME
+    if not view.exists():
+        return None
+    return view.resolve()
+
+
+# created by enable(), the maps take 8MB
+MINIMIZER: Optional[CorpusMinimizer] = None
+
+
+def enable(get_edges: Callable[[str], Optional[np.ndarray]]):
+    global MINIMIZER
+    if MINIMIZER is None:
+        MINIMIZER = CorpusMinimizer(get_edges)
+
+
+def test():
+    import tempfile
+    store: Dict[str, np.ndarray] = {}
+    minimizer = CorpusMinimizer(store.get, map_size=16)
+
+    def edges(*e):
+        return np.array(e, dtype=np.uint32)
+
+    def add(checksum_f, path, e, size, exec_time):
+        store.setdefault(checksum_f, e)
+        return minimizer.add(checksum_f, path, e, size, exec_time)
+
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        for name in 'abcdef':
+            with open(d / name, 'w') as f:
+                f.write(name)
+        # a is the cheapest for nothing once b and c are added
+        assert add('a', d / 'a', edges(0, 1, 2), 10, 1.0)
+        assert add('b', d / 'b', edges(0, 1), 1, 1.0)
+        assert add('c', d / 'c', edges(2, 3), 1, 1.0)
+        assert 0 not in minimizer.wins
+        # d covers everything b and c do, but costs more per edge
+        assert add('d', d / 'd', edges(0, 1, 2, 3, 4), 3, 1.0)
+        assert not add('e', d / 'e', edges(3), 5, 1.0)
+        assert not add('a', d / 'a', edges(0), 1, 0.1)
+        selected, considered = minimizer.minimize()
+        assert considered == 5
+        # d is the only seed with edge 4, but b and c are cheaper per edge
+        assert [minimizer.seeds[s][0] for s in selected] == ['b', 'c', 'd']
+        view = minimizer.publish(d)
+        assert view == d / 'cmin.1'
+        assert sorted(os.listdir(d / 'cmin')) == ['b', 'c', 'd']
+        assert os.stat(d / 'cmin' / 'd').st_ino == os.stat(d / 'd').st_ino
+        assert minimizer.redundant('a') and minimizer.redundant('e')
+        assert not minimizer.redundant('b')
+        assert add('f', d / 'f', edges(4, 5), 1, 1.0)
+        assert not minimizer.redundant('f')
+        minimizer.publish(d)
+        minimizer.publish(d)
+        assert view_dir(d) == d / 'cmin.3'
+        # f took edge 4 over from d
+        assert sorted(os.listdir(d / 'cmin')) == ['b', 'c', 'f']
+        assert not (d / 'cmin.1').exists() and (d / 'cmin.2').exists()
+    print('ok')
+
+
+if __name__ == '__main__':
+    test()
@@ -2,11 +2,13 @@
 '''
 1. create a docker instance for each fuzzer
 '''
+import copy
 import json
 import logging
 import os
 import re
-from typing import Dict, Optional
+import threading
+from typing import Dict, Optional, Tuple
 
 import filelock
 
@@ -19,6 +21,17 @@ config = Config.CONFIG
 logger = logging.getLogger('rcfuzz.coverage')
 
 EVALUTOR_THREAD = None
+# fuzzers warm up side by side, only the first one starts the evaluator
+EVALUTOR_LOCK = threading.Lock()
+
+# bitmap path => (version, bitmap), skip loading maps that did not change
+BITMAP_CACHE: Dict[str, Tuple[int, Bitmap]] = {}
+
+
+COVERAGE_KEYS = [
+    'line_coverage', 'line', 'line_total', 'function_coverage', 'function',
+    'function_total'
+]
 
 
 def parse_afl_cov_output(output):
@@ -53,23 +66,30 @@ def parse_afl_cov_output(output):
 
 def get_bitmap_fuzzer(target, fuzzer, output_dir):
     fuzzer_output_dir = os.path.join(output_dir, 'eval', fuzzer)
-    lock_path = os.path.realpath(os.path.join(output_dir, 'eval', 'lock'))
-    if not os.path.exists(lock_path): return None
     bitmap_path = os.path.join(fuzzer_output_dir, 'bitmap')
-    lock = filelock.FileLock(lock_path, timeout=300)
-    bitmap = None
-    with lock:
-        if not os.path.exists(bitmap_path):
-            logger.critical(f'{bitmap_path} is None')
-            return None
-        if os.path.exists(bitmap_path):
-            bitmap = Bitmap(bitmap_path=bitmap_path)
+    # NOTE: the evaluator replaces bitmaps atomically, no lock needed
+    if not os.path.exists(bitmap_path): return None
+    version = Bitmap.read_version(bitmap_path)
+    cached = BITMAP_CACHE.get(bitmap_path)
+    if cached and version is not None and cached[0] == version:
+        # bitmap operations return new objects, sharing the array is fine
+        return copy.copy(cached[1])
+    bitmap = Bitmap(bitmap_path=bitmap_path)
     assert bitmap
-    return bitmap
+    if bitmap.version is not None:
+        BITMAP_CACHE[bitmap_path] = (bitmap.version, bitmap)
+    return copy.copy(bitmap)
 
 
 def get_coverage_global(output_dir):
     global_output_dir = os.path.join(output_dir)
+    # afl-cov writes its totals as json, the log is only for older afl-cov
+    json_path = os.path.realpath(
+        os.path.join(global_output_dir, 'cov', 'afl-cov-latest.json'))
+    if os.path.exists(json_path):
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        return {key: data.get(key) for key in COVERAGE_KEYS}
     log_path = os.path.realpath(
         os.path.join(global_output_dir, 'cov', 'afl-cov-latest.log'))
     if not os.path.exists(log_path):
@@ -158,7 +178,7 @@ def gen_evaluator_args(target,
         '-o', output_dir, '-t', target, '-f', *fuzzers, '-q', 'queue', '-c',
         'crashes', '-T', timeout, '--input', seed, '--binary', binary,
         '--binary_crash', binary_crash, f'--args={target_args}', '--mode',
-        crash_mode, '--live', '--sleep', 10
+        crash_mode, '--live'
     ]
     if input_only:
         evaluator_args.append('--input-only')
@@ -178,12 +198,13 @@ def run_evaluator(target, fuzzers, output_dir, timeout, input_dir, empty_seed,
 def thread_run_evaluator(target, fuzzers, output_dir, timeout, input_dir,
                          empty_seed, crash_mode, input_only):
     global EVALUTOR_THREAD
-    if EVALUTOR_THREAD: return
-    thread_evaluator = run_evaluator(target, fuzzers, output_dir, timeout,
-                                     input_dir, empty_seed, crash_mode,
-                                     input_only)
+    with EVALUTOR_LOCK:
+        if EVALUTOR_THREAD: return
+        thread_evaluator = run_evaluator(target, fuzzers, output_dir, timeout,
+                                         input_dir, empty_seed, crash_mode,
+                                         input_only)
 
-    EVALUTOR_THREAD = thread_evaluator
+        EVALUTOR_THREAD = thread_evaluator
 
 
 def thread_run_fuzzer(target,
@@ -247,3 +268,15 @@ def thread_run_global(target,
 
 def sync():
     evaluator.sync()
+
+
+def sync_partial(forwarded):
+    evaluator.sync_partial(forwarded)
+
+
+def enable_cmin():
+    evaluator.enable_cmin()
+
+
+def enable_resume():
+    evaluator.enable_resume()
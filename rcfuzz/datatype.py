@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 import logging
 import os
+import struct
+import tempfile
 import time
+from typing import Any, Dict, Iterable, Optional, Set
 
 import numpy as np
 from bitarray import bitarray
@@ -13,27 +16,58 @@ SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
 class Bitmap(object):
     # NOTE: copy from cupid, but we actually use only use 16 bits during fuzzing (/d/p/justafl/)
     BITMAP_SIZE = 1048576
+    # header of saved bitmaps: magic, version of the map
+    HEADER = struct.Struct('<4sQ')
+    MAGIC = b'RCBM'
 
     def __init__(self, bitmap=None, bitmap_path=None):
+        self.version = None
         if bitmap is not None:
             self.bitmap = bitmap
             return
         assert bitmap_path
         self.bitmap = None
-        counter = 0
-        while os.stat(bitmap_path).st_size != Bitmap.BITMAP_SIZE:
-            time.sleep(0.1)
-            if counter > 100:
-                break
-            counter += 1
-        if counter:
-            logger.critical(f'bitmap counter: {counter}')
         with open(bitmap_path, 'rb') as f:
             content = f.read()
-            self.bitmap = np.array(bytearray(content), dtype='uint8')
-            # has beed normalized by quickcov
+        if content[:len(Bitmap.MAGIC)] == Bitmap.MAGIC:
+            _, self.version = Bitmap.HEADER.unpack_from(content)
+            content = content[Bitmap.HEADER.size:]
+        if len(content) != Bitmap.BITMAP_SIZE:
+            logger.critical(f'{bitmap_path} has size {len(content)}')
+        self.bitmap = np.array(bytearray(content), dtype='uint8')
+        # has beed normalized by quickcov
         assert self
 
+    @staticmethod
+    def read_version(bitmap_path) -> Optional[int]:
+        '''
+        version in the header, without loading the map
+        '''
+        with open(bitmap_path, 'rb') as f:
+            header = f.read(Bitmap.HEADER.size)
+        if len(header) != Bitmap.HEADER.size:
+            return None
+        magic, version = Bitmap.HEADER.unpack(header)
+        if magic != Bitmap.MAGIC:
+            return None
+        return version
+
+    def save(self, bitmap_path, version):
+        '''
+        write to a temporary file and rename it, readers never see a
+        partial map and need no lock
+        '''
+        directory = os.path.dirname(os.path.abspath(bitmap_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.bitmap-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(Bitmap.HEADER.pack(Bitmap.MAGIC, version))
+                f.write(np.ascontiguousarray(self.bitmap, dtype='uint8'))
+            os.replace(tmp_path, bitmap_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
     @classmethod
     def empty(cls):
         b = bytearray([0]) * cls.BITMAP_SIZE
@@ -152,6 +186,53 @@ class Bitmap(object):
         return Bitmap(bitmap=self.bitmap)
 
 
+class GenerationSet(object):
+    '''
+    per-fuzzer sets sharing one table
+
+    every item is tagged with the generation it was first added in. A
+    fuzzer sees the items added before its last sync plus its own overlay,
+    so a sync only bumps the generation and drops the overlays instead of
+    copying the whole table to every fuzzer.
+    '''
+    GLOBAL = 'global'
+
+    def __init__(self, names: Iterable[str]):
+        self.generation = 0
+        self.table: Dict[Any, int] = {}
+        self.synced: Dict[str, int] = {}
+        self.overlay: Dict[str, Set] = {}
+        for name in names:
+            if name == GenerationSet.GLOBAL: continue
+            self.synced[name] = 0
+            self.overlay[name] = set()
+
+    def add(self, name, item):
+        self.table.setdefault(item, self.generation)
+        if name != GenerationSet.GLOBAL:
+            self.overlay[name].add(item)
+
+    def contains(self, name, item) -> bool:
+        if name == GenerationSet.GLOBAL:
+            return item in self.table
+        if item in self.overlay[name]:
+            return True
+        generation = self.table.get(item)
+        return generation is not None and generation < self.synced[name]
+
+    def sync(self):
+        '''
+        every fuzzer sees everything added so far
+        '''
+        self.generation += 1
+        for name in self.synced:
+            self.synced[name] = self.generation
+            self.overlay[name] = set()
+
+    def __len__(self):
+        return len(self.table)
+
+
 class Bugmap(object):
     BUG_MAP_SIZE = 2**20
 
@@ -240,6 +321,21 @@ def test_bitmap():
     print(empty_bitmap)
 
 
+def test_generation_set():
+    s = GenerationSet(['afl', 'qsym', 'global'])
+    s.add('afl', 'a')
+    assert s.contains('afl', 'a')
+    assert s.contains('global', 'a')
+    assert not s.contains('qsym', 'a')
+    s.sync()
+    assert s.contains('qsym', 'a')
+    s.add('qsym', 'b')
+    assert s.contains('qsym', 'b')
+    assert not s.contains('afl', 'b')
+    s.sync()
+    assert s.contains('afl', 'b')
+
+
 def test_bugmap():
     print(Bugmap.BUG_MAP_SIZE)
     empty_bm = Bugmap.empty()
@@ -250,6 +346,7 @@ def test_bugmap():
 
 def main():
     test_bitmap()
+    test_generation_set()
     test_bugmap()
 
 
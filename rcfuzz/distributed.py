@@ -0,0 +1,841 @@
+#!/usr/bin/env python3
+'''
+multi-node mode: one coordinator, one agent per node
+
+an agent is a normal rcfuzz process started with --coordinator, its
+fuzzers and evaluator stay local. agents and coordinator exchange frames
+over TCP or a unix socket:
+
+    HELLO     agent => coordinator   json {node, fuzzers, cores}
+    HAVE      both ways              md5 digests of seeds the sender has
+    WANT      both ways              md5 digests the sender lacks
+    BLOB      both ways              digest + content of one seed
+    COVERAGE  agent => coordinator   fuzzer + edges new since its last report
+    ALLOC     coordinator => agent   json {fuzzer: cores}
+
+seeds are content addressed, a seed crosses the network once per node.
+coverage is sent as deltas, sorted edge ids gap-encoded and compressed.
+the coordinator keeps the global bitmap and runs Thompson sampling over
+every fuzzer of every node: a fuzzer succeeds in an interval when it adds
+edges to the global bitmap, each core of a node then goes to the best
+sample among the fuzzers of that node
+'''
+import hashlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+# FIXME
+if not __package__:
+    sys.path.append(
+        os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    __package__ = "rcfuzz"
+
+import numpy as np
+from tap import Tap
+
+from . import thompson
+from .datatype import Bitmap
+from .mytype import Fuzzer
+
+logger = logging.getLogger('rcfuzz.distributed')
+
+MAGIC = b'RCDP'
+# magic, kind, payload length
+HEADER = struct.Struct('<4sBI')
+MAX_PAYLOAD = 64 << 20
+
+HELLO = 1
+HAVE = 2
+WANT = 3
+BLOB = 4
+COVERAGE = 5
+ALLOC = 6
+
+DIGEST_SIZE = 16
+# digests per HAVE / WANT frame
+DIGEST_BATCH = 4096
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def parse_address(address: str):
+    '''
+    unix:/path/to/socket or host:port
+    '''
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+def _recv_exact(sock, size) -> Optional[bytes]:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1 << 20))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def send_frame(sock, kind: int, payload: bytes):
+    sock.sendall(HEADER.pack(MAGIC, kind, len(payload)) + payload)
+
+
+def recv_frame(sock) -> Optional[Tuple[int, bytes]]:
+    '''
+    None once the peer closed the connection
+    '''
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    magic, kind, size = HEADER.unpack(header)
+    if magic != MAGIC or size > MAX_PAYLOAD:
+        raise ProtocolError(f'bad frame header {header!r}')
+    payload = _recv_exact(sock, size) if size else b''
+    if payload is None:
+        return None
+    return kind, payload
+
+
+def encode_json(obj) -> bytes:
+    return json.dumps(obj).encode()
+
+
+def decode_json(payload: bytes):
+    return json.loads(payload.decode())
+
+
+def encode_digests(digests: List[str]) -> bytes:
+    return b''.join(bytes.fromhex(d) for d in digests)
+
+
+def decode_digests(payload: bytes) -> List[str]:
+    return [
+        payload[i:i + DIGEST_SIZE].hex()
+        for i in range(0, len(payload), DIGEST_SIZE)
+    ]
+
+
+def encode_blob(digest: str, data: bytes) -> bytes:
+    return bytes.fromhex(digest) + data
+
+
+def decode_blob(payload: bytes) -> Tuple[str, bytes]:
+    digest = payload[:DIGEST_SIZE].hex()
+    data = payload[DIGEST_SIZE:]
+    if hashlib.md5(data).hexdigest() != digest:
+        raise ProtocolError(f'blob {digest} does not match its content')
+    return digest, data
+
+
+def encode_delta(fuzzer: Fuzzer, edges: np.ndarray) -> bytes:
+    name = fuzzer.encode()
+    gaps = np.diff(np.asarray(edges, dtype=np.uint32), prepend=np.uint32(0))
+    return (struct.pack('<B', len(name)) + name +
+            zlib.compress(gaps.astype('<u4').tobytes(), 1))
+
+
+def decode_delta(payload: bytes) -> Tuple[Fuzzer, np.ndarray]:
+    size = payload[0]
+    fuzzer = payload[1:1 + size].decode()
+    gaps = np.frombuffer(zlib.decompress(payload[1 + size:]), dtype='<u4')
+    return fuzzer, np.cumsum(gaps, dtype=np.uint32)
+
+
+class BlobStore(object):
+    '''
+    seeds on disk by md5, root/ab/abcd...
+    '''
+    def __init__(self, root):
+        self.root = Path(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.digests: Set[str] = set()
+        for path in self.root.glob('*/*'):
+            if len(path.name) == 2 * DIGEST_SIZE:
+                self.digests.add(path.name)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def __contains__(self, digest) -> bool:
+        return digest in self.digests
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def list(self) -> List[str]:
+        with self.lock:
+            return list(self.digests)
+
+    def put(self, digest: str, data: bytes) -> bool:
+        '''
+        return False if already stored
+        '''
+        with self.lock:
+            if digest in self.digests:
+                return False
+            path = self.path(digest)
+            os.makedirs(path.parent, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.digests.add(digest)
+            return True
+
+    def get(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class Connection(object):
+    '''
+    a socket shared by a receiving thread and senders
+    '''
+    def __init__(self, sock):
+        self.sock = sock
+        self.send_lock = threading.Lock()
+
+    def send(self, kind: int, payload: bytes):
+        with self.send_lock:
+            send_frame(self.sock, kind, payload)
+
+    def send_digests(self, kind: int, digests: List[str]):
+        for i in range(0, len(digests), DIGEST_BATCH):
+            self.send(kind, encode_digests(digests[i:i + DIGEST_BATCH]))
+
+    def recv(self) -> Optional[Tuple[int, bytes]]:
+        return recv_frame(self.sock)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class AgentConnection(Connection):
+    def __init__(self, sock):
+        super().__init__(sock)
+        self.node: Optional[str] = None
+        self.fuzzers: List[Fuzzer] = []
+        self.cores = 1.0
+        # digests the agent has
+        self.have: Set[str] = set()
+        self.allocation: Dict[Fuzzer, float] = {}
+
+
+class CoordinatorHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.coordinator.handle(AgentConnection(self.request))
+
+
+class CoordinatorTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class CoordinatorUnixServer(socketserver.ThreadingMixIn,
+                            socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Coordinator(object):
+    def __init__(self, root, diff=100, threshold=1):
+        self.root = Path(root)
+        self.blobs = BlobStore(self.root / 'blobs')
+        self.lock = threading.Lock()
+        self.bitmap = np.zeros(Bitmap.BITMAP_SIZE, dtype=np.uint8)
+        self.agents: Dict[str, AgentConnection] = {}
+        self.tsFuzzers: Dict[Fuzzer, thompson.fuzzer] = {}
+        self.diff = diff
+        # new global edges a fuzzer needs in an interval to succeed
+        self.threshold = threshold
+        # fuzzer => new global edges since the last allocation
+        self.gain: Dict[Fuzzer, int] = {}
+        self.servers: List[socketserver.BaseServer] = []
+        self.rounds = 0
+
+    def serve(self, address: str):
+        family, addr = parse_address(address)
+        server: socketserver.BaseServer
+        if family == socket.AF_UNIX:
+            if os.path.exists(addr):
+                os.remove(addr)
+            server = CoordinatorUnixServer(addr, CoordinatorHandler)
+        else:
+            server = CoordinatorTCPServer(addr, CoordinatorHandler)
+        server.coordinator = self
+        threading.Thread(target=server.serve_forever,
+                         name='coordinator',
+                         daemon=True).start()
+        self.servers.append(server)
+        logger.info(f'coordinator on {server.server_address}')
+        return server.server_address
+
+    def shutdown(self):
+        while self.servers:
+            server = self.servers.pop()
+            server.shutdown()
+            server.server_close()
+        with self.lock:
+            agents = list(self.agents.values())
+        for conn in agents:
+            conn.close()
+
+    def handle(self, conn: AgentConnection):
+        try:
+            while True:
+                frame = conn.recv()
+                if frame is None:
+                    break
+                self.on_frame(conn, *frame)
+        except (ProtocolError, OSError) as e:
+            logger.warning(f'agent {conn.node}: {e}')
+        finally:
+            with self.lock:
+                if conn.node and self.agents.get(conn.node) is conn:
+                    del self.agents[conn.node]
+            logger.info(f'agent {conn.node} left')
+
+    def on_frame(self, conn: AgentConnection, kind: int, payload: bytes):
+        if kind == HELLO:
+            hello = decode_json(payload)
+            conn.node = hello['node']
+            conn.fuzzers = hello['fuzzers']
+            conn.cores = hello['cores']
+            with self.lock:
+                self.agents[conn.node] = conn
+                for fuzzer in conn.fuzzers:
+                    if fuzzer not in self.tsFuzzers:
+                        self.tsFuzzers[fuzzer] = thompson.fuzzer()
+                        self.tsFuzzers[fuzzer].diff = self.diff
+                        self.gain[fuzzer] = 0
+            logger.info(f'agent {conn.node} joined: {hello}')
+            # the corpus so far, the agent asks for what it lacks
+            conn.send_digests(HAVE, self.blobs.list())
+            self.allocate_node(conn)
+        elif kind == HAVE:
+            digests = decode_digests(payload)
+            conn.have.update(digests)
+            wanted = [d for d in digests if d not in self.blobs]
+            if wanted:
+                conn.send_digests(WANT, wanted)
+        elif kind == WANT:
+            for digest in decode_digests(payload):
+                data = self.blobs.get(digest)
+                if data is None:
+                    continue
+                conn.send(BLOB, encode_blob(digest, data))
+                conn.have.add(digest)
+        elif kind == BLOB:
+            digest, data = decode_blob(payload)
+            conn.have.add(digest)
+            if self.blobs.put(digest, data):
+                self.announce(digest)
+        elif kind == COVERAGE:
+            fuzzer, edges = decode_delta(payload)
+            with self.lock:
+                new = edges[self.bitmap[edges] == 0]
+                self.bitmap[new] = 1
+                self.gain[fuzzer] = self.gain.get(fuzzer, 0) + len(new)
+        else:
+            raise ProtocolError(f'unexpected frame {kind}')
+
+    def announce(self, digest: str):
+        with self.lock:
+            agents = list(self.agents.values())
+        for conn in agents:
+            if digest in conn.have:
+                continue
+            try:
+                conn.send_digests(HAVE, [digest])
+            except OSError:
+                pass
+
+    def allocate_node(self, conn: AgentConnection):
+        '''
+        one Thompson sample per core among the fuzzers of the node
+        '''
+        if not conn.fuzzers:
+            return
+        slots = max(1, int(round(conn.cores)))
+        allocation = {fuzzer: 0.0 for fuzzer in conn.fuzzers}
+        with self.lock:
+            candidates = {f: self.tsFuzzers[f] for f in conn.fuzzers}
+            for _ in range(slots):
+                picked = thompson.selectFuzzer(candidates)[0]
+                allocation[picked] += conn.cores / slots
+        conn.allocation = allocation
+        try:
+            conn.send(ALLOC, encode_json(allocation))
+        except OSError:
+            pass
+
+    def allocate(self):
+        '''
+        score the last interval, then allocate the cores of every node
+        '''
+        with self.lock:
+            agents = list(self.agents.values())
+            gain = self.gain
+            self.gain = {fuzzer: 0 for fuzzer in self.tsFuzzers}
+            running = set()
+            for conn in agents:
+                running.update(f for f, cores in conn.allocation.items()
+                               if cores > 0)
+            for fuzzer in sorted(running):
+                criteria = int(gain.get(fuzzer, 0) >= self.threshold)
+                thompson.updateFuzzerCount(self.tsFuzzers, [fuzzer],
+                                           criteria)
+        for conn in agents:
+            self.allocate_node(conn)
+        self.rounds += 1
+        self.write_state(gain)
+
+    def write_state(self, gain):
+        with self.lock:
+            state = {
+                'timestamp': time.time(),
+                'rounds': self.rounds,
+                'edges': int(np.count_nonzero(self.bitmap)),
+                'blobs': len(self.blobs),
+                'gain': gain,
+                'nodes': {
+                    node: {
+                        'cores': conn.cores,
+                        'allocation': conn.allocation
+                    }
+                    for node, conn in self.agents.items()
+                },
+                'thompson': {
+                    fuzzer: {
+                        'S': ts.S,
+                        'F': ts.F
+                    }
+                    for fuzzer, ts in self.tsFuzzers.items()
+                }
+            }
+        tmp_path = self.root / 'coordinator.json.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.root / 'coordinator.json')
+
+    def run(self, interval: int):
+        while True:
+            time.sleep(interval)
+            self.allocate()
+
+
+class Agent(object):
+    '''
+    backend: new_seeds() => [(digest, path)], deliver(digest, data),
+    bitmap(fuzzer) => 0/1 map or None, apply(allocation)
+    '''
+    def __init__(self, node: str, fuzzers: List[Fuzzer], cores: float,
+                 backend):
+        self.node = node
+        self.fuzzers = fuzzers
+        self.cores = cores
+        self.backend = backend
+        self.conn: Optional[Connection] = None
+        # digest => path of local seeds, for WANT
+        self.local: Dict[str, str] = {}
+        # digests the coordinator has
+        self.known: Set[str] = set()
+        self.reported: Dict[Fuzzer, np.ndarray] = {}
+        self.allocation: Optional[Dict[Fuzzer, float]] = None
+        self.receiver: Optional[threading.Thread] = None
+
+    def connect(self, address: str):
+        family, addr = parse_address(address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(addr)
+        self.conn = Connection(sock)
+        self.conn.send(
+            HELLO,
+            encode_json({
+                'node': self.node,
+                'fuzzers': self.fuzzers,
+                'cores': self.cores
+            }))
+        self.receiver = threading.Thread(target=self.receive,
+                                         name=f'agent-{self.node}',
+                                         daemon=True)
+        self.receiver.start()
+
+    def receive(self):
+        assert self.conn
+        try:
+            while True:
+                frame = self.conn.recv()
+                if frame is None:
+                    break
+                self.on_frame(*frame)
+        except (ProtocolError, OSError) as e:
+            logger.warning(f'coordinator: {e}')
+        logger.info('disconnected from the coordinator')
+
+    def on_frame(self, kind: int, payload: bytes):
+        assert self.conn
+        if kind == HAVE:
+            digests = decode_digests(payload)
+            wanted = [
+                d for d in digests if d not in self.known and d not in self.local
+            ]
+            self.known.update(digests)
+            if wanted:
+                self.conn.send_digests(WANT, wanted)
+        elif kind == WANT:
+            for digest in decode_digests(payload):
+                path = self.local.get(digest)
+                if path is None:
+                    continue
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    continue
+                self.conn.send(BLOB, encode_blob(digest, data))
+                self.known.add(digest)
+        elif kind == BLOB:
+            digest, data = decode_blob(payload)
+            self.known.add(digest)
+            self.backend.deliver(digest, data)
+        elif kind == ALLOC:
+            self.allocation = decode_json(payload)
+            self.backend.apply(self.allocation)
+        else:
+            raise ProtocolError(f'unexpected frame {kind}')
+
+    def step(self):
+        '''
+        announce new local seeds and report new edges
+        '''
+        assert self.conn
+        new = []
+        for digest, path in self.backend.new_seeds():
+            if digest in self.local or digest in self.known:
+                continue
+            self.local[digest] = str(path)
+            new.append(digest)
+        if new:
+            self.conn.send_digests(HAVE, new)
+        for fuzzer in self.fuzzers:
+            bitmap = self.backend.bitmap(fuzzer)
+            if bitmap is None:
+                continue
+            previous = self.reported.get(fuzzer)
+            if previous is None:
+                edges = np.flatnonzero(bitmap)
+            else:
+                edges = np.flatnonzero(bitmap > previous)
+            self.reported[fuzzer] = bitmap
+            if len(edges):
+                self.conn.send(COVERAGE, encode_delta(fuzzer, edges))
+
+    def run(self, interval: int):
+        while self.receiver is not None and self.receiver.is_alive():
+            try:
+                self.step()
+            except OSError as e:
+                logger.warning(f'coordinator: {e}')
+                return
+            time.sleep(interval)
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+
+class RcfuzzBackend(object):
+    '''
+    seeds of the local fuzzers as found by the watchers, coverage from the
+    evaluator. remote seeds are linked into the rcfuzz/queue of every
+    local fuzzer by import_pending(), from the scheduler thread which also
+    runs sync
+    '''
+    def __init__(self, target: str, fuzzers: List[Fuzzer], output: Path):
+        self.target = target
+        self.fuzzers = fuzzers
+        self.output = output
+        self.blobs = BlobStore(output / 'distributed')
+        self.last_index: Dict = {}
+        self.pending: Deque[str] = deque()
+        self.allocation: Optional[Dict[Fuzzer, float]] = None
+
+    def new_seeds(self) -> List[Tuple[str, str]]:
+        from . import sync, watcher
+        ret = []
+        for fuzzer in self.fuzzers:
+            for w in list(watcher.WATCHERS.get(fuzzer, [])):
+                last_index = self.last_index.get(w, -1)
+                queue_len = len(w.test_case_queue)
+                for i in range(last_index + 1, queue_len):
+                    path = w.test_case_queue[i]
+                    if w._ignore_test_case(path):
+                        continue
+                    try:
+                        ret.append((sync.checksum(str(path)), str(path)))
+                    except FileNotFoundError:
+                        continue
+                self.last_index[w] = queue_len - 1
+        return ret
+
+    def deliver(self, digest: str, data: bytes):
+        if self.blobs.put(digest, data):
+            self.pending.append(digest)
+
+    def import_pending(self) -> int:
+        from . import sync
+        imported = 0
+        sync.init(self.target, self.fuzzers, self.output)
+        while self.pending:
+            digest = self.pending.popleft()
+            path = self.blobs.path(digest)
+            sync.hashmap[str(path)] = digest
+            test_case = sync.TestCase(path)
+            # NOTE: the copies the fuzzers make are not synced again
+            sync.global_processed_checksum.add(digest)
+            for fuzzer in self.fuzzers:
+                if digest in sync.processed_checksum[fuzzer]:
+                    continue
+                sync.processed_checksum[fuzzer].add(digest)
+                sync.sync_test_case(self.target, fuzzer, self.output,
+                                    test_case)
+            imported += 1
+        return imported
+
+    def bitmap(self, fuzzer: Fuzzer) -> Optional[np.ndarray]:
+        '''
+        edges of the seeds fuzzer found itself, after a local sync every
+        fuzzer shares the global map and would be credited with all edges
+        '''
+        from . import evaluator
+        try:
+            return evaluator.get_own_bitmap(fuzzer)
+        except KeyError:
+            # evaluator not started yet
+            return None
+
+    def apply(self, allocation: Dict[Fuzzer, float]):
+        self.allocation = allocation
+
+
+class ArgsParser(Tap):
+    listen: List[str]
+    output: Path
+    interval: int
+    diff: int
+    threshold: int
+
+    def configure(self):
+        self.add_argument("--listen",
+                          "-l",
+                          nargs='+',
+                          required=True,
+                          help="host:port or unix:/path/to/socket")
+        self.add_argument("--output",
+                          "-o",
+                          required=True,
+                          help="seed blobs and coordinator.json")
+        self.add_argument("--interval",
+                          type=int,
+                          default=600,
+                          help="seconds between cpu allocations")
+        self.add_argument("--diff",
+                          type=int,
+                          default=100,
+                          help="the branch difficulty")
+        self.add_argument(
+            "--threshold",
+            type=int,
+            default=1,
+            help="new global edges for a fuzzer to succeed in an interval")
+
+
+def main():
+    args = ArgsParser().parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    coordinator = Coordinator(args.output, args.diff, args.threshold)
+    for address in args.listen:
+        coordinator.serve(address)
+    try:
+        coordinator.run(args.interval)
+    finally:
+        coordinator.shutdown()
+
+
+def test():
+    import tempfile
+
+    def wait_for(condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition():
+            assert time.time() < deadline, 'timed out'
+            time.sleep(0.01)
+
+    class DirectoryBackend(object):
+        def __init__(self, root):
+            self.seeds = Path(root) / 'seeds'
+            self.received: Dict[str, bytes] = {}
+            self.bitmaps: Dict[Fuzzer, np.ndarray] = {}
+            self.allocation = None
+            os.makedirs(self.seeds)
+
+        def add_seed(self, data: bytes):
+            with open(self.seeds / hashlib.md5(data).hexdigest(), 'wb') as f:
+                f.write(data)
+
+        def new_seeds(self):
+            return [(p.name, str(p)) for p in self.seeds.iterdir()]
+
+        def deliver(self, digest, data):
+            self.received[digest] = data
+
+        def bitmap(self, fuzzer):
+            return self.bitmaps.get(fuzzer)
+
+        def apply(self, allocation):
+            self.allocation = allocation
+
+    edges = np.array([3, 4, 1000, 1 << 19], dtype=np.uint32)
+    fuzzer, decoded = decode_delta(encode_delta('afl', edges))
+    assert fuzzer == 'afl' and list(decoded) == list(edges)
+    assert decode_digests(encode_digests(['00' * 16, 'ff' * 16])) == [
+        '00' * 16, 'ff' * 16
+    ]
+    try:
+        decode_blob(encode_blob('00' * 16, b'data'))
+        assert False
+    except ProtocolError:
+        pass
+
+    logging.getLogger('autofz.thompson').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        coordinator = Coordinator(d / 'coordinator', threshold=1)
+        tcp_address = coordinator.serve('127.0.0.1:0')
+        unix_address = f'unix:{d / "coordinator.sock"}'
+        coordinator.serve(unix_address)
+        backend_a = DirectoryBackend(d / 'a')
+        backend_b = DirectoryBackend(d / 'b')
+        agent_a = Agent('a', ['afl', 'qsym'], 2, backend_a)
+        agent_b = Agent('b', ['afl', 'angora'], 1, backend_b)
+        agent_a.connect(f'{tcp_address[0]}:{tcp_address[1]}')
+        agent_b.connect(unix_address)
+        wait_for(lambda: backend_a.allocation and backend_b.allocation)
+        assert sum(backend_a.allocation.values()) == 2
+        assert set(backend_b.allocation) == {'afl', 'angora'}
+
+        backend_a.add_seed(b'seed from a')
+        bitmap = np.zeros(Bitmap.BITMAP_SIZE, dtype=np.uint8)
+        bitmap[[1, 2, 3]] = 1
+        backend_a.bitmaps['qsym'] = bitmap
+        agent_a.step()
+        digest = hashlib.md5(b'seed from a').hexdigest()
+        wait_for(lambda: digest in backend_b.received)
+        assert backend_b.received[digest] == b'seed from a'
+        assert digest not in backend_a.received
+        # already delivered, not announced back
+        backend_b.add_seed(b'seed from a')
+        agent_b.step()
+        assert not agent_b.local
+
+        wait_for(lambda: coordinator.gain.get('qsym'))
+        bitmap_b = np.zeros(Bitmap.BITMAP_SIZE, dtype=np.uint8)
+        bitmap_b[[3, 4]] = 1
+        backend_b.bitmaps['angora'] = bitmap_b
+        agent_b.step()
+        wait_for(lambda: coordinator.gain.get('angora'))
+        assert coordinator.gain == {'afl': 0, 'qsym': 3, 'angora': 1}
+        # no new edges, no new report
+        agent_b.step()
+        before = (dict(backend_a.allocation), dict(backend_b.allocation))
+        backend_a.allocation = backend_b.allocation = None
+        coordinator.allocate()
+        wait_for(lambda: backend_a.allocation and backend_b.allocation)
+        for fuzzer in ['qsym', 'angora', 'afl']:
+            ts = coordinator.tsFuzzers[fuzzer]
+            running = any(a.get(fuzzer) for a in before)
+            assert (ts.S, ts.F) != (1, 1) or not running
+        with open(d / 'coordinator' / 'coordinator.json') as f:
+            state = json.load(f)
+        assert state['edges'] == 4 and state['blobs'] == 1
+
+        # a late node gets the corpus so far
+        backend_c = DirectoryBackend(d / 'c')
+        agent_c = Agent('c', ['afl'], 1, backend_c)
+        agent_c.connect(unix_address)
+        wait_for(lambda: digest in backend_c.received)
+        assert backend_c.allocation == {'afl': 1}
+        for agent in [agent_a, agent_b, agent_c]:
+            agent.close()
+        coordinator.shutdown()
+
+    # after a local sync every fuzzer shares the global map of the
+    # evaluator, each one is still credited with its own edges only
+    from . import evaluator
+    from .datatype import GenerationSet
+    saved = (getattr(evaluator, 'FUZZERS',
+                     None), evaluator.save_fuzzer_bitmap)
+    evaluator.FUZZERS = ['afl', 'qsym']
+    evaluator.save_fuzzer_bitmap = lambda fuzzer: None
+    evaluator.PROCESSED_CHECKSUM = GenerationSet(evaluator.get_all_names())
+    evaluator.PROCESSED_FILE = GenerationSet(evaluator.get_all_names())
+    for name in evaluator.get_all_names():
+        evaluator.FUZZER_BITMAP[name] = evaluator.AFLBitmap.empty()
+        evaluator.BITMAP_VERSION[name] = 0
+    for name in evaluator.FUZZERS:
+        evaluator.OWN_BITMAP[name] = evaluator.AFLBitmap.empty()
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            d = Path(d)
+            coordinator = Coordinator(d / 'coordinator', threshold=1)
+            address = f'unix:{d / "coordinator.sock"}'
+            coordinator.serve(address)
+            backend = DirectoryBackend(d / 'local')
+            backend.bitmap = RcfuzzBackend('t', evaluator.FUZZERS,
+                                           d / 'local').bitmap
+            agent = Agent('local', evaluator.FUZZERS, 1, backend)
+            agent.connect(address)
+            wait_for(lambda: backend.allocation)
+            evaluator.add_fuzzer_edges('afl', np.array([1, 2]))
+            evaluator.add_fuzzer_edges('qsym', np.array([3]))
+            agent.step()
+            wait_for(lambda: sum(coordinator.gain.values()) == 3)
+            evaluator.add_fuzzer_edges('afl', np.array([5]))
+            evaluator.add_fuzzer_edges('qsym', np.array([4]))
+            evaluator.sync()
+            assert evaluator.get_fuzzer_bitmap('afl')[4] == 1
+            agent.step()
+            wait_for(lambda: sum(coordinator.gain.values()) == 5)
+            assert coordinator.gain == {'afl': 3, 'qsym': 2}
+            agent.close()
+            coordinator.shutdown()
+    finally:
+        evaluator.FUZZERS, evaluator.save_fuzzer_bitmap = saved
+    print('ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,35 @@
 #!/usr/bin/env python3
-import copy
 import ctypes
 import glob
 import hashlib
+import itertools
 import json
 import logging
 import os
 import pathlib
+import queue
 import random
 import signal
 import subprocess
 import sys
 import threading
 import time
+from collections import deque
 from enum import Enum
 from multiprocessing import Pipe, Process, Queue
 from pathlib import Path
 from shutil import copy2
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 
 import filelock
 import numpy as np
 from tap import Tap
 
+from . import bugdb
 from . import config as Config
-from . import utils, watcher
+from . import cmin, metrics, seedstore, tracing, utils, watcher
 from .common import IS_DEBUG
+from .datatype import Bitmap, GenerationSet
 from .mytype import Fuzzer, Fuzzers, FuzzerType, SeedType
 
 config = Config.CONFIG
@@ -41,11 +45,14 @@ class ArgsParser(Tap):
     binary_crash: str
     args: str
     live: bool
-    sleep: int
     timeout: str
     mode: str
     input: str
     input_only: bool
+    crash_fingerprint_limit: int
+    crash_verify_rate: float
+    lag_threshold: int
+    shed_sample_rate: float
 
     def configure(self):
         self.add_argument("-o",
@@ -74,12 +81,6 @@ class ArgsParser(Tap):
                           required=True)
         self.add_argument("--args", type=str, help="argument", default="")
         self.add_argument("--live", action='store_true', default=False)
-        self.add_argument(
-            "--sleep",
-            type=int,
-            help=
-            "In --live mode, # of seconds to sleep between checking for new queue files",
-            default=10)
         self.add_argument("-T",
                           "--timeout",
                           type=str,
@@ -99,6 +100,29 @@ class ArgsParser(Tap):
                           help="Only evalaute seeds",
                           action="store_true",
                           default=False)
+        self.add_argument(
+            "--crash-fingerprint-limit",
+            type=int,
+            help=
+            "skip ASAN triage of crashes whose coverage fingerprint was seen more than N times (0 disables)",
+            default=5)
+        self.add_argument(
+            "--crash-verify-rate",
+            type=float,
+            help=
+            "fraction of skipped crashes that still go through ASAN triage",
+            default=0.05)
+        self.add_argument(
+            "--lag-threshold",
+            type=int,
+            help=
+            "--live: queue entries older than N seconds are sampled, the rest is deferred until the evaluator is idle (0 disables)",
+            default=600)
+        self.add_argument(
+            "--shed-sample-rate",
+            type=float,
+            help="fraction of lagging queue entries still evaluated in order",
+            default=0.1)
 
 
 COVERAGE_LOCK_PATH: str = os.path.join(
@@ -117,29 +141,39 @@ MAP = {}
 ASAN_OPTIONS = 'stack_trace_format="####%p####%f####%S####%n####"'
 
 INDEX = {}
-INDEX_UNIQUE_BUG = {}
-INDEX_UNIQUE_BUG_IP = {}
-INDEX_UNIQUE_BUG_TRACE = {}
-INDEX_UNIQUE_BUG_TRACE3 = {}
 
 EXECUTOR = {}
 
+# executor used only to fingerprint crashes, keeps their coverage out of
+# the per-fuzzer virgin bits
+CRASH_EXECUTOR: Optional['AFLForkserverProcess'] = None
+
+# NOTE: maps are shared between fuzzers after sync, never modify them in
+# place, always rebind (|=)
 FUZZER_BITMAP = {}
+# edges of the seeds fuzzer found itself, never shared by sync()
+OWN_BITMAP: Dict[Fuzzer, 'AFLBitmap'] = {}
+# bumped whenever FUZZER_BITMAP[fuzzer] gains edges, saved in the bitmap header
+BITMAP_VERSION: Dict[Fuzzer, int] = {}
+SAVED_BITMAP_VERSION: Dict[Fuzzer, int] = {}
+# the persistence stage and sync() both save, an older map must not
+# replace a newer one
+SAVE_BITMAP_LOCK = threading.Lock()
 
 logID = 0
 LAST = None
 
-bug_id: Dict[Fuzzer, Dict[str, int]] = {}
-bug_id_ip: Dict[Fuzzer, Dict[str, int]] = {}
-bug_id_trace: Dict[Fuzzer, Dict[str, int]] = {}
-bug_id_trace3: Dict[Fuzzer, Dict[str, int]] = {}
+hashmap: Dict[str, str] = dict()
 
-crash_set: Dict[Fuzzer, Set] = {}
-crash_set_ip: Dict[Fuzzer, Set] = {}
-crash_set_trace: Dict[Fuzzer, Set] = {}
-crash_set_trace3: Dict[Fuzzer, Set] = {}
+# coverage fingerprint => {'count': #crashes, 'bug': ASAN hashes}
+CRASH_FINGERPRINT: Dict[str, Dict[str, Any]] = {}
+CRASH_SKIPPED: Dict[Fuzzer, int] = {}
 
-hashmap: Dict[str, str] = dict()
+# seed checksum => edges hit, OUTPUT/eval/seeds
+SEED_STORE: Optional[seedstore.SeedStore] = None
+
+# continue the evaluation of an earlier run on the same output, see restore
+RESUME = False
 
 logger = logging.getLogger('rcfuzz.evaluator')
 
@@ -197,6 +231,16 @@ class AFLBitmap:
             self.bitmap = np.array(b)
             del b
 
+    def has_new_bits(self, other):
+        '''
+        does other cover edges not in self
+        '''
+        if len(other.bitmap) == 0:
+            return False
+        if len(self.bitmap) == 0:
+            return bool(np.any(other.bitmap))
+        return bool(np.any(other.bitmap > self.bitmap))
+
     def count(self):
         return np.sum(self.bitmap)
 
@@ -313,6 +357,10 @@ class AFLForkserverExecuter(object):
         self._reset.restype = None
         self._reset.argtypes = None
 
+        # classified hit counts of the last execution
+        self._trace_bits = ctypes.POINTER(ctypes.c_uint8).in_dll(
+            self.aflforkserverlib, 'trace_bits')
+
         self.input_file_path_c = (self.input_file_path +
                                   "\x00").encode('ascii')
         self.setup(self.input_file_path_c, int(False))
@@ -352,6 +400,21 @@ class AFLForkserverExecuter(object):
         cov = AFLBitmap(self._get_bitmap().contents)
         return cov
 
+    def get_trace_checksum(self):
+        trace = ctypes.string_at(self._trace_bits, self.MAP_SIZE)
+        return hashlib.md5(trace).hexdigest()
+
+    def get_trace(self):
+        '''
+        indices of the edges hit by the last execution
+        '''
+        trace = np.ctypeslib.as_array(self._trace_bits, shape=(self.MAP_SIZE, ))
+        return np.flatnonzero(trace).astype(np.uint32)
+
+    def execute_trace(self, f):
+        crashed = self.execute(f)
+        return crashed, self.get_trace()
+
     def reset(self):
         self._reset()
         self.coverage.reset()
@@ -375,6 +438,8 @@ class AFLForkserverTask(Enum):
     RESET = 4
     CLEANUP = 5
     GET_BITMAP = 6
+    GET_TRACE_CHECKSUM = 7
+    EXECUTE_TRACE = 8
 
 
 class AFLForkserverProcess(object):
@@ -401,6 +466,10 @@ class AFLForkserverProcess(object):
                 self.child.send(self.afl.get_coverage(*args))
             elif task == AFLForkserverTask.GET_BITMAP:
                 self.child.send(self.afl.get_bitmap(*args))
+            elif task == AFLForkserverTask.GET_TRACE_CHECKSUM:
+                self.child.send(self.afl.get_trace_checksum(*args))
+            elif task == AFLForkserverTask.EXECUTE_TRACE:
+                self.child.send(self.afl.execute_trace(*args))
             elif task == AFLForkserverTask.RESET:
                 self.child.send(self.afl.reset())
             elif task == AFLForkserverTask.SET_CORE:
@@ -426,6 +495,17 @@ class AFLForkserverProcess(object):
         self.parent.send((AFLForkserverTask.GET_BITMAP, []))
         return self._parent_recv()
 
+    def get_trace_checksum(self):
+        self.parent.send((AFLForkserverTask.GET_TRACE_CHECKSUM, []))
+        return self._parent_recv()
+
+    def execute_trace(self, f):
+        '''
+        execute and return (crashed, edges), one round trip
+        '''
+        self.parent.send((AFLForkserverTask.EXECUTE_TRACE, [f]))
+        return self._parent_recv()
+
     def reset(self):
         self.parent.send((AFLForkserverTask.RESET, []))
         return self._parent_recv()
@@ -489,51 +569,85 @@ def get_fuzzer_root(fuzzer: str) -> Optional[Path]:
 
 
 def init():
-    global MAP, INDEX, EXECUTOR, FUZZER_BITMAP
-    global bug_id, bug_id_ip, bug_id_trace, bug_id_trace3
+    global MAP, INDEX, EXECUTOR, FUZZER_BITMAP, CRASH_EXECUTOR
+    global PROCESSED_FILE, PROCESSED_CHECKSUM, SEED_STORE
     MAP['dirs'] = {}
     MAP['top_dir'] = top_dir = ARGS.output / 'eval'
     MAP['debug_file'] = top_dir / 'debug.log'
-    MAP['profile_file'] = top_dir / 'profile.log'
     MAP['log_file'] = top_dir / 'eval.log'
     MAP['log_file_latest'] = top_dir / 'eval-latest.log'
     MAP['seed_finished_file'] = top_dir / 'seed-finished'
     MAP['lock_path'] = top_dir / 'lock'
     MAP['coverage_path'] = top_dir / 'cov.json'
+    MAP['bug_db_path'] = top_dir / 'bugs.db'
     os.makedirs(top_dir, exist_ok=True)
+    bugdb.init(MAP['bug_db_path'])
+    SEED_STORE = seedstore.SeedStore(top_dir / 'seeds')
 
     binary, binary_arguments = find_executable_from_cmd()
+    PROCESSED_FILE = GenerationSet(get_all_names())
+    PROCESSED_CHECKSUM = GenerationSet(get_all_names())
+    if ARGS.crash_fingerprint_limit > 0:
+        CRASH_EXECUTOR = AFLForkserverProcess(binary, binary_arguments)
     for fuzzer in get_all_names():
         eval_fuzzer_root = get_eval_fuzzer_root(fuzzer)
         assert eval_fuzzer_root
         dir_crashes = eval_fuzzer_root / 'crashes'
-        dir_unique_bugs = eval_fuzzer_root / 'unique_bugs'
-        dir_unique_bugs_ip = eval_fuzzer_root / 'unique_bugs_ip'
-        dir_unique_bugs_trace = eval_fuzzer_root / 'unique_bugs_trace'
-        dir_unique_bugs_trace3 = eval_fuzzer_root / 'unique_bugs_trace3'
         os.makedirs(eval_fuzzer_root, exist_ok=True)
         os.makedirs(dir_crashes, exist_ok=True)
-        os.makedirs(dir_unique_bugs, exist_ok=True)
-        os.makedirs(dir_unique_bugs_ip, exist_ok=True)
-        os.makedirs(dir_unique_bugs_trace, exist_ok=True)
-        os.makedirs(dir_unique_bugs_trace3, exist_ok=True)
         FUZZER_BITMAP[fuzzer] = AFLBitmap.empty()
+        OWN_BITMAP[fuzzer] = AFLBitmap.empty()
+        BITMAP_VERSION[fuzzer] = 0
         EXECUTOR[fuzzer] = AFLForkserverProcess(binary, binary_arguments)
-        PROCESSED_FILE[fuzzer] = set()
-        PROCESSED_CHECKSUM[fuzzer] = set()
-        crash_set[fuzzer] = set()
-        crash_set_ip[fuzzer] = set()
-        crash_set_trace[fuzzer] = set()
-        crash_set_trace3[fuzzer] = set()
-        bug_id[fuzzer] = dict()
-        bug_id_ip[fuzzer] = dict()
-        bug_id_trace[fuzzer] = dict()
-        bug_id_trace3[fuzzer] = dict()
         INDEX[fuzzer] = 0
-        INDEX_UNIQUE_BUG[fuzzer] = 0
-        INDEX_UNIQUE_BUG_IP[fuzzer] = 0
-        INDEX_UNIQUE_BUG_TRACE[fuzzer] = 0
-        INDEX_UNIQUE_BUG_TRACE3[fuzzer] = 0
+        CRASH_SKIPPED[fuzzer] = 0
+        PENDING[fuzzer] = {}
+        SHED[fuzzer] = 0
+        DEFERRED_COUNT[fuzzer] = 0
+        DISCOVERED[fuzzer] = 0
+
+
+def restore():
+    '''
+    pick up the bitmaps and crashes of an earlier run, queue entries are
+    processed again but known seeds are read from the seed store instead
+    of executed
+    '''
+    for fuzzer in get_all_names():
+        eval_fuzzer_root = get_eval_fuzzer_root(fuzzer)
+        assert eval_fuzzer_root
+        bitmap_path = eval_fuzzer_root / 'bitmap'
+        if not bitmap_path.exists():
+            continue
+        bitmap = Bitmap(bitmap_path=bitmap_path)
+        FUZZER_BITMAP[fuzzer] = AFLBitmap(bitmap.bitmap)
+        BITMAP_VERSION[fuzzer] = bitmap.version or 0
+        SAVED_BITMAP_VERSION[fuzzer] = BITMAP_VERSION[fuzzer]
+    crashes = 0
+    for crash in bugdb.Crash.select():
+        fuzzer = crash.fuzzer
+        if fuzzer not in INDEX:
+            continue
+        crashes += 1
+        if os.path.isfile(crash.path):
+            add_processed(fuzzer, crash.path)
+        if crash.crash_id is None:
+            CRASH_SKIPPED[fuzzer] += 1
+            CRASH_SKIPPED['global'] += 1
+        else:
+            INDEX[fuzzer] = max(INDEX[fuzzer], crash.crash_id + 1)
+        if crash.fingerprint:
+            entry = CRASH_FINGERPRINT.setdefault(crash.fingerprint, {
+                'count': 0,
+                'bug': None
+            })
+            entry['count'] += 1
+            if crash.crash_id is not None:
+                entry['bug'] = (crash.unique_bugs, crash.unique_bugs_ip,
+                                crash.unique_bugs_trace,
+                                crash.unique_bugs_trace3)
+    logger.info(f'resume: {crashes} crashes, bitmap '
+                f'{FUZZER_BITMAP["global"].count()}')
 
 
 def log(msg):
@@ -555,12 +669,6 @@ def log_debug(msg):
         f.write(f'{msg}\n')
 
 
-def log_profile(msg):
-    global MAP
-    with open(MAP['profile_file'], 'a') as f:
-        f.write(f'{msg}\n')
-
-
 def debug(*args, **kwargs):
     if not IS_DEBUG: return
     log(*args, **kwargs)
@@ -573,34 +681,6 @@ def gen_id(fuzzer):
     return ret
 
 
-def gen_unique_bug_id(fuzzer):
-    global INDEX_UNIQUE_BUG
-    ret = INDEX_UNIQUE_BUG[fuzzer]
-    INDEX_UNIQUE_BUG[fuzzer] += 1
-    return ret
-
-
-def gen_unique_bug_id_ip(fuzzer):
-    global INDEX_UNIQUE_BUG_IP
-    ret = INDEX_UNIQUE_BUG_IP[fuzzer]
-    INDEX_UNIQUE_BUG_IP[fuzzer] += 1
-    return ret
-
-
-def gen_unique_bug_id_trace(fuzzer):
-    global INDEX_UNIQUE_BUG_TRACE
-    ret = INDEX_UNIQUE_BUG_TRACE[fuzzer]
-    INDEX_UNIQUE_BUG_TRACE[fuzzer] += 1
-    return ret
-
-
-def gen_unique_bug_id_trace3(fuzzer):
-    global INDEX_UNIQUE_BUG_TRACE3
-    ret = INDEX_UNIQUE_BUG_TRACE3[fuzzer]
-    INDEX_UNIQUE_BUG_TRACE3[fuzzer] += 1
-    return ret
-
-
 def get_crash_dirs(fuzzer):
     def_dir = get_fuzzer_root(fuzzer)
     assert def_dir
@@ -774,8 +854,8 @@ def checksum(filename):
     return ret
 
 
-PROCESSED_FILE: Dict[Fuzzer, Set] = {}
-PROCESSED_CHECKSUM: Dict[Fuzzer, Set] = {}
+PROCESSED_FILE: GenerationSet
+PROCESSED_CHECKSUM: GenerationSet
 
 PROCESSED_LOCK = threading.Lock()
 
@@ -785,19 +865,17 @@ def add_processed(fuzzer, filename):
     assert os.path.isabs(filename)
     c = checksum(filename)
     with PROCESSED_LOCK:
-        PROCESSED_FILE[fuzzer].add(filename)
-        PROCESSED_CHECKSUM[fuzzer].add(c)
-        PROCESSED_FILE['global'].add(filename)
-        PROCESSED_CHECKSUM['global'].add(c)
+        PROCESSED_FILE.add(fuzzer, filename)
+        PROCESSED_CHECKSUM.add(fuzzer, c)
 
 
 def is_processed(fuzzer, filename):
     global PROCESSED_CHECKSUM, PROCESSED_FILE
     assert os.path.isabs(filename)
-    if filename in PROCESSED_FILE[fuzzer]:
+    if PROCESSED_FILE.contains(fuzzer, filename):
         return True
     c = checksum(filename)
-    return c in PROCESSED_CHECKSUM[fuzzer]
+    return PROCESSED_CHECKSUM.contains(fuzzer, c)
 
 
 def find_executable_from_cmd():
@@ -824,12 +902,14 @@ def save_fuzzer_bitmap(fuzzer):
     eval_fuzzer_root = get_eval_fuzzer_root(fuzzer)
     assert eval_fuzzer_root
     bitmap_path = eval_fuzzer_root / 'bitmap'
-    fuzzer_bitmap = FUZZER_BITMAP[fuzzer].bitmap
-    lock_path = MAP['lock_path']
-    lock = filelock.FileLock(lock_path, timeout=100)
-    with lock:
-        with open(bitmap_path, 'wb+') as f:
-            f.write(fuzzer_bitmap)
+    with SAVE_BITMAP_LOCK:
+        with BITMAP_LOCK:
+            version = BITMAP_VERSION[fuzzer]
+            fuzzer_bitmap = FUZZER_BITMAP[fuzzer].bitmap
+        if SAVED_BITMAP_VERSION.get(fuzzer, -1) >= version:
+            return
+        Bitmap(bitmap=fuzzer_bitmap).save(bitmap_path, version)
+        SAVED_BITMAP_VERSION[fuzzer] = version
 
 
 def save_fuzzer_crashes(fuzzer):
@@ -840,14 +920,13 @@ def save_fuzzer_crashes(fuzzer):
     lock_path = MAP['lock_path']
     lock = filelock.FileLock(lock_path, timeout=100)
     m = {}
-    m['unique_bugs'] = len(crash_set[fuzzer])
-    m['unique_bugs_ip'] = len(crash_set_ip[fuzzer])
-    m['unique_bugs_trace'] = len(crash_set_trace[fuzzer])
-    m['unique_bugs_trace3'] = len(crash_set_trace3[fuzzer])
+    for kind in bugdb.KINDS:
+        m[kind] = bugdb.count(fuzzer, kind)
+    m['crashes_skipped'] = CRASH_SKIPPED[fuzzer]
 
     with lock:
         with open(log_path, 'w') as f:
-            msg = f'unique bugs: {len(crash_set[fuzzer])}\n'
+            msg = f'unique bugs: {m["unique_bugs"]}\n'
             f.write(msg)
 
         with open(log_path_new, 'w') as f:
@@ -855,9 +934,11 @@ def save_fuzzer_crashes(fuzzer):
             f.write(f'{msg}')
 
 
-def add_all_bitmap():
+def add_all_bitmap(fuzzers=None):
     global EXECUTOR
-    for fuzzer in get_all_names(False):
+    if fuzzers is None:
+        fuzzers = get_all_names(False)
+    for fuzzer in fuzzers:
         afl_bitmap_f = EXECUTOR[fuzzer].get_bitmap()
         add_fuzzer_bitmap(fuzzer, afl_bitmap_f)
 
@@ -865,6 +946,8 @@ def add_all_bitmap():
 def save_all_bitmap(add=True):
     if add:
         add_all_bitmap()
+    if SEED_STORE is not None:
+        SEED_STORE.flush()
     for fuzzer in get_all_names():
         save_fuzzer_bitmap(fuzzer)
 
@@ -880,31 +963,128 @@ BITMAP_LOCK = threading.Lock()
 def add_fuzzer_bitmap(fuzzer, bitmap):
     global FUZZER_BITMAP, BITMAP_LOCK
     with BITMAP_LOCK:
-        FUZZER_BITMAP[fuzzer] |= bitmap
-        FUZZER_BITMAP['global'] |= bitmap
+        for name in [fuzzer, 'global']:
+            if FUZZER_BITMAP[name].has_new_bits(bitmap):
+                FUZZER_BITMAP[name] |= bitmap
+                BITMAP_VERSION[name] += 1
+        if fuzzer in OWN_BITMAP and OWN_BITMAP[fuzzer].has_new_bits(bitmap):
+            OWN_BITMAP[fuzzer] |= bitmap
 
 
+def add_fuzzer_edges(fuzzer, edges):
+    '''
+    add_fuzzer_bitmap for the stored edges of a seed
+    '''
+    if not len(edges):
+        return
+    with BITMAP_LOCK:
+        for name in [fuzzer, 'global']:
+            bitmap = FUZZER_BITMAP[name].bitmap
+            if bitmap[edges].all():
+                continue
+            bitmap = np.array(bitmap, copy=True)
+            bitmap[edges] = 1
+            # NOTE: rebind, the old map may be shared
+            FUZZER_BITMAP[name] = AFLBitmap(bitmap)
+            BITMAP_VERSION[name] += 1
+        own = OWN_BITMAP.get(fuzzer)
+        if own is not None and not own.bitmap[edges].all():
+            bitmap = np.array(own.bitmap, copy=True)
+            bitmap[edges] = 1
+            OWN_BITMAP[fuzzer] = AFLBitmap(bitmap)
+
+
+@tracing.traced('evaluator.sync')
 def sync():
+    '''
+    every fuzzer gets the global bitmap and processed sets, O(# fuzzers)
+    '''
     global BITMAP_LOCK, FUZZER_BITMAP, PROCESSED_CHECKSUM
     global PROCESSED_FILE
     global PROCESSED_LOCK
-    start = time.time()
-    with BITMAP_LOCK:
-        with PROCESSED_LOCK:
+    with tracing.span('evaluator.sync.share'):
+        with BITMAP_LOCK:
+            # NOTE: global always contains the bitmap of every fuzzer
+            global_bitmap = FUZZER_BITMAP['global']
             for fuzzer in get_all_names(False):
-                FUZZER_BITMAP['global'] |= FUZZER_BITMAP[fuzzer]
-            log_profile(f'phase1: {time.time()-start}s')
-            for fuzzer in get_all_names():
-                start2 = time.time()
-                FUZZER_BITMAP[fuzzer] = copy.deepcopy(FUZZER_BITMAP['global'])
-                PROCESSED_CHECKSUM[fuzzer] = copy.copy(
-                    PROCESSED_CHECKSUM['global'])
-                PROCESSED_FILE[fuzzer] = copy.copy(PROCESSED_FILE['global'])
-                log_profile(
-                    f'phase2: {fuzzer} {time.time()-start2}s, {time.time()-start}s'
-                )
-                save_fuzzer_bitmap(fuzzer)
-        log_profile(f'overall: {time.time()-start}s')
+                if FUZZER_BITMAP[fuzzer] is not global_bitmap:
+                    FUZZER_BITMAP[fuzzer] = global_bitmap
+                    BITMAP_VERSION[fuzzer] += 1
+        with PROCESSED_LOCK:
+            PROCESSED_CHECKSUM.sync()
+            PROCESSED_FILE.sync()
+    # only maps changed by the sync are written
+    with tracing.span('evaluator.sync.save'):
+        for fuzzer in get_all_names():
+            save_fuzzer_bitmap(fuzzer)
+
+
+def enable_cmin():
+    '''
+    hand every newly traced seed to the corpus minimizer
+    '''
+    cmin.enable(get_seed_edges)
+
+
+def enable_resume():
+    global RESUME
+    RESUME = True
+
+
+def get_seed_edges(checksum_f) -> Optional[np.ndarray]:
+    if SEED_STORE is None:
+        return None
+    return SEED_STORE.get(checksum_f)
+
+
+def get_fuzzer_bitmap(fuzzer) -> np.ndarray:
+    '''
+    0/1 edge map of fuzzer, must not be modified
+    '''
+    with BITMAP_LOCK:
+        return FUZZER_BITMAP[fuzzer].bitmap
+
+
+def get_own_bitmap(fuzzer) -> np.ndarray:
+    '''
+    0/1 edge map of the seeds of fuzzer itself, unlike get_fuzzer_bitmap
+    without the edges it got by sync, must not be modified
+    '''
+    with BITMAP_LOCK:
+        return OWN_BITMAP[fuzzer].bitmap
+
+
+def sync_partial(forwarded: Dict[Fuzzer, List[str]]):
+    '''
+    fuzzers only get the edges of the seeds forwarded to them, unlike sync()
+    forwarded: fuzzer => checksums of the seeds
+    '''
+    with tracing.span('evaluator.sync_partial'):
+        for fuzzer, checksums in forwarded.items():
+            if not checksums:
+                continue
+            edges = [
+                e for e in map(get_seed_edges, checksums) if e is not None
+            ]
+            with BITMAP_LOCK:
+                if edges:
+                    bitmap = np.array(FUZZER_BITMAP[fuzzer].bitmap, copy=True)
+                    bitmap[np.concatenate(edges)] = 1
+                    # NOTE: rebind, the old map may be shared
+                    FUZZER_BITMAP[fuzzer] = AFLBitmap(bitmap)
+                    BITMAP_VERSION[fuzzer] += 1
+            with PROCESSED_LOCK:
+                for c in checksums:
+                    PROCESSED_CHECKSUM.add(fuzzer, c)
+            save_fuzzer_bitmap(fuzzer)
+
+
+def is_cmin_candidate(f) -> bool:
+    '''
+    the minimized corpus seeds new AFL slaves, whose dry run aborts on
+    seeds that hang or crash
+    '''
+    return cmin.MINIMIZER is not None and not is_hang(Path(f))
 
 
 def process_fuzzer_queue_one(fuzzer, f):
@@ -915,8 +1095,49 @@ def process_fuzzer_queue_one(fuzzer, f):
     checksum_f = checksum(f)
     afl_bitmap_f = None
     if not is_p:
-        EXECUTOR[fuzzer].execute(f)
+        edges = get_seed_edges(checksum_f)
+        if edges is None:
+            start = time.perf_counter()
+            crashed, edges = EXECUTOR[fuzzer].execute_trace(f)
+            exec_time = time.perf_counter() - start
+            SEED_STORE.put(checksum_f, edges)
+            if is_cmin_candidate(f) and not crashed:
+                cmin.MINIMIZER.add(checksum_f, f, edges, os.path.getsize(f),
+                                   exec_time)
+        else:
+            # traced for another fuzzer already
+            add_fuzzer_edges(fuzzer, edges)
+            if (is_cmin_candidate(f)
+                    and checksum_f not in cmin.MINIMIZER.ids):
+                # stored by the run before --resume, time it once
+                start = time.perf_counter()
+                crashed, _ = EXECUTOR[fuzzer].execute_trace(f)
+                exec_time = time.perf_counter() - start
+                if not crashed:
+                    cmin.MINIMIZER.add(checksum_f, f, edges,
+                                       os.path.getsize(f), exec_time)
     add_processed(fuzzer, f)
+    metrics.inc('rcfuzz_evaluator_files_total', fuzzer=fuzzer)
+
+
+def crash_fingerprint(f):
+    '''
+    hash of the trace bitmap (classified hit counts) of a crash input
+    '''
+    assert CRASH_EXECUTOR
+    CRASH_EXECUTOR.execute(f)
+    return CRASH_EXECUTOR.get_trace_checksum()
+
+
+def need_triage(fingerprint):
+    entry = CRASH_FINGERPRINT[fingerprint]
+    # no ASAN result to reuse yet
+    if entry['bug'] is None:
+        return True
+    if entry['count'] <= ARGS.crash_fingerprint_limit:
+        return True
+    # sampled verification of the fingerprint => bug mapping
+    return random.random() < ARGS.crash_verify_rate
 
 
 def process_crash_one(fuzzer, f):
@@ -926,13 +1147,28 @@ def process_crash_one(fuzzer, f):
     is_p = is_processed(fuzzer, f)
     if is_p: return
     add_processed(fuzzer, f)
+
+    fingerprint = None
+    if CRASH_EXECUTOR:
+        fingerprint = crash_fingerprint(f)
+        entry = CRASH_FINGERPRINT.setdefault(fingerprint, {
+            'count': 0,
+            'bug': None
+        })
+        entry['count'] += 1
+        if not need_triage(fingerprint):
+            # same coverage as a triaged crash, reuse its bug hashes
+            bugdb.add_crash(fuzzer, None, f, *entry['bug'], fingerprint)
+            CRASH_SKIPPED[fuzzer] += 1
+            CRASH_SKIPPED['global'] += 1
+            metrics.inc('rcfuzz_evaluator_crashes_total',
+                        fuzzer=fuzzer,
+                        triage='skipped')
+            return
+
     eval_fuzzer_root = get_eval_fuzzer_root(fuzzer)
     assert eval_fuzzer_root
     dir_crashes = eval_fuzzer_root / 'crashes'
-    dir_unique_bugs = eval_fuzzer_root / 'unique_bugs'
-    dir_unique_bugs_ip = eval_fuzzer_root / 'unique_bugs_ip'
-    dir_unique_bugs_trace = eval_fuzzer_root / 'unique_bugs_trace'
-    dir_unique_bugs_trace3 = eval_fuzzer_root / 'unique_bugs_trace3'
     new_id = gen_id(fuzzer)
     new_dir = dir_crashes / str(new_id)
     os.makedirs(new_dir, exist_ok=True)
@@ -947,10 +1183,6 @@ def process_crash_one(fuzzer, f):
     ID_trace3 = trace3_hash = hash_trace3(asan_output['trace'])
     ID_ip = ip_hash = hash_ip(asan_output['trace'])
 
-    crash_set_trace[fuzzer].add(trace_hash)
-    crash_set_trace3[fuzzer].add(trace3_hash)
-    crash_set_ip[fuzzer].add(ip_hash)
-
     if ARGS.mode == 'trace':
         ID = trace_hash
     elif ARGS.mode == 'trace3':
@@ -959,98 +1191,19 @@ def process_crash_one(fuzzer, f):
         ID = ip_hash
 
     assert ID
-    crash_set[fuzzer].add(ID)
-
-    if ID not in bug_id[fuzzer]:
-        bug_id[fuzzer][ID] = gen_unique_bug_id(fuzzer)
-
-    if ID_ip not in bug_id_ip[fuzzer]:
-        bug_id_ip[fuzzer][ID_ip] = gen_unique_bug_id_ip(fuzzer)
-
-    if ID_trace not in bug_id_trace[fuzzer]:
-        bug_id_trace[fuzzer][ID_trace] = gen_unique_bug_id_trace(fuzzer)
-
-    if ID_trace3 not in bug_id_trace3[fuzzer]:
-        bug_id_trace3[fuzzer][ID_trace3] = gen_unique_bug_id_trace3(fuzzer)
-
-    new_unique_bug_dir = dir_unique_bugs / str(bug_id[fuzzer][ID])
-    os.makedirs(new_unique_bug_dir, exist_ok=True)
-    rel_path = os.path.relpath(new_dir, new_unique_bug_dir)
-    dest = os.path.join(new_unique_bug_dir, os.path.basename(new_dir))
-    symlink(rel_path, dest)
-
-    new_unique_bug_dir = dir_unique_bugs_ip / str(bug_id_ip[fuzzer][ID_ip])
-    os.makedirs(new_unique_bug_dir, exist_ok=True)
-    rel_path = os.path.relpath(new_dir, new_unique_bug_dir)
-    dest = os.path.join(new_unique_bug_dir, os.path.basename(new_dir))
-    symlink(rel_path, dest)
-
-    new_unique_bug_dir = dir_unique_bugs_trace / str(
-        bug_id_trace[fuzzer][ID_trace])
-    os.makedirs(new_unique_bug_dir, exist_ok=True)
-    rel_path = os.path.relpath(new_dir, new_unique_bug_dir)
-    dest = os.path.join(new_unique_bug_dir, os.path.basename(new_dir))
-    symlink(rel_path, dest)
-
-    new_unique_bug_dir = os.path.join(dir_unique_bugs_trace3,
-                                      str(bug_id_trace3[fuzzer][ID_trace3]))
-    os.makedirs(new_unique_bug_dir, exist_ok=True)
-    rel_path = os.path.relpath(new_dir, new_unique_bug_dir)
-    dest = os.path.join(new_unique_bug_dir, os.path.basename(new_dir))
-    symlink(rel_path, dest)
-
-    # add to global
-    eval_fuzzer_root = get_eval_fuzzer_root('global')
-    assert eval_fuzzer_root
-    dir_unique_bugs = eval_fuzzer_root / 'unique_bugs'
-    dir_unique_bugs_ip = eval_fuzzer_root / 'unique_bugs_ip'
-    dir_unique_bugs_trace = eval_fuzzer_root / 'unique_bugs_trace'
-    dir_unique_bugs_trace3 = eval_fuzzer_root / 'unique_bugs_trace3'
-    crash_set['global'].add(ID)
-    crash_set_ip['global'].add(ID_ip)
-    crash_set_trace['global'].add(ID_trace)
-    crash_set_trace3['global'].add(ID_trace3)
-
-    if ID not in bug_id['global']:
-        bug_id['global'][ID] = gen_unique_bug_id('global')
-
-    if ID_ip not in bug_id_ip['global']:
-        bug_id_ip['global'][ID_ip] = gen_unique_bug_id_ip('global')
-
-    if ID_trace not in bug_id_trace['global']:
-        bug_id_trace['global'][ID_trace] = gen_unique_bug_id_trace('global')
-
-    if ID_trace3 not in bug_id_trace3['global']:
-        bug_id_trace3['global'][ID_trace3] = gen_unique_bug_id_trace3('global')
-
-    new_unique_bug_dir = dir_unique_bugs / str(bug_id['global'][ID])
-    os.makedirs(new_unique_bug_dir, exist_ok=True)
-    rel_path = os.path.relpath(new_dir, new_unique_bug_dir)
-    dest = os.path.join(new_unique_bug_dir, os.path.basename(new_dir))
-    symlink(rel_path, dest)
-
-    new_unique_bug_dir = dir_unique_bugs_ip / str(bug_id_ip['global'][ID_ip])
-    os.makedirs(new_unique_bug_dir, exist_ok=True)
-    rel_path = os.path.relpath(new_dir, new_unique_bug_dir)
-    dest = os.path.join(new_unique_bug_dir, os.path.basename(new_dir))
-    symlink(rel_path, dest)
-
-    new_unique_bug_dir = dir_unique_bugs_trace / str(
-        bug_id_trace['global'][ID_trace])
-    os.makedirs(new_unique_bug_dir, exist_ok=True)
-    rel_path = os.path.relpath(new_dir, new_unique_bug_dir)
-    dest = os.path.join(new_unique_bug_dir, os.path.basename(new_dir))
-    symlink(rel_path, dest)
-
-    new_unique_bug_dir = dir_unique_bugs_trace3 / str(
-        bug_id_trace3['global'][ID_trace3])
-    os.makedirs(new_unique_bug_dir, exist_ok=True)
-    rel_path = os.path.relpath(new_dir, new_unique_bug_dir)
-    dest = os.path.join(new_unique_bug_dir, os.path.basename(new_dir))
-    symlink(rel_path, dest)
-    # log(f'{err_path}, {ID}, {bug_id[ID]}, {len(crash_set)}')
+    bugdb.add_crash(fuzzer, new_id, f, ID, ID_ip, ID_trace, ID_trace3,
+                    fingerprint)
+    metrics.inc('rcfuzz_evaluator_crashes_total', fuzzer=fuzzer, triage='asan')
+
+    if fingerprint:
+        bug = (ID, ID_ip, ID_trace, ID_trace3)
+        entry = CRASH_FINGERPRINT[fingerprint]
+        if entry['bug'] is not None and entry['bug'] != bug:
+            debug(f'crash fingerprint {fingerprint} mismatch: {f}')
+        entry['bug'] = bug
 
 
+@tracing.traced('evaluator.coverage_batch')
 def process_coverage_fuzzer_files(fuzzer_files):
     THRESHOLD = 1000
     counter = 0
@@ -1064,6 +1217,7 @@ def process_coverage_fuzzer_files(fuzzer_files):
     save_all_bitmap(True)
 
 
+@tracing.traced('evaluator.crash_batch')
 def process_crash_fuzzer_files(fuzzer_files):
     for fuzzer, f in fuzzer_files:
         process_crash_one(fuzzer, f)
@@ -1080,7 +1234,7 @@ def get_coverage_fuzzer_files(fuzzer):
     for queue_dir in queue_dirs:
         files = import_dir_files(queue_dir)
         for f in files:
-            if f in PROCESSED_FILE[fuzzer]: continue
+            if PROCESSED_FILE.contains(fuzzer, f): continue
             ret.append((fuzzer, f))
     return ret
 
@@ -1093,13 +1247,15 @@ def get_crash_fuzzer_files(fuzzer):
     for crash_dir in crash_dirs:
         files = import_dir_files(crash_dir)
         for f in files:
-            if f in PROCESSED_FILE[fuzzer]: continue
+            if PROCESSED_FILE.contains(fuzzer, f): continue
             ret.append((fuzzer, f))
     return ret
 
 
 FIRST_COVERAGE = True
 FIRST_CRASH = True
+# seconds between the directory scans of process_coverage / process_crash
+SCAN_INTERVAL = 10
 
 
 def process_coverage():
@@ -1121,7 +1277,7 @@ def process_coverage():
             FIRST_COVERAGE = False
         if not ARGS.live:
             return
-        time.sleep(ARGS.sleep)
+        time.sleep(SCAN_INTERVAL)
 
 
 def process_crash():
@@ -1140,7 +1296,7 @@ def process_crash():
             save_all_crash()
         if not ARGS.live:
             return
-        time.sleep(ARGS.sleep)
+        time.sleep(SCAN_INTERVAL)
 
 
 def coverage_thread():
@@ -1186,7 +1342,7 @@ def get_fuzzer_files(fuzzer: Fuzzer) -> Tuple[List[Path], List[Path]]:
                 crash_files.append(test_case_path)
             else:
                 assert False, 'unknow seed type'
-        LAST_INDEX[w] = queue_len
+        LAST_INDEX[w] = queue_len - 1
 
     return coverage_files, crash_files
 
@@ -1195,53 +1351,338 @@ def save_coverage():
     global MAP
     ret = {}
     ret['coverage'] = {}
-    ret['unique_bugs'] = {}
-    ret['unique_bugs_ip'] = {}
-    ret['unique_bugs_trace'] = {}
-    ret['unique_bugs_trace3'] = {}
+    for kind in bugdb.KINDS:
+        ret[kind] = {}
+    ret['crashes_skipped'] = {}
     for fuzzer in get_all_names():
         ret['coverage'][fuzzer] = int(FUZZER_BITMAP[fuzzer].count())
-        ret['unique_bugs'][fuzzer] = len(crash_set[fuzzer])
-        ret['unique_bugs_ip'][fuzzer] = len(crash_set_ip[fuzzer])
-        ret['unique_bugs_trace'][fuzzer] = len(crash_set_trace[fuzzer])
-        ret['unique_bugs_trace3'][fuzzer] = len(crash_set_trace3[fuzzer])
+        for kind in bugdb.KINDS:
+            ret[kind][fuzzer] = bugdb.count(fuzzer, kind)
+        ret['crashes_skipped'][fuzzer] = CRASH_SKIPPED[fuzzer]
+        metrics.set_gauge('rcfuzz_bitmap_edges',
+                          ret['coverage'][fuzzer],
+                          fuzzer=fuzzer)
+        metrics.set_gauge('rcfuzz_unique_bugs',
+                          ret['unique_bugs'][fuzzer],
+                          fuzzer=fuzzer)
+    ret['lag'] = get_lag_stats()
     with open(MAP['coverage_path'], 'w') as f:
         f.write(json.dumps(ret, default=json_dumper))
 
 
-def watcher_thread():
-    while True:
-        all_coverage_files = []
-        all_crash_files = []
+def process_once():
+    all_coverage_files = []
+    all_crash_files = []
+
+    for fuzzer in get_all_names(False):
+        coverage_files, crash_files = get_fuzzer_files(fuzzer)
+        for f in coverage_files:
+            all_coverage_files.append((fuzzer, f))
+        for f in crash_files:
+            all_crash_files.append((fuzzer, f))
+
+    if all_coverage_files:
+        process_coverage_fuzzer_files(all_coverage_files)
+    else:
+        log('coverage: no new files')
+    if all_crash_files:
+        process_crash_fuzzer_files(all_crash_files)
+    else:
+        log('crash: no new files')
+    save_all_bitmap()
+    save_all_crash()
+    save_coverage()
+
+
+# --live pipeline: discovery -> coverage / crash -> persistence
+# each stage is a thread, bounded queues give back pressure to discovery
+PIPELINE_QUEUE_SIZE = 4096
+# files executed before the fuzzer bitmaps are collected
+PIPELINE_BITMAP_THRESHOLD = 1000
+# seconds, bounds how often bitmaps are collected and results saved
+PIPELINE_FLUSH_INTERVAL = 1
+
+# coverage queue priorities, lower is evaluated first
+# AFL found new edges with the entry, e.g. id:000042,src:000001,op:havoc,+cov
+PRIORITY_COV = 0
+PRIORITY_PLAIN = 1
+PRIORITY_HANG = 2
+# shed while lagging, replayed whenever the coverage queue runs empty
+PRIORITY_DEFERRED = 3
+
+# (priority, discovery time, sequence number, fuzzer, file)
+COVERAGE_QUEUE: 'queue.PriorityQueue[Tuple[int, float, int, Fuzzer, Path]]' = queue.PriorityQueue(
+    PIPELINE_QUEUE_SIZE)
+# tie breaker, fuzzers and paths are never compared
+QUEUE_SEQ = itertools.count()
+# (fuzzer, file, discovery time)
+CRASH_QUEUE: 'queue.Queue[Tuple[Fuzzer, Path, float]]' = queue.Queue(
+    PIPELINE_QUEUE_SIZE)
+PERSIST_EVENT = threading.Event()
+STAGE_EXIT = threading.Event()
+
+LAG_LOCK = threading.Lock()
+# fuzzer => discovery time => # of files in the coverage queue
+PENDING: Dict[Fuzzer, Dict[float, int]] = {}
+# files discovered by the coverage pipeline
+DISCOVERED: Dict[Fuzzer, int] = {}
+# files shed so far, and those of them not evaluated yet
+SHED: Dict[Fuzzer, int] = {}
+DEFERRED_COUNT: Dict[Fuzzer, int] = {}
+DEFERRED: Deque[Tuple[Fuzzer, Path, float]] = deque()
+
+
+def is_hang(f: Path) -> bool:
+    return f.parent.name == 'hangs' or f.name.startswith(('timeout-', 'oom-'))
+
+
+def seed_priority(f: Path) -> int:
+    if is_hang(f):
+        return PRIORITY_HANG
+    if '+cov' in f.name:
+        return PRIORITY_COV
+    return PRIORITY_PLAIN
+
+
+def pending_add(fuzzer, discovered):
+    with LAG_LOCK:
+        pending = PENDING[fuzzer]
+        pending[discovered] = pending.get(discovered, 0) + 1
+
+
+def pending_remove(fuzzer, discovered):
+    with LAG_LOCK:
+        pending = PENDING[fuzzer]
+        pending[discovered] -= 1
+        if not pending[discovered]:
+            del pending[discovered]
+
+
+def oldest_pending_age(fuzzer, now) -> float:
+    with LAG_LOCK:
+        # NOTE: few distinct times, discovery enqueues a batch at once
+        pending = PENDING[fuzzer]
+        return now - min(pending) if pending else 0
+
+
+def get_backlog(fuzzer) -> int:
+    '''
+    files known to the watchers of fuzzer but not evaluated yet,
+    excluding deferred ones
+    '''
+    undiscovered = 0
+    for w in watcher.WATCHERS.get(fuzzer, []):
+        undiscovered += len(w.test_case_queue) - 1 - LAST_INDEX.get(w, -1)
+    with LAG_LOCK:
+        queued = sum(PENDING[fuzzer].values())
+    return undiscovered + queued
 
+
+def should_shed(priority, discovered, now) -> bool:
+    if ARGS.lag_threshold <= 0 or priority != PRIORITY_PLAIN:
+        return False
+    if now - discovered < ARGS.lag_threshold:
+        return False
+    return random.random() >= ARGS.shed_sample_rate
+
+
+def shed(fuzzer, f, discovered):
+    DEFERRED.append((fuzzer, f, discovered))
+    with LAG_LOCK:
+        SHED[fuzzer] += 1
+        DEFERRED_COUNT[fuzzer] += 1
+    metrics.inc('rcfuzz_evaluator_shed_total', fuzzer=fuzzer)
+
+
+def replay_deferred():
+    '''
+    requeue shed files behind everything else, called by the coverage stage
+    when its queue is empty
+    '''
+    while DEFERRED:
+        fuzzer, f, discovered = DEFERRED[0]
+        try:
+            COVERAGE_QUEUE.put_nowait(
+                (PRIORITY_DEFERRED, discovered, next(QUEUE_SEQ), fuzzer, f))
+        except queue.Full:
+            return
+        DEFERRED.popleft()
+        pending_add(fuzzer, discovered)
+
+
+def get_lag_stats() -> Dict[Fuzzer, Dict[str, float]]:
+    '''
+    shed_fraction: discovered files not evaluated because of shedding, the
+    coverage of a fuzzer misses at most that fraction of its queue
+    '''
+    now = time.time()
+    ret = {}
+    total = {
+        'backlog': 0,
+        'oldest_pending': 0,
+        'discovered': 0,
+        'shed': 0,
+        'deferred': 0
+    }
+    for fuzzer in get_all_names(False):
+        with LAG_LOCK:
+            entry = {
+                'discovered': DISCOVERED[fuzzer],
+                'shed': SHED[fuzzer],
+                'deferred': DEFERRED_COUNT[fuzzer]
+            }
+        entry['backlog'] = get_backlog(fuzzer)
+        entry['oldest_pending'] = oldest_pending_age(fuzzer, now)
+        for key in total:
+            if key == 'oldest_pending':
+                total[key] = max(total[key], entry[key])
+            else:
+                total[key] += entry[key]
+        ret[fuzzer] = entry
+    ret['global'] = total
+    for entry in ret.values():
+        entry['shed_fraction'] = entry['deferred'] / max(entry['discovered'], 1)
+    return ret
+
+
+def discovery_stage():
+    while True:
+        watcher.NEW_TEST_CASE.wait(watcher.Watcher.QUEUE_POLL_TIMEOUT)
+        # clear before collecting, events during collection are not lost
+        watcher.NEW_TEST_CASE.clear()
         for fuzzer in get_all_names(False):
             coverage_files, crash_files = get_fuzzer_files(fuzzer)
+            now = time.time()
+            with LAG_LOCK:
+                DISCOVERED[fuzzer] += len(coverage_files)
             for f in coverage_files:
-                all_coverage_files.append((fuzzer, f))
+                pending_add(fuzzer, now)
+                COVERAGE_QUEUE.put(
+                    (seed_priority(f), now, next(QUEUE_SEQ), fuzzer, f))
             for f in crash_files:
-                all_crash_files.append((fuzzer, f))
+                CRASH_QUEUE.put((fuzzer, f, now))
 
-        if all_coverage_files:
-            process_coverage_fuzzer_files(all_coverage_files)
+
+def coverage_stage():
+    # executors are only used from this thread
+    executed = set()
+    counter = 0
+    last_flush = time.time()
+    batch_start = tracing.now()
+    while True:
+        try:
+            priority, discovered, _, fuzzer, f = COVERAGE_QUEUE.get(
+                timeout=watcher.Watcher.QUEUE_POLL_TIMEOUT)
+        except queue.Empty:
+            replay_deferred()
         else:
-            log('coverage: no new files')
-        if all_crash_files:
-            process_crash_fuzzer_files(all_crash_files)
-            log('crash: no new files')
-        save_all_bitmap()
-        save_all_crash()
-        save_coverage()
+            pending_remove(fuzzer, discovered)
+            now = time.time()
+            metrics.set_gauge('rcfuzz_evaluator_lag_seconds',
+                              now - discovered,
+                              stage='coverage')
+            if should_shed(priority, discovered, now):
+                shed(fuzzer, f, discovered)
+            else:
+                if priority == PRIORITY_DEFERRED:
+                    with LAG_LOCK:
+                        DEFERRED_COUNT[fuzzer] -= 1
+                if not executed:
+                    batch_start = tracing.now()
+                process_fuzzer_queue_one(fuzzer, str(f))
+                executed.add(fuzzer)
+                counter += 1
+        if not executed:
+            continue
+        if (counter >= PIPELINE_BITMAP_THRESHOLD
+                or time.time() - last_flush >= PIPELINE_FLUSH_INTERVAL):
+            tracing.record('evaluator.coverage_batch',
+                           batch_start,
+                           tracing.now(),
+                           files=counter)
+            with tracing.span('evaluator.add_bitmap'):
+                add_all_bitmap(executed)
+            metrics.set_gauge('rcfuzz_evaluator_files_per_second',
+                              counter / max(time.time() - last_flush, 1e-3))
+            executed = set()
+            counter = 0
+            last_flush = time.time()
+            PERSIST_EVENT.set()
+
+
+def crash_stage():
+    while True:
+        fuzzer, f, discovered = CRASH_QUEUE.get()
+        metrics.set_gauge('rcfuzz_evaluator_lag_seconds',
+                          time.time() - discovered,
+                          stage='crash')
+        with tracing.span('evaluator.crash', fuzzer=fuzzer):
+            process_crash_one(fuzzer, str(f))
+        PERSIST_EVENT.set()
 
-        if not ARGS.live:
-            return
 
-        time.sleep(ARGS.sleep)
+def persistence_stage():
+    while True:
+        PERSIST_EVENT.wait()
+        PERSIST_EVENT.clear()
+        with tracing.span('evaluator.persist'):
+            save_all_bitmap(add=False)
+            save_all_crash()
+            save_coverage()
+        # coalesce updates
+        time.sleep(PIPELINE_FLUSH_INTERVAL)
+
+
+def run_stage(stage):
+    try:
+        stage()
+    except Exception:
+        logger.exception(f'evaluator stage {stage.__name__} failed')
+    finally:
+        STAGE_EXIT.set()
+
+
+def update_queue_metrics():
+    metrics.set_gauge('rcfuzz_evaluator_queue_length',
+                      COVERAGE_QUEUE.qsize(),
+                      stage='coverage')
+    metrics.set_gauge('rcfuzz_evaluator_queue_length',
+                      CRASH_QUEUE.qsize(),
+                      stage='crash')
+    for fuzzer, entry in get_lag_stats().items():
+        metrics.set_gauge('rcfuzz_evaluator_backlog',
+                          entry['backlog'],
+                          fuzzer=fuzzer)
+        metrics.set_gauge('rcfuzz_evaluator_oldest_pending_seconds',
+                          entry['oldest_pending'],
+                          fuzzer=fuzzer)
+        metrics.set_gauge('rcfuzz_evaluator_shed_fraction',
+                          entry['shed_fraction'],
+                          fuzzer=fuzzer)
+
+
+def watcher_thread():
+    if not ARGS.live:
+        process_once()
+        return
+    metrics.register_callback(update_queue_metrics)
+    stages = [discovery_stage, coverage_stage, crash_stage, persistence_stage]
+    for stage in stages:
+        t = threading.Thread(target=run_stage,
+                             args=(stage, ),
+                             name=f'evaluator-{stage.__name__}',
+                             daemon=True)
+        t.start()
+    # the evaluator is considered dead once any stage stops
+    STAGE_EXIT.wait()
 
 
 def handler(signal, frame):
     print('CTRL-C pressed!')
     for fuzzer in get_all_names():
         EXECUTOR[fuzzer].stop()
+    if CRASH_EXECUTOR:
+        CRASH_EXECUTOR.stop()
     sys.exit(0)
 
 
@@ -1261,6 +1702,8 @@ def main(raw_args=None):
     else:
         FUZZERS = get_fuzzers()
     init()
+    if RESUME:
+        restore()
 
     # handle initial seeds
     input_files = import_dir_files(ARGS.input)
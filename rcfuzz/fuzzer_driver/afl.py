@@ -1,11 +1,11 @@
 import os
 import pathlib
 import sys
-import time
 
 import peewee
 import psutil
 from rcfuzz import config as Config
+from rcfuzz import stats
 
 from .db import AFLModel, ControllerModel, db_proxy
 from .fuzzer import FuzzerDriverException, PSFuzzer
@@ -15,17 +15,23 @@ FUZZER_CONFIG = CONFIG['fuzzer']
 
 
 def parse_fuzzer_stats(fuzzer_stats_file):
-    ret = {}
-    if not os.path.exists(fuzzer_stats_file):
+    '''
+    only parsed again after the fuzzer rewrote it, None until it exists
+    '''
+    record = stats.read(fuzzer_stats_file)
+    if record is None:
         return None
-    with open(fuzzer_stats_file) as f:
-        for l in f:
-            arr = l.split(":")
-            key = arr[0].strip()
-            value = arr[1].strip()
-            ret[key] = value
-    assert ret
-    return ret
+    return record.raw
+
+
+def resume_seed(seed, output, name):
+    '''
+    AFL refuses an output directory with a queue unless it resumes from
+    it with -i -, e.g. rcfuzz restarted with --resume
+    '''
+    if os.path.isdir(os.path.join(output, name, 'queue')):
+        return '-'
+    return seed
 
 
 class AFLBase(PSFuzzer):
@@ -66,14 +72,16 @@ class AFLBase(PSFuzzer):
         else:
             return f'{Config.AFL_SLAVE_STR}_{self.fuzzer_id}'
 
+    @property
+    def fuzzer_stats_file(self):
+        return f'{self.output}/{self.name}/fuzzer_stats'
+
     def update_fuzzer_stats(self):
-        fuzzer_stats_file = f'{self.output}/{self.name}/fuzzer_stats'
-        self.__fuzzer_stats = parse_fuzzer_stats(fuzzer_stats_file)
+        self.__fuzzer_stats = parse_fuzzer_stats(self.fuzzer_stats_file)
 
     @property
     def fuzzer_stats(self):
-        if self.__fuzzer_stats is None:
-            self.update_fuzzer_stats()
+        self.update_fuzzer_stats()
         return self.__fuzzer_stats
 
     @property
@@ -92,10 +100,13 @@ class AFLBase(PSFuzzer):
     def is_inactive(self):
         return self.proc.status() == psutil.STATUS_STOPPED
 
+    @property
+    def queue_dir(self):
+        return f'{self.output}/{self.name}/queue'
+
     @property
     def is_ready(self):
-        queue_dir = f'{self.output}/{self.name}/queue'
-        return os.path.exists(queue_dir)
+        return os.path.exists(self.queue_dir)
 
     @property
     def target(self):
@@ -176,14 +187,16 @@ class AFLPPBase(PSFuzzer):
         else:
             return f'{Config.AFL_SLAVE_STR}_{self.fuzzer_id}'
 
+    @property
+    def fuzzer_stats_file(self):
+        return f'{self.output}/{self.name}/fuzzer_stats'
+
     def update_fuzzer_stats(self):
-        fuzzer_stats_file = f'{self.output}/{self.name}/fuzzer_stats'
-        self.__fuzzer_stats = parse_fuzzer_stats(fuzzer_stats_file)
+        self.__fuzzer_stats = parse_fuzzer_stats(self.fuzzer_stats_file)
 
     @property
     def fuzzer_stats(self):
-        if self.__fuzzer_stats is None:
-            self.update_fuzzer_stats()
+        self.update_fuzzer_stats()
         return self.__fuzzer_stats
 
     @property
@@ -202,10 +215,13 @@ class AFLPPBase(PSFuzzer):
     def is_inactive(self):
         return self.proc.status() == psutil.STATUS_STOPPED
 
+    @property
+    def queue_dir(self):
+        return f'{self.output}/{self.name}/queue'
+
     @property
     def is_ready(self):
-        queue_dir = f'{self.output}/{self.name}/queue'
-        return os.path.exists(queue_dir)
+        return os.path.exists(self.queue_dir)
 
     @property
     def target(self):
@@ -546,9 +562,9 @@ class AFLBasedController(ControllerModel):
                             cgroup_path=self.cgroup_path,
                             master=True,
                             fuzzer_id=1)
+        afl.seed = resume_seed(self.seed, self.output, afl.name)
         afl.start()
-        while not afl.is_ready:
-            time.sleep(1)
+        afl.wait_until(lambda: afl.is_ready, afl.queue_dir)
         AFLModel.create(seed=self.seed,
                         output=self.output,
                         group=self.group,
@@ -599,6 +615,7 @@ class AFLBasedController(ControllerModel):
                                     master=False,
                                     cgroup_path=self.cgroup_path,
                                     fuzzer_id=i)
+                afl.seed = resume_seed(self.seed, self.output, afl.name)
                 afl.start()
                 AFLModel.create(seed=self.seed,
                                 output=self.output,
@@ -642,6 +659,24 @@ class AFLBasedController(ControllerModel):
             afl.stop()
         self.db.drop_tables([AFLModel, ControllerModel])
 
+    def restore(self):
+        '''
+        rcfuzz resumed on the same output: instances still running are
+        kept, dead ones are restarted on their own queue
+        '''
+        if not self.afls:
+            self.start()
+            return
+        models = {fuzzer.fuzzer_id: fuzzer for fuzzer in AFLModel.select()}
+        for afl in self.afls:
+            if afl.is_alive:
+                continue
+            afl.seed = resume_seed(self.seed, self.output, afl.name)
+            afl.restart()
+            model = models[afl.fuzzer_id]
+            model.pid = afl.pid
+            model.save()
+
 
 class AFLController(AFLBasedController):
     def __init__(self, seed, output, group, program, argument, thread,
@@ -42,14 +42,16 @@ class Angora(PSFuzzer):
         self.__proc = None
         self.__fuzzer_stats = None
 
+    @property
+    def fuzzer_stats_file(self):
+        return f'{self.output}/angora/fuzzer_stats'
+
     def update_fuzzer_stats(self):
-        fuzzer_stats_file = f'{self.output}/angora/fuzzer_stats'
-        self.__fuzzer_stats = afl.parse_fuzzer_stats(fuzzer_stats_file)
+        self.__fuzzer_stats = afl.parse_fuzzer_stats(self.fuzzer_stats_file)
 
     @property
     def fuzzer_stats(self):
-        if self.__fuzzer_stats is None:
-            self.update_fuzzer_stats()
+        self.update_fuzzer_stats()
         return self.__fuzzer_stats
 
     @property
@@ -161,10 +163,11 @@ class ANGORAController(Controller):
         angora = Angora(**self.kwargs)
         angora.start()
         # wait angora pid
-        while not angora.is_ready:
-            time.sleep(1)
+        angora.wait_until(lambda: angora.is_ready, angora.fuzzer_stats_file)
         AngoraModel.create(**self.kwargs, pid=angora.pid_)
         ControllerModel.create(scale_num=1)
+        # NOTE: angora gives no file event once it settles, the other
+        #       fuzzers warm up meanwhile
         time.sleep(10)
         ready_path = os.path.join(self.output, 'ready')
         pathlib.Path(ready_path).touch(mode=0o666, exist_ok=True)
@@ -191,3 +194,17 @@ class ANGORAController(Controller):
         for angora in self.angoras:
             angora.stop()
         self.db.drop_tables([AngoraModel, ControllerModel])
+
+    def restore(self):
+        '''
+        NOTE: angora refuses an existing output directory and the evaluator
+        has processed the files in it, a dead instance cannot be resumed.
+        it is stopped and dropped, rcfuzz leaves angora out
+        '''
+        if not self.angoras:
+            self.start()
+            return
+        if all(angora.is_alive for angora in self.angoras):
+            return
+        self.stop()
+        raise FuzzerDriverException(f'{self.output}: angora is gone')
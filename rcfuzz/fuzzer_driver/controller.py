@@ -27,3 +27,10 @@ class Controller(object):
     @abstractmethod
     def stop(self):
         pass
+
+    def restore(self):
+        '''
+        rcfuzz resumed on the same output: instances still running are
+        kept, start the fuzzer if it has none
+        '''
+        self.start()
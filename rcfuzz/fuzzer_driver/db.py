@@ -1,6 +1,32 @@
+import threading
+
 import peewee
 
-db_proxy = peewee.DatabaseProxy()
+
+class ThreadLocalDatabaseProxy(peewee.DatabaseProxy):
+    '''
+    every thread binds the models to its own database, rcfuzz starts the
+    fuzzers of a campaign side by side and each driver call initializes
+    the proxy with the database of its fuzzer
+    '''
+    __slots__ = ('_local', )
+
+    def __init__(self):
+        object.__setattr__(self, '_local', threading.local())
+        super().__init__()
+
+    @property
+    def obj(self):
+        return getattr(self._local, 'obj', None)
+
+    def __setattr__(self, attr, value):
+        if attr == 'obj':
+            self._local.obj = value
+        else:
+            object.__setattr__(self, attr, value)
+
+
+db_proxy = ThreadLocalDatabaseProxy()
 
 
 class BaseModel(peewee.Model):
@@ -5,8 +5,12 @@ from abc import ABCMeta, abstractmethod
 
 import psutil
 
+from rcfuzz import watcher
 from rcfuzz.common import IS_DEBUG
 
+# how often a fuzzer being waited for is checked to be still running
+WAIT_ALIVE_INTERVAL = 10
+
 
 class FuzzerDriverException(Exception):
     pass
@@ -62,6 +66,32 @@ class PSFuzzer(Fuzzer):
             return None
         return proc
 
+    @property
+    def is_alive(self):
+        '''
+        the recorded pid still runs this fuzzer, not a process which
+        reused the pid after the fuzzer died
+        '''
+        proc = self.proc
+        if not proc:
+            return False
+        try:
+            if proc.status() == psutil.STATUS_ZOMBIE:
+                return False
+            cmdline = proc.cmdline()
+        except psutil.Error:
+            return False
+        return any(self.output in arg for arg in cmdline)
+
+    def wait_until(self, ready, path):
+        '''
+        block until ready() holds, woken up by file system events of path
+        instead of polling, raise if the fuzzer exits in the meantime
+        '''
+        while not watcher.wait_until(ready, path, WAIT_ALIVE_INTERVAL):
+            if not self.is_alive:
+                raise FuzzerDriverException(f'{self.output} exited')
+
     @abstractmethod
     def gen_cwd(self):
         return None
@@ -114,6 +144,14 @@ class PSFuzzer(Fuzzer):
             return
         self.run()
 
+    def restart(self):
+        '''
+        run again once the recorded process is gone, e.g. rcfuzz was
+        killed and resumed
+        '''
+        self.__pid = None
+        self.run()
+
     def pause(self):
         if not self.proc:
             raise FuzzerDriverException
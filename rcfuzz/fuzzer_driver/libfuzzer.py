@@ -160,3 +160,18 @@ class LIBFUZZERController(Controller):
         for libfuzzer in self.libfuzzers:
             libfuzzer.stop()
         self.db.drop_tables([LibFuzzerModel, ControllerModel])
+
+    def restore(self):
+        '''
+        rcfuzz resumed on the same output: instances still running are
+        kept, dead ones are restarted, libfuzzer reloads its corpus
+        '''
+        if not self.libfuzzers:
+            self.start()
+            return
+        for libfuzzer, model in zip(self.libfuzzers, LibFuzzerModel.select()):
+            if libfuzzer.is_alive:
+                continue
+            libfuzzer.restart()
+            model.pid = libfuzzer.pid
+            model.save()
@@ -43,6 +43,7 @@ def parse_args(raw_args=None):
     sp.add_parser('stop')
     sp.add_parser('pause')
     sp.add_parser('resume')
+    sp.add_parser('restore')
     p_scale = sp.add_parser('scale')
     p_scale.add_argument('scale_num', type=int)
     return p.parse_args(raw_args)
@@ -82,6 +83,8 @@ def main(fuzzer,
         controller.resume()
     elif command == 'scale':
         controller.scale(scale_num)
+    elif command == 'restore':
+        controller.restore()
 
 
 if __name__ == '__main__':
@@ -4,13 +4,13 @@ QSYM based on AFL
 import os
 import pathlib
 import sys
-import time
 
 import peewee
 # from .. import config as Config
 from rcfuzz import config as Config
 
 from . import afl
+from .afl import resume_seed
 from .controller import Controller
 from .db import AFLModel, ControllerModel, QSYMModel, db_proxy
 from .fuzzer import FuzzerDriverException, PSFuzzer
@@ -59,10 +59,13 @@ class QSYM(PSFuzzer):
         self.cgroup_path = cgroup_path
         self.__proc = None
 
+    @property
+    def queue_dir(self):
+        return f'{self.output}/{self.name}/queue'
+
     @property
     def is_ready(self):
-        queue_dir = f'{self.output}/{self.name}/queue'
-        return os.path.exists(queue_dir)
+        return os.path.exists(self.queue_dir)
 
     @property
     def target(self):
@@ -188,22 +191,23 @@ class QSYMController(Controller):
             return
         # start AFL master
         afl_master = AFLQSYM(**self.kwargs, master=True, fuzzer_id=1)
+        afl_master.seed = resume_seed(self.seed, self.output,
+                                      afl_master.name)
         afl_master.start()
         AFLModel.create(**self.kwargs,
                         master=True,
                         pid=afl_master.pid,
                         fuzzer_id=1)
-        while not afl_master.is_ready:
-            time.sleep(1)
-        while not afl_master.fuzzer_stats:
-            time.sleep(1)
+        afl_master.wait_until(lambda: afl_master.is_ready,
+                              afl_master.queue_dir)
+        afl_master.wait_until(lambda: afl_master.fuzzer_stats,
+                              afl_master.fuzzer_stats_file)
         # start QSYM, sync with afl slave like the README
         qsym = QSYM(**self.kwargs, afl_name=afl_master.name)
         qsym.start()
         QSYMModel.create(**self.kwargs, afl_name=afl_master.name, pid=qsym.pid)
         ControllerModel.create(scale_num=2)
-        while not qsym.is_ready:
-            time.sleep(1)
+        qsym.wait_until(lambda: qsym.is_ready, qsym.queue_dir)
         ready_path = os.path.join(self.output, 'ready')
         pathlib.Path(ready_path).touch(mode=0o666, exist_ok=True)
 
@@ -254,6 +258,7 @@ class QSYMController(Controller):
                               cgroup_path=self.cgroup_path,
                               master=False,
                               fuzzer_id=i)
+                afl.seed = resume_seed(self.seed, self.output, afl.name)
                 afl.start()
                 AFLModel.create(seed=self.seed,
                                 output=self.output,
@@ -306,3 +311,27 @@ class QSYMController(Controller):
         for qsym in self.qsyms:
             qsym.stop()
         self.db.drop_tables([AFLModel, QSYMModel, ControllerModel])
+
+    def restore(self):
+        '''
+        rcfuzz resumed on the same output: instances still running are
+        kept, dead ones are restarted on their own queue
+        '''
+        if not self.afls and not self.qsyms:
+            self.start()
+            return
+        models = {fuzzer.fuzzer_id: fuzzer for fuzzer in AFLModel.select()}
+        for afl in self.afls:
+            if afl.is_alive:
+                continue
+            afl.seed = resume_seed(self.seed, self.output, afl.name)
+            afl.restart()
+            model = models[afl.fuzzer_id]
+            model.pid = afl.pid
+            model.save()
+        for qsym, model in zip(self.qsyms, QSYMModel.select()):
+            if qsym.is_alive:
+                continue
+            qsym.restart()
+            model.pid = qsym.pid
+            model.save()
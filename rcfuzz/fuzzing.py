@@ -14,7 +14,7 @@ log = nested_dict()
 containers = nested_dict()
 
 
-def check(target, fuzzer, host_output):
+def check(target, fuzzer, host_output, resume=False):
     fuzzer_config = config['fuzzer'][fuzzer]
     target_config = config['target'][target]
     basename = fuzzer
@@ -27,7 +27,8 @@ def check(target, fuzzer, host_output):
         logger.error(f'{target} does not support {fuzzer}')
         return False
 
-    if create_output_dir:
+    # NOTE: resumed fuzzers keep their output directory
+    if create_output_dir or resume:
         return True
     else:
         host_output_dir = f'{host_output}/{target}'
@@ -9,6 +9,7 @@ import os
 import pathlib
 import random
 import signal
+import socket
 import subprocess
 import sys
 import threading
@@ -16,6 +17,7 @@ import time
 import traceback
 from abc import abstractmethod
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Deque, Dict, List, Optional
 
@@ -28,11 +30,13 @@ if __package__ is None:
 from cgroupspy import trees
 from rich.console import Console
 
-from . import cgroup_utils, cli
+from . import cgroup_utils, checkpoint, cli, cmin, distributed
 from . import config as Config
-from . import coverage, fuzzer_driver, fuzzing, policy, sync, utils
+from . import (coverage, fuzzer_driver, fuzzing, metrics, policy, stats,
+               sync, tracing, utils, watcher)
 from .common import IS_DEBUG, IS_PROFILE, nested_dict
 from .datatype import Bitmap
+from .fuzzer_driver.fuzzer import FuzzerDriverException
 from .mytype import BitmapContribution, Coverage, Fuzzer, Fuzzers
 from .singleton import SingletonABCMeta
 from . import thompson 
@@ -74,6 +78,9 @@ START_TIME: float = 0.0
 SLEEP_GRANULARITY: int = 60
 
 RUNNING: bool = False
+
+# the running scheduler, checkpointed by thread_checkpoint
+SCHEDULER: Optional['Schedule_Base'] = None
 # AUTOFZ_PID = os.getpid()
 
 # CGROUP_PATH = '/sys/fs/cgroup/cpu/yufu'
@@ -88,13 +95,14 @@ def terminate_rcfuzz():
     cleanup(1)
 
 
-def check_fuzzer_ready_one(fuzzer):
+def check_fuzzer_ready_one(fuzzer, timeout=0):
+    '''
+    wait up to timeout seconds for the ready file of fuzzer
+    '''
     global ARGS, FUZZERS, TARGET, OUTPUT
     # NOTE: fuzzer driver will create a ready file when launcing
     ready_path = os.path.join(OUTPUT, TARGET, fuzzer, 'ready')
-    if not os.path.exists(ready_path):
-        return False
-    return True
+    return watcher.wait_for_path(ready_path, timeout)
 
 
 def check_fuzzer_ready():
@@ -193,6 +201,11 @@ def cleanup(exit_code=0):
     logger.info('main 006 - cleanup')
     LOG['end_time'] = time.time()
     write_log()
+    if ARGS.checkpoint_interval:
+        try:
+            save_checkpoint()
+        except Exception:
+            logger.exception('main 047 - final checkpoint failed')
     for fuzzer in FUZZERS:
         stop(fuzzer)
     if exit_code == 0 and ARGS.tar:
@@ -250,6 +263,7 @@ def write_log():
     if OUTPUT and LOG_FILE_NAME:
         with open(f'{OUTPUT}/{LOG_FILE_NAME}', 'w') as f:
             f.write(json.dumps(LOG, default=json_dumper))
+        tracing.dump(OUTPUT / 'trace.json')
     else:
         assert False, 'update_log error'
 
@@ -290,7 +304,7 @@ def gen_fuzzer_driver_args(fuzzer: Fuzzer,
         'group': group,
         'program': TARGET,
         'argument': target_args,
-        'thread': jobs,
+        'thread': int(math.ceil(jobs)),
         'cgroup_path': cgroup_path
     }
     return kw
@@ -328,9 +342,10 @@ def start(fuzzer: Fuzzer,
                                 empty_seed=empty_seed)
     kw['command'] = 'start'
 
-    fuzzer_driver.main(**kw)
+    with tracing.span('driver.start', fuzzer=fuzzer):
+        fuzzer_driver.main(**kw)
     scale(fuzzer=fuzzer,
-          scale_num=jobs,
+          scale_num=int(math.ceil(jobs)),
           jobs=jobs,
           input_dir=input_dir,
           empty_seed=empty_seed)
@@ -346,7 +361,36 @@ def stop(fuzzer, jobs=1, input_dir=None, empty_seed=False):
                                 input_dir=input_dir,
                                 empty_seed=empty_seed)
     kw['command'] = 'stop'
-    fuzzer_driver.main(**kw)
+    with tracing.span('driver.stop', fuzzer=fuzzer):
+        fuzzer_driver.main(**kw)
+
+
+def restore(fuzzer: Fuzzer,
+            output_dir,
+            jobs=1,
+            input_dir=None,
+            empty_seed=False):
+    '''
+    call Fuzzer API to re-attach to the fuzzer of an earlier run, dead
+    instances are restarted on their output directory
+    '''
+    fuzzer_config = config['fuzzer'][fuzzer]
+    if fuzzer_config.get('create_output_dir', True):
+        os.makedirs(f'{output_dir}/{ARGS.target}/{fuzzer}', exist_ok=True)
+    else:
+        os.makedirs(f'{output_dir}/{ARGS.target}', exist_ok=True)
+    kw = gen_fuzzer_driver_args(fuzzer=fuzzer,
+                                jobs=jobs,
+                                input_dir=input_dir,
+                                empty_seed=empty_seed)
+    kw['command'] = 'restore'
+    with tracing.span('driver.restore', fuzzer=fuzzer):
+        fuzzer_driver.main(**kw)
+    scale(fuzzer=fuzzer,
+          scale_num=int(math.ceil(jobs)),
+          jobs=jobs,
+          input_dir=input_dir,
+          empty_seed=empty_seed)
 
 
 def scale(fuzzer, scale_num, jobs=1, input_dir=None, empty_seed=False):
@@ -361,7 +405,8 @@ def scale(fuzzer, scale_num, jobs=1, input_dir=None, empty_seed=False):
                                 empty_seed=empty_seed)
     kw['command'] = 'scale'
     kw['scale_num'] = scale_num
-    fuzzer_driver.main(**kw)
+    with tracing.span('driver.scale', fuzzer=fuzzer, scale_num=scale_num):
+        fuzzer_driver.main(**kw)
 
 
 def pause(fuzzer, jobs=1, input_dir=None, empty_seed=False):
@@ -374,7 +419,8 @@ def pause(fuzzer, jobs=1, input_dir=None, empty_seed=False):
                                 input_dir=input_dir,
                                 empty_seed=empty_seed)
     kw['command'] = 'pause'
-    fuzzer_driver.main(**kw)
+    with tracing.span('driver.pause', fuzzer=fuzzer):
+        fuzzer_driver.main(**kw)
 
 
 def resume(fuzzer, jobs=1, input_dir=None, empty_seed=False):
@@ -387,20 +433,30 @@ def resume(fuzzer, jobs=1, input_dir=None, empty_seed=False):
                                 input_dir=input_dir,
                                 empty_seed=empty_seed)
     kw['command'] = 'resume'
-    fuzzer_driver.main(**kw)
+    with tracing.span('driver.resume', fuzzer=fuzzer):
+        fuzzer_driver.main(**kw)
 
 
+@tracing.traced()
 def do_sync(fuzzers: Fuzzers, host_root_dir: Path) -> bool:
     logger.debug('do sync once')
     fuzzer_info = maybe_get_fuzzer_info(fuzzers)
     if not fuzzer_info:
         return False
     start_time = time.time()
-    sync.sync2(TARGET, fuzzers, host_root_dir)
+    with tracing.span('sync2', fuzzers=len(fuzzers)):
+        forwarded = sync.sync2(TARGET,
+                               fuzzers,
+                               host_root_dir,
+                               mode=ARGS.sync_mode,
+                               budget=ARGS.sync_budget)
     end_time = time.time()
     diff = end_time - start_time
     if IS_PROFILE: logger.info(f'main 008 - sync take {diff} seconds')
-    coverage.sync()
+    if ARGS.sync_mode == 'coverage':
+        coverage.sync_partial(forwarded)
+    else:
+        coverage.sync()
     return True
 
 
@@ -409,19 +465,50 @@ def update_fuzzer_log(fuzzers):
     new_log_entry = maybe_get_fuzzer_info(fuzzers)
     if not new_log_entry: return
     new_log_entry = compress_fuzzer_info(fuzzers, new_log_entry)
+    new_log_entry['fuzzer_stats'] = {
+        fuzzer: stats.AGGREGATOR.summary(fuzzer)
+        for fuzzer in fuzzers
+    }
     
     new_log_entry['timestamp'] = time.time()
     # NOTE: don't copy twice
     append_log('log', new_log_entry, do_copy=False)
 
 
+def update_fuzzer_stats(fuzzers):
+    '''
+    fuzzer_stats of the directories already known to the watchers, no scan
+    '''
+    stats.AGGREGATOR.add_dirs(watcher.OUTPUT_DIRS)
+    stats.AGGREGATOR.refresh()
+    for fuzzer in fuzzers:
+        summary = stats.AGGREGATOR.summary(fuzzer)
+        metrics.set_gauge('rcfuzz_fuzzer_execs_per_second',
+                          summary['execs_per_sec'],
+                          fuzzer=fuzzer)
+        metrics.set_gauge('rcfuzz_fuzzer_execs_total',
+                          summary['execs_done'],
+                          fuzzer=fuzzer)
+        metrics.set_gauge('rcfuzz_fuzzer_pending_favs',
+                          summary['pending_favs'],
+                          fuzzer=fuzzer)
+
+
+def update_campaign_metrics():
+    if START_TIME:
+        metrics.set_gauge('rcfuzz_campaign_elapsed_seconds',
+                          time.time() - START_TIME)
+
+
 def thread_update_fuzzer_log(fuzzers):
     update_time = min(60, EXPLORE_TIME, SYNC_TIME, EXPLOIT_TIME)
     while not is_end():
+        update_fuzzer_stats(fuzzers)
         update_fuzzer_log(fuzzers)
         time.sleep(update_time)
 
 
+@tracing.traced()
 def maybe_get_fuzzer_info(fuzzers) -> Optional[Coverage]:
     logger.debug('get_fuzzer_info called')
 
@@ -469,6 +556,7 @@ def maybe_get_fuzzer_info(fuzzers) -> Optional[Coverage]:
     return new_fuzzer_info
 
 
+@tracing.traced()
 def get_fuzzer_info(fuzzers) -> Coverage:
     logger.debug('get_fuzzer_info called')
 
@@ -573,8 +661,77 @@ def set_fuzzer_cgroup(fuzzer, new_cpu):
         quota = 1000
     logger.debug(f'set fuzzer cgroup {fuzzer} {new_cpu} {quota}')
     fuzzer_cpu_node.controller.cfs_quota_us = quota
+    metrics.set_gauge('rcfuzz_cpu_share', quota / cfs_period_us, fuzzer=fuzzer)
+
+
+def get_input_dir():
+    '''
+    seeds of new fuzzer instances, the minimised corpus once published
+    '''
+    if ARGS.cmin_interval:
+        view = cmin.view_dir(OUTPUT)
+        if view:
+            return view
+    return INPUT
+
+
+def thread_cmin():
+    '''
+    periodically publish the minimised corpus
+    '''
+    while not is_end_global():
+        time.sleep(ARGS.cmin_interval)
+        with tracing.span('cmin.publish'):
+            try:
+                cmin.MINIMIZER.publish(OUTPUT)
+            except OSError:
+                logger.exception('cmin publish failed')
+
+
+def save_checkpoint():
+    '''
+    scheduler and campaign state for --resume, OUTPUT/checkpoint
+    '''
+    if SCHEDULER is None:
+        return
+    state, bitmaps = SCHEDULER.get_state()
+    state['elapsed'] = time.time() - START_TIME
+    state['cpu_assign'] = dict(CPU_ASSIGN)
+    state['log_file_name'] = LOG_FILE_NAME
+    with tracing.span('checkpoint.save'):
+        generation = checkpoint.save(OUTPUT / 'checkpoint', state, bitmaps)
+    logger.debug(f'checkpoint {generation}')
+
+
+def update_jobs():
+    '''
+    cores of this target, rcfuzz.campaign moves them between targets
+    through OUTPUT/cores, read once per round
+    '''
+    global JOBS
+    try:
+        with open(OUTPUT / 'cores') as f:
+            cores = float(f.read())
+    except (FileNotFoundError, ValueError):
+        return
+    if cores > 0 and not math.isclose(cores, JOBS):
+        logger.info(f'main 048 - cores {JOBS} => {cores}')
+        JOBS = cores
+
+
+def thread_checkpoint():
+    '''
+    periodically checkpoint the scheduler
+    '''
+    while not is_end_global():
+        time.sleep(ARGS.checkpoint_interval)
+        try:
+            save_checkpoint()
+        except OSError:
+            logger.exception('main 044 - checkpoint failed')
 
 
+@tracing.traced()
 def update_fuzzer_limit(fuzzer, new_cpu):
     global ARGS, CPU_ASSIGN, INPUT
     if fuzzer not in CPU_ASSIGN: return
@@ -606,7 +763,7 @@ def update_fuzzer_limit(fuzzer, new_cpu):
     scale(fuzzer=fuzzer,
           scale_num=scale_num,
           jobs=JOBS,
-          input_dir=INPUT,
+          input_dir=get_input_dir(),
           empty_seed=ARGS.empty_seed)
 
 
@@ -703,6 +860,7 @@ class Schedule_Base(SchedulingAlgorithm):
     def explore_wait(self, explore_time):
         sleep(explore_time)
 
+    @tracing.traced()
     def explore_round_robin(self):
         explore_time = self.explore_time
         remain_time = explore_time
@@ -716,8 +874,12 @@ class Schedule_Base(SchedulingAlgorithm):
             run_time = min(remain_time, 30)
 
             for explore_fuzzer in self.explore_fuzzers:
-                self.run_one(explore_fuzzer)
-                self.explore_wait(run_time)
+                with tracing.span('explore_slice',
+                                  fuzzer=explore_fuzzer,
+                                  round=explore_round,
+                                  seconds=run_time):
+                    self.run_one(explore_fuzzer)
+                    self.explore_wait(run_time)
 
             remain_time -= run_time
             
@@ -794,8 +956,12 @@ class Schedule_Base(SchedulingAlgorithm):
 
             while focusRemainTime > 0 :
                 focusRunTime = min(focusRemainTime, 60)
-                self.run_one(fuzzer)
-                sleep(focusRunTime)
+                with tracing.span('exploit_slice',
+                                  fuzzer=fuzzer,
+                                  round=focusRound,
+                                  seconds=focusRunTime):
+                    self.run_one(fuzzer)
+                    sleep(focusRunTime)
 
                 self.tsFuzzers[fuzzer].total_runTime += focusRunTime
                 focusRoundInfo = get_fuzzer_info(self.fuzzers)
@@ -935,6 +1101,15 @@ class Schedule_Base(SchedulingAlgorithm):
         if self.round_num == 1: return 1
         return self.picked_times[fuzzer] / (self.round_num - 1)
 
+    def get_state(self):
+        '''
+        state kept across restarts, (json values, bitmaps)
+        '''
+        return {}, {}
+
+    def set_state(self, state, bitmaps):
+        pass
+
     def pre_round(self):
         pass
 
@@ -990,10 +1165,12 @@ class Schedule_Focus(Schedule_Base):
         fuzzer_info = get_fuzzer_info(self.fuzzers)
         fuzzer_info = compress_fuzzer_info(self.fuzzers, fuzzer_info)
         append_log('round', {'fuzzer_info': fuzzer_info})
+        metrics.inc('rcfuzz_scheduler_rounds_total')
 
     def main(self):
         while True:
             if is_end(): return
+            update_jobs()
             if not self.pre_round(): continue
             self.one_round()
             self.post_round()
@@ -1033,6 +1210,54 @@ class Schedule_RCFuzz(Schedule_Base):
 
         self.diff_round = 0
 
+        # the explore phase runs once per campaign, not again on resume
+        self.explored = False
+
+    def get_state(self):
+        state = {
+            'round_num': self.round_num,
+            'first_round': self.first_round,
+            'explored': self.explored,
+            'diff_round': self.diff_round,
+            'picked_times': dict(self.picked_times),
+            'ts_fuzzers': {
+                fuzzer: {
+                    'S': float(ts.S),
+                    'F': float(ts.F),
+                    'diff': float(ts.diff),
+                    'threshold': float(ts.threshold),
+                    'total_runTime': float(ts.total_runTime)
+                }
+                for fuzzer, ts in self.tsFuzzers.items()
+            }
+        }
+        bitmaps = {
+            fuzzer: bitmap.bitmap
+            for fuzzer, bitmap in self.all_bitmap_contribution.items()
+        }
+        return state, bitmaps
+
+    def set_state(self, state, bitmaps):
+        self.round_num = state['round_num']
+        self.first_round = state['first_round']
+        self.explored = state['explored']
+        self.diff_round = state['diff_round']
+        for fuzzer in self.fuzzers:
+            if fuzzer in state['picked_times']:
+                self.picked_times[fuzzer] = state['picked_times'][fuzzer]
+            if fuzzer in bitmaps:
+                self.all_bitmap_contribution[fuzzer] = Bitmap(
+                    bitmap=bitmaps[fuzzer])
+            values = state['ts_fuzzers'].get(fuzzer)
+            if values:
+                ts = self.tsFuzzers[fuzzer]
+                ts.S = values['S']
+                ts.F = values['F']
+                ts.diff = values['diff']
+                ts.threshold = values['threshold']
+                ts.total_runTime = values['total_runTime']
+            logger.info(f'main 045 - resume fuzzer : {fuzzer}, fuzzer_success : {self.tsFuzzers[fuzzer].S}, fuzzer_fail : {self.tsFuzzers[fuzzer].F}, picked_time : {self.picked_times.get(fuzzer, 0)}')
+
 
     # explore round setting - sync + init variable
     def pre_round(self):
@@ -1062,15 +1287,18 @@ class Schedule_RCFuzz(Schedule_Base):
         logger.debug(f'round elasp: {elasp} seconds')
         self.first_round = False
         self.round_num += 1
+        metrics.inc('rcfuzz_scheduler_rounds_total')
 
     def pre_run(self) -> bool:
         logger.info(f"main 032 - {self.name}: pre_run")
         self.reset_bitmap_contribution()
+        # NOTE: set_state may have restored them
         for fuzzer in self.fuzzers:
-            self.all_bitmap_contribution[fuzzer] = Bitmap.empty()
-            self.picked_times[fuzzer] = 0
+            self.all_bitmap_contribution.setdefault(fuzzer, Bitmap.empty())
+            self.picked_times.setdefault(fuzzer, 0)
         return True
 
+    @tracing.traced()
     def explore(self):
         round_start_time = time.time()
 
@@ -1103,6 +1331,9 @@ class Schedule_RCFuzz(Schedule_Base):
         for fuzzer in FUZZERS:
             logger.info(f'main 902 - explore end result(each fuzzer) - fuzzer : { fuzzer }, fuzzer_success : { self.tsFuzzers[fuzzer].S }, fuzzer_fail : { self.tsFuzzers[fuzzer].F }, fuzzer_run_time : {self.tsFuzzers[fuzzer].total_runTime}, fuzzer_branch_difficulty : {self.tsFuzzers[fuzzer].diff}, fuzzer_threshold : {self.tsFuzzers[fuzzer].threshold}')
 
+        self.explored = True
+
+    @tracing.traced()
     def exploit(self):
         round_start_time = time.time()
         global OUTPUT
@@ -1115,18 +1346,22 @@ class Schedule_RCFuzz(Schedule_Base):
 
         logger.info('main 1000 - exploit round { self.round_num} start result(whole) - previous_bitmap : {previous_bitmap}, previous_unique_bug : {previous_unique_bug}')            
 
+        decision_start = time.perf_counter()
         selected_fuzzers = thompson.selectFuzzer(self.tsFuzzers)
 
         logger.info(f'main 1001 - selected_fuzzers: {selected_fuzzers}')
 
         picked_fuzzers, cpu_assign = [], {}
         picked_fuzzers, cpu_assign = self.policy_bitmap.calculate_cpu(selected_fuzzers, before_exploit_fuzzer_info, JOBS)
+        metrics.set_gauge('rcfuzz_scheduler_decision_seconds',
+                          time.perf_counter() - decision_start)
 
         for fuzzer in self.fuzzers:
             logger.info(f'main 1002 - pick before fuzzer : {fuzzer}, picked_time : {self.picked_times[fuzzer]} ')
 
         for fuzzer in picked_fuzzers:
             self.picked_times[fuzzer] += 1
+            metrics.inc('rcfuzz_scheduler_picked_total', fuzzer=fuzzer)
 
         for fuzzer in self.fuzzers:
             logger.info(f'main 1003 - pick after fuzzer : {fuzzer}, picked_time : {self.picked_times[fuzzer]} ')
@@ -1157,12 +1392,15 @@ class Schedule_RCFuzz(Schedule_Base):
 
     def main(self):
         if is_end():return
-        if not self.pre_round():return
-        logger.info(f'main 801 - explore phase start')
-        self.explore()
-        logger.info(f'main 802 - explore phase end')
+        update_jobs()
+        if not self.explored:
+            if not self.pre_round():return
+            logger.info(f'main 801 - explore phase start')
+            self.explore()
+            logger.info(f'main 802 - explore phase end')
         while True:
             if is_end():return
+            update_jobs()
             if not self.pre_round():continue
             logger.info(f'main 803 - exploit phase round {self.round_num} start')
             self.exploit()
@@ -1170,6 +1408,48 @@ class Schedule_RCFuzz(Schedule_Base):
             self.post_round()
 
 
+class Schedule_Distributed(Schedule_Base):
+    '''
+    cpu assignment decided by the coordinator, see distributed.py
+    '''
+    def __init__(self, fuzzers, backend: distributed.RcfuzzBackend):
+        self.fuzzers = fuzzers
+        self.backend = backend
+        self.name = 'Distributed'
+        self.allocation: Optional[Dict[Fuzzer, float]] = None
+
+    def one_round(self):
+        allocation = self.backend.allocation
+        if allocation and allocation != self.allocation:
+            logger.info(f'main 041 - coordinator allocation: {allocation}')
+            for fuzzer in self.fuzzers:
+                update_fuzzer_limit(fuzzer, allocation.get(fuzzer, 0))
+            self.allocation = dict(allocation)
+            append_log('round', {'allocation': self.allocation})
+            metrics.inc('rcfuzz_scheduler_rounds_total')
+        self.backend.import_pending()
+        do_sync(self.fuzzers, OUTPUT)
+        sleep(SYNC_TIME)
+
+    def main(self):
+        while True:
+            if is_end(): return
+            self.one_round()
+
+    def pre_run(self) -> bool:
+        logger.info(f"main 042 - {self.name}: pre_run")
+        return True
+
+    def run(self):
+        if not self.pre_run():
+            return
+        self.main()
+        self.post_run()
+
+    def post_run(self):
+        logger.info(f"main 043 - {self.name}: post_run")
+
+
 def init_cgroup():
     '''
     cgroup /rcfuzz is created by /init.sh, the command is the following:
@@ -1181,15 +1461,15 @@ def init_cgroup():
     cgroup_path = cgroup_utils.get_cgroup_path()
     container_id = os.path.basename(cgroup_path)
     cgroup_path_fs = os.path.join('/sys/fs/cgroup/cpu', cgroup_path[1:])
-    rcfuzz_cgroup_path_fs = os.path.join(cgroup_path_fs, 'rcfuzz')
+    rcfuzz_cgroup_path_fs = os.path.join(cgroup_path_fs, ARGS.cgroup)
     # print(rcfuzz_cgroup_path_fs)
     if not os.path.exists(rcfuzz_cgroup_path_fs):
         logger.critical(
             'rcfuzz cgroup not exists. make sure to run /init.sh first')
         terminate_rcfuzz()
     t = trees.Tree()
-    p = os.path.join('/cpu', cgroup_path[1:], 'rcfuzz')
-    CGROUP_ROOT = os.path.join(cgroup_path, 'rcfuzz')
+    p = os.path.join('/cpu', cgroup_path[1:], ARGS.cgroup)
+    CGROUP_ROOT = os.path.join(cgroup_path, ARGS.cgroup)
     # print('CGROUP_ROOT', CGROUP_ROOT)
     cpu_node = t.get_node_by_path(p)
     for fuzzer in FUZZERS:
@@ -1205,12 +1485,63 @@ def init_cgroup():
     return True
 
 
+def warm_up(fuzzer: Fuzzer, timeout) -> bool:
+    '''
+    start fuzzer, or restore it with --resume, and wait until it is ready
+    it is paused afterwards to wait for the others unless --focus-one
+    return False if the fuzzer cannot be resumed
+    '''
+    global ARGS, FUZZERS, TARGET, OUTPUT, INPUT, JOBS
+    logger.info(f'main 036 - warm up {fuzzer}')
+    if ARGS.resume:
+        try:
+            restore(fuzzer=fuzzer,
+                    output_dir=OUTPUT,
+                    jobs=JOBS,
+                    input_dir=INPUT,
+                    empty_seed=ARGS.empty_seed)
+        except FuzzerDriverException as e:
+            logger.warning(f'main 049 - {fuzzer} not resumed, left out: {e}')
+            return False
+    else:
+        start(fuzzer=fuzzer,
+              output_dir=OUTPUT,
+              timeout=timeout,
+              jobs=JOBS,
+              input_dir=INPUT,
+              empty_seed=ARGS.empty_seed)
+
+    coverage.thread_run_fuzzer(TARGET,
+                               fuzzer,
+                               FUZZERS,
+                               OUTPUT,
+                               ARGS.timeout,
+                               '10s',
+                               input_dir=INPUT,
+                               empty_seed=ARGS.empty_seed,
+                               crash_mode=ARGS.crash_mode,
+                               input_only=False)
+    if not check_fuzzer_ready_one(fuzzer, timeout=180):
+        logger.critical('fuzzers start up error')
+        terminate_rcfuzz()
+    logger.info(f'main 037 - fuzzer {fuzzer} ready')
+
+    # pause current fuzzer and wait others to start up
+    if not ARGS.focus_one:
+        pause(fuzzer=fuzzer,
+              jobs=JOBS,
+              input_dir=INPUT,
+              empty_seed=ARGS.empty_seed)
+    return True
+
+
 def main():
     global LOG, ARGS, TARGET, FUZZERS, TARGET, SYNC_TIME, EXPLORE_TIME
     global EXPLOIT_TIME, JOBS, OUTPUT, INPUT, LOG_DATETIME, LOG_FILE_NAME
     global CPU_ASSIGN
     global START_TIME
     global RUNNING
+    global SCHEDULER
     random.seed()
     ARGS = cli.ArgsParser().parse_args()
 
@@ -1237,19 +1568,33 @@ def main():
         INPUT = None
     for fuzzer in FUZZERS:
         if ARGS.focus_one and fuzzer != ARGS.focus_one: continue
-        if not fuzzing.check(TARGET, fuzzer, OUTPUT):
+        if not fuzzing.check(TARGET, fuzzer, OUTPUT, ARGS.resume):
+            exit(1)
+    if ARGS.resume:
+        if not OUTPUT.is_dir():
+            logger.error(f'{OUTPUT} does not exist, nothing to resume')
+            exit(1)
+    else:
+        try:
+            os.makedirs(OUTPUT, exist_ok=False)
+        except FileExistsError:
+            logger.error(f'remove {OUTPUT} or --resume')
             exit(1)
-    try:
-        os.makedirs(OUTPUT, exist_ok=False)
-    except FileExistsError:
-        logger.error(f'remove {OUTPUT}')
-        exit(1)
 
-    with open(os.path.join(OUTPUT, 'cmdline'), 'w') as f:
+    cmdline_mode = 'a' if ARGS.resume else 'w'
+    with open(os.path.join(OUTPUT, 'cmdline'), cmdline_mode) as f:
         cmdline = " ".join(sys.argv)
         LOG['cmd'] = cmdline
         f.write(f"{cmdline}\n")
     init()
+    saved = None
+    if ARGS.resume:
+        saved = checkpoint.load(OUTPUT / 'checkpoint')
+        if saved is None:
+            logger.warning('main 046 - no checkpoint, the scheduler starts over')
+    if ARGS.metrics_port is not None or ARGS.metrics_socket:
+        metrics.register_callback(update_campaign_metrics)
+        metrics.serve(port=ARGS.metrics_port, socket_path=ARGS.metrics_socket)
     current_time = time.time()
     LOG['rcfuzz_args'] = ARGS.as_dict()  # remove Namespace
     LOG['rcfuzz_config'] = config
@@ -1260,8 +1605,14 @@ def main():
     EXPLORE_TIME = ARGS.explore
     EXPLOIT_TIME = ARGS.exploit
 
+    if ARGS.cmin_interval:
+        coverage.enable_cmin()
+    if ARGS.resume:
+        coverage.enable_resume()
+        sync.restore(TARGET, FUZZERS, OUTPUT)
+
     # NOTE: default is 1 core
-    JOBS = 1
+    JOBS = ARGS.cores
     timeout = ARGS.timeout
     #PARALLEL = ARGS.parallel
 
@@ -1277,6 +1628,9 @@ def main():
 
     # wait for seed evaluated
     START_TIME = time.time()
+    if saved:
+        # the timeout covers the time before the restart
+        START_TIME -= saved[0]['elapsed']
 
     # setup cgroup
     init_cgroup()
@@ -1291,49 +1645,53 @@ def main():
         tsFuzzers[fuzzer].threshold = ARGS.threshold
         logger.info(f'main 035 - init fuzzer : { fuzzer }, fuzzer_success : { tsFuzzers[fuzzer].S }, fuzzer_fail : { tsFuzzers[fuzzer].F } total_run_time : {tsFuzzers[fuzzer].total_runTime}, fuzzer_diff : { tsFuzzers[fuzzer].diff}, fuzzer_threshold : { tsFuzzers[fuzzer].threshold} ')
 
-    # setup fuzzers
-    for fuzzer in FUZZERS:
-        if ARGS.focus_one and fuzzer != ARGS.focus_one: continue
-        logger.info(f'main 036 - warm up {fuzzer}')
+    # setup fuzzers side by side
+    # NOTE: the evaluator runs already, thread_run_global started it above
+    warm_up_fuzzers = [
+        fuzzer for fuzzer in FUZZERS
+        if not ARGS.focus_one or fuzzer == ARGS.focus_one
+    ]
+    for fuzzer in warm_up_fuzzers:
         CPU_ASSIGN[fuzzer] = 0
-        start(fuzzer=fuzzer,
-                output_dir=OUTPUT,
-                timeout=timeout,
-                jobs=JOBS,
-                input_dir=INPUT,
-                empty_seed=ARGS.empty_seed)
-
-        coverage.thread_run_fuzzer(TARGET,
-                                   fuzzer,
-                                   FUZZERS,
-                                   OUTPUT,
-                                   ARGS.timeout,
-                                   '10s',
-                                   input_dir=INPUT,
-                                   empty_seed=ARGS.empty_seed,
-                                   crash_mode=ARGS.crash_mode,
-                                   input_only=False)
-        time.sleep(2)
-        start_time = time.time()
-        while not check_fuzzer_ready_one(fuzzer):
-            current_time = time.time()
-            elasp = current_time - start_time
-            if elasp > 180:
-                logger.critical('fuzzers start up error')
-                terminate_rcfuzz()
-            logger.info(
-                f'main 037 - fuzzer not {fuzzer} ready, sleep 10 seconds to warm up')
-            time.sleep(2)
-
-        # pause current fuzzer and wait others to start up
-        if not ARGS.focus_one:
-            pause(fuzzer=fuzzer,
-                  jobs=JOBS,
-                  input_dir=INPUT,
-                  empty_seed=ARGS.empty_seed)
+    with ThreadPoolExecutor(max_workers=len(warm_up_fuzzers),
+                            thread_name_prefix='warm-up') as executor:
+        futures = [
+            executor.submit(warm_up, fuzzer, timeout)
+            for fuzzer in warm_up_fuzzers
+        ]
+        # NOTE: re-raise errors of the drivers
+        ready = [future.result() for future in futures]
+    left_out = [
+        fuzzer for fuzzer, is_ready in zip(warm_up_fuzzers, ready)
+        if not is_ready
+    ]
+    if left_out:
+        FUZZERS = [fuzzer for fuzzer in FUZZERS if fuzzer not in left_out]
+        for fuzzer in left_out:
+            del CPU_ASSIGN[fuzzer]
+            del tsFuzzers[fuzzer]
+        if not FUZZERS:
+            logger.critical('no fuzzer resumed')
+            terminate_rcfuzz()
 
     LOG_DATETIME = f'{datetime.datetime.now():%Y-%m-%d-%H-%M-%S}'
     LOG_FILE_NAME = f'{TARGET}_{LOG_DATETIME}.json'
+    if saved:
+        # keep appending to the log of the earlier run
+        LOG_FILE_NAME = saved[0]['log_file_name']
+        log_path = OUTPUT / LOG_FILE_NAME
+        if log_path.exists():
+            with open(log_path) as f:
+                old_log = json.load(f)
+            LOG['log'] = old_log.get('log', [])
+            LOG['round'] = old_log.get('round', [])
+            LOG['start_time'] = old_log.get('start_time', LOG['start_time'])
+        LOG['resume_time'] = time.time()
+
+        # cpu shares of the earlier run until the scheduler decides again
+        if not ARGS.focus_one:
+            for fuzzer, cpu in saved[0]['cpu_assign'].items():
+                update_fuzzer_limit(fuzzer, cpu)
 
     thread_fuzzer_log = threading.Thread(target=thread_update_fuzzer_log,
                                          kwargs={'fuzzers': FUZZERS},
@@ -1346,11 +1704,26 @@ def main():
     thread_health = threading.Thread(target=thread_health_check, daemon=True)
     thread_health.start()
 
+    if ARGS.cmin_interval:
+        threading.Thread(target=thread_cmin, name='cmin', daemon=True).start()
+
     scheduler = None
     algorithm = None
 
+    # multi-node; the coordinator assigns the cpu
+    if ARGS.coordinator:
+        backend = distributed.RcfuzzBackend(TARGET, FUZZERS, OUTPUT)
+        agent = distributed.Agent(ARGS.node or socket.gethostname(), FUZZERS,
+                                  JOBS, backend)
+        agent.connect(ARGS.coordinator)
+        threading.Thread(target=agent.run,
+                         args=(SYNC_TIME, ),
+                         name='agent',
+                         daemon=True).start()
+        scheduler = Schedule_Distributed(fuzzers=FUZZERS, backend=backend)
+        algorithm = 'distributed'
     # foucs one fuzzer; equal to running a single individual fuzzer
-    if ARGS.focus_one:
+    elif ARGS.focus_one:
         scheduler = Schedule_Focus(fuzzers=FUZZERS, focus=ARGS.focus_one)
         algorithm = ARGS.focus_one
     # rcfuzz mode
@@ -1365,6 +1738,10 @@ def main():
     assert scheduler
     assert algorithm
 
+    if saved:
+        scheduler.set_state(*saved)
+    SCHEDULER = scheduler
+
     LOG['algorithm'] = algorithm
 
     RUNNING = True
@@ -1372,6 +1749,11 @@ def main():
     thread_log = threading.Thread(target=thread_write_log, daemon=True)
     thread_log.start()
 
+    if ARGS.checkpoint_interval:
+        threading.Thread(target=thread_checkpoint,
+                         name='checkpoint',
+                         daemon=True).start()
+
     # Timer to stop all fuzzers
     logger.info(f'main 038 - algorithm : {algorithm}, scheduler: {scheduler}')
 
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+'''
+in-process metrics registry with a Prometheus text format endpoint
+
+counters and gauges are updated by the threads that already do the work,
+an update is a dict write under a lock. values that are cheap to read on
+demand (queue sizes, elapsed time) are collected by callbacks when the
+endpoint is scraped. nothing here touches the disk
+
+the endpoint is a plain HTTP server on 127.0.0.1:<port> or on a unix
+socket, e.g. curl --unix-socket /tmp/rcfuzz.sock http://localhost/metrics
+'''
+import logging
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('rcfuzz.metrics')
+
+# name => (type, help)
+METRICS: Dict[str, Tuple[str, str]] = {
+    'rcfuzz_campaign_elapsed_seconds':
+    ('gauge', 'seconds since the campaign started'),
+    'rcfuzz_scheduler_rounds_total': ('counter', 'finished scheduler rounds'),
+    'rcfuzz_scheduler_decision_seconds':
+    ('gauge', 'time taken by the last fuzzer selection and cpu assignment'),
+    'rcfuzz_scheduler_picked_total':
+    ('counter', 'times a fuzzer was picked for exploitation'),
+    'rcfuzz_cpu_share':
+    ('gauge', 'cpu quota of the fuzzer cgroup in cores'),
+    'rcfuzz_fuzzer_execs_per_second':
+    ('gauge', 'execs_per_sec summed over the fuzzer_stats of a fuzzer'),
+    'rcfuzz_fuzzer_execs_total':
+    ('gauge', 'execs_done summed over the fuzzer_stats of a fuzzer'),
+    'rcfuzz_fuzzer_pending_favs':
+    ('gauge', 'pending_favs summed over the fuzzer_stats of a fuzzer'),
+    'rcfuzz_bitmap_edges': ('gauge', 'edges in the evaluator bitmap'),
+    'rcfuzz_unique_bugs': ('gauge', 'unique bugs found by the evaluator'),
+    'rcfuzz_evaluator_queue_length':
+    ('gauge', 'files discovered but not yet evaluated'),
+    'rcfuzz_evaluator_lag_seconds':
+    ('gauge', 'age of the last evaluated file when it was dequeued'),
+    'rcfuzz_evaluator_backlog':
+    ('gauge', 'queue entries of a fuzzer not evaluated yet'),
+    'rcfuzz_evaluator_oldest_pending_seconds':
+    ('gauge', 'age of the oldest file waiting in the coverage queue'),
+    'rcfuzz_evaluator_shed_total':
+    ('counter', 'lagging files deferred instead of evaluated in order'),
+    'rcfuzz_evaluator_shed_fraction':
+    ('gauge', 'fraction of discovered files not evaluated because of shedding'),
+    'rcfuzz_evaluator_files_total': ('counter', 'files evaluated'),
+    'rcfuzz_evaluator_files_per_second':
+    ('gauge', 'files evaluated per second over the last bitmap flush'),
+    'rcfuzz_evaluator_crashes_total':
+    ('counter', 'crashes processed, by ASAN triage or fingerprint reuse'),
+    'rcfuzz_sync_test_cases_total':
+    ('counter', 'test cases linked into a fuzzer by sync'),
+    'rcfuzz_sync_new_test_cases_total':
+    ('counter', 'distinct test cases collected by sync'),
+    'rcfuzz_sync_rejected_total':
+    ('counter', 'test cases not synced since they add no edges to a fuzzer'),
+    'rcfuzz_cmin_seeds': ('gauge', 'seeds in the published minimised corpus'),
+    'rcfuzz_cmin_considered':
+    ('gauge', 'seeds the published minimised corpus was chosen from'),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+VALUES: Dict[str, Dict[LabelKey, float]] = {name: {} for name in METRICS}
+
+CALLBACKS: List[Callable[[], None]] = []
+
+LOCK = threading.Lock()
+
+SERVERS: List[socketserver.BaseServer] = []
+
+
+def _key(labels) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(labels)
+    values = VALUES[name]
+    with LOCK:
+        values[key] = values.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    key = _key(labels)
+    with LOCK:
+        VALUES[name][key] = value
+
+
+def get(name, **labels) -> Optional[float]:
+    return VALUES[name].get(_key(labels))
+
+
+def register_callback(callback: Callable[[], None]):
+    '''
+    callback sets gauges right before every scrape
+    '''
+    CALLBACKS.append(callback)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def exposition() -> str:
+    for callback in CALLBACKS:
+        try:
+            callback()
+        except Exception:
+            logger.exception(f'metrics callback {callback} failed')
+    lines = []
+    with LOCK:
+        snapshot = {name: dict(values) for name, values in VALUES.items()}
+    for name, (kind, help_text) in METRICS.items():
+        values = snapshot[name]
+        if not values:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key, value in sorted(values.items()):
+            if key:
+                labels = ','.join(f'{k}="{_escape(v)}"' for k, v in key)
+                lines.append(f'{name}{{{labels}}} {_format_value(value)}')
+            else:
+                lines.append(f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = exposition().encode()
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # NOTE: unix socket peers have no address
+        logger.debug(format % args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _serve_forever(server):
+    t = threading.Thread(target=server.serve_forever,
+                         name='metrics',
+                         daemon=True)
+    t.start()
+    SERVERS.append(server)
+
+
+def serve(port: Optional[int] = None, socket_path=None):
+    if port is not None:
+        server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        _serve_forever(server)
+        logger.info(f'metrics on http://127.0.0.1:{server.server_port}/metrics')
+    if socket_path is not None:
+        socket_path = str(socket_path)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, MetricsHandler)
+        _serve_forever(server)
+        logger.info(f'metrics on unix socket {socket_path}')
+
+
+def shutdown():
+    while SERVERS:
+        server = SERVERS.pop()
+        server.shutdown()
+        server.server_close()
+        if isinstance(server, UnixHTTPServer):
+            os.remove(server.server_address)
+
+
+def test():
+    import socket
+    import tempfile
+    import urllib.request
+    inc('rcfuzz_evaluator_files_total', 3)
+    inc('rcfuzz_evaluator_files_total', 2)
+    inc('rcfuzz_sync_test_cases_total', fuzzer='afl')
+    set_gauge('rcfuzz_cpu_share', 0.5, fuzzer='a"fl')
+    start = time.time()
+    register_callback(lambda: set_gauge('rcfuzz_campaign_elapsed_seconds',
+                                        time.time() - start))
+    with tempfile.TemporaryDirectory() as d:
+        socket_path = os.path.join(d, 'metrics.sock')
+        serve(port=0, socket_path=socket_path)
+        port = SERVERS[0].server_address[1]
+        with urllib.request.urlopen(
+                f'http://127.0.0.1:{port}/metrics') as response:
+            text = response.read().decode()
+        assert 'rcfuzz_evaluator_files_total 5\n' in text
+        assert 'rcfuzz_sync_test_cases_total{fuzzer="afl"} 1\n' in text
+        assert 'rcfuzz_cpu_share{fuzzer="a\\"fl"} 0.5\n' in text
+        assert '# TYPE rcfuzz_campaign_elapsed_seconds gauge' in text
+        assert 'rcfuzz_bitmap_edges' not in text
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path)
+            s.sendall(b'GET /metrics HTTP/1.0\r\n\r\n')
+            response = b''
+            while True:
+                data = s.recv(65536)
+                if not data:
+                    break
+                response += data
+        assert response.startswith(b'HTTP/1.0 200')
+        assert b'rcfuzz_evaluator_files_total 5\n' in response
+        shutdown()
+    print('ok')
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+'''
+per-seed edge sets keyed by content checksum
+
+edges.bin is an append-only file of sorted uint32 edge ids, one run per
+seed, read through np.memmap. edges.idx is an append-only index of fixed
+size records (md5 digest, offset and length in edges), loaded into a dict
+when the store is opened. a seed is stored once whichever fuzzer found it
+and never has to be executed again to learn its coverage
+'''
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('rcfuzz.seedstore')
+
+EDGE_DTYPE = np.dtype('<u4')
+
+
+class SeedStore(object):
+    # md5 digest, offset in edges, # edges
+    RECORD = struct.Struct('<16sQI')
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.data_path = self.directory / 'edges.bin'
+        self.index_path = self.directory / 'edges.idx'
+        self.lock = threading.Lock()
+        # checksum => (offset, # edges)
+        self.index: Dict[str, Tuple[int, int]] = {}
+        self.size = self._recover()
+        self.data_file = open(self.data_path, 'ab')
+        self.index_file = open(self.index_path, 'ab')
+        self.map: Optional[np.memmap] = None
+        # edges written but maybe still buffered
+        self.dirty = False
+
+    def _recover(self) -> int:
+        '''
+        load the index, dropping records a crash left incomplete
+        return # edges in edges.bin
+        '''
+        if not self.data_path.exists():
+            self.data_path.touch()
+        data_bytes = os.path.getsize(self.data_path)
+        if data_bytes % EDGE_DTYPE.itemsize:
+            data_bytes -= data_bytes % EDGE_DTYPE.itemsize
+            os.truncate(self.data_path, data_bytes)
+        size = data_bytes // EDGE_DTYPE.itemsize
+        if not self.index_path.exists():
+            self.index_path.touch()
+        with open(self.index_path, 'rb') as f:
+            content = f.read()
+        valid = len(content) - len(content) % SeedStore.RECORD.size
+        for digest, offset, count in SeedStore.RECORD.iter_unpack(
+                content[:valid]):
+            if offset + count > size:
+                valid = len(self.index) * SeedStore.RECORD.size
+                break
+            self.index[digest.hex()] = (offset, count)
+        if valid != len(content):
+            logger.warning(f'{self.index_path}: dropped incomplete records')
+            os.truncate(self.index_path, valid)
+        return size
+
+    def __contains__(self, checksum_f) -> bool:
+        return checksum_f in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def checksums(self) -> List[str]:
+        with self.lock:
+            return list(self.index)
+
+    def put(self, checksum_f, edges: np.ndarray) -> bool:
+        '''
+        edges: sorted edge ids, return False if the seed is already stored
+        '''
+        edges = np.asarray(edges, dtype=EDGE_DTYPE)
+        with self.lock:
+            if checksum_f in self.index:
+                return False
+            offset = self.size
+            self.data_file.write(edges.tobytes())
+            self.index_file.write(
+                SeedStore.RECORD.pack(bytes.fromhex(checksum_f), offset,
+                                      len(edges)))
+            self.size += len(edges)
+            self.index[checksum_f] = (offset, len(edges))
+            self.dirty = True
+            return True
+
+    def get(self, checksum_f) -> Optional[np.ndarray]:
+        '''
+        read-only view of the edges of a seed, None if not stored
+        '''
+        with self.lock:
+            entry = self.index.get(checksum_f)
+            if entry is None:
+                return None
+            offset, count = entry
+            if not count:
+                return np.empty(0, dtype=EDGE_DTYPE)
+            if self.map is None or offset + count > len(self.map):
+                self._remap()
+            return self.map[offset:offset + count]
+
+    def _remap(self):
+        if self.dirty:
+            self._flush()
+        # NOTE: views of the old map keep it alive
+        self.map = np.memmap(self.data_path,
+                             dtype=EDGE_DTYPE,
+                             mode='r',
+                             shape=(self.size, ))
+
+    def _flush(self):
+        # edges first, an index record never points past the data
+        self.data_file.flush()
+        self.index_file.flush()
+        self.dirty = False
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.data_file.close()
+            self.index_file.close()
+            self.map = None
+
+
+def test():
+    import hashlib
+    import tempfile
+
+    def md5(s):
+        return hashlib.md5(s.encode()).hexdigest()
+
+    with tempfile.TemporaryDirectory() as d:
+        store = SeedStore(d)
+        assert store.get(md5('a')) is None
+        assert store.put(md5('a'), np.array([1, 5, 9], dtype=np.uint32))
+        assert not store.put(md5('a'), np.array([2], dtype=np.uint32))
+        assert store.put(md5('b'), np.array([], dtype=np.uint32))
+        assert list(store.get(md5('a'))) == [1, 5, 9]
+        assert len(store.get(md5('b'))) == 0
+        # appended after the map was created
+        assert store.put(md5('c'), np.arange(1000, 1100, dtype=np.uint32))
+        assert list(store.get(md5('c'))) == list(range(1000, 1100))
+        assert list(store.get(md5('a'))) == [1, 5, 9]
+        store.close()
+
+        # half written record and edges after a crash
+        with open(store.index_path, 'ab') as f:
+            f.write(b'\0' * 5)
+        with open(store.data_path, 'ab') as f:
+            f.write(b'\1\2')
+        store = SeedStore(d)
+        assert len(store) == 3 and md5('b') in store
+        assert list(store.get(md5('c'))) == list(range(1000, 1100))
+        assert store.put(md5('d'), np.array([7], dtype=np.uint32))
+        assert list(store.get(md5('d'))) == [7]
+        store.close()
+        assert sorted(SeedStore(d).checksums()) == sorted(
+            md5(s) for s in 'abcd')
+    print('ok')
+
+
+if __name__ == '__main__':
+    test()
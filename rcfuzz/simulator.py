@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+'''
+offline scheduler simulator
+
+replays recorded per-fuzzer coverage and bug growth under the real
+scheduling classes of main.py with a virtual clock, so that a 24h schedule
+runs in seconds and policies can be compared without running fuzzers
+
+a fuzzer given x cores for t seconds advances x * t seconds along its
+recorded curves, the curves are best taken from --focus-one campaigns where
+wall clock equals the fuzzer's cpu time
+
+edges and bugs get synthetic identities: every fuzzer finds them in a noisy
+version of one shared order, so easy edges are common to all fuzzers and
+late ones tend to be distinct, sync shares them like the evaluator does
+'''
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# FIXME
+if not __package__:
+    sys.path.append(
+        os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    __package__ = "rcfuzz"
+
+import numpy as np
+from tap import Tap
+
+from . import main, thompson, utils
+from .common import nested_dict
+from .datatype import Bitmap
+from .mytype import Fuzzer, Fuzzers
+from .singleton import SingletonABCMeta
+
+logger = logging.getLogger('rcfuzz.simulator')
+
+# virtual seconds between two points of the reported curves
+SAMPLE_INTERVAL = 60
+
+BUG_KINDS = [
+    'unique_bugs', 'unique_bugs_ip', 'unique_bugs_trace', 'unique_bugs_trace3'
+]
+
+
+class Curve(object):
+    '''
+    recorded count over fuzzer cpu time, flat after the recording ends
+    '''
+    def __init__(self, times: List[float], values: List[int]):
+        self.times = np.array(times, dtype='float64')
+        self.values = np.array(values, dtype='float64')
+
+    def __call__(self, t: float) -> int:
+        if len(self.times) == 0:
+            return 0
+        return int(np.interp(t, self.times, self.values))
+
+    @property
+    def final(self) -> int:
+        return int(self.values[-1]) if len(self.values) else 0
+
+
+def load_curves(log_paths: List[Path]) -> Dict[Fuzzer, Tuple[Curve, Curve]]:
+    '''
+    fuzzer => (bitmap curve, bug curve) from rcfuzz campaign json logs
+    a --focus-one campaign wins over a scheduled one for the same fuzzer
+    '''
+    curves: Dict[Fuzzer, Tuple[Curve, Curve]] = {}
+    focused: Dict[Fuzzer, bool] = {}
+    for log_path in log_paths:
+        with open(log_path) as f:
+            log = json.load(f)
+        start_time = log['start_time']
+        entries = sorted(log['log'], key=lambda entry: entry['timestamp'])
+        fuzzers = set()
+        for entry in entries:
+            fuzzers.update(entry['bitmap'].keys())
+        for fuzzer in fuzzers:
+            is_focus = log.get('algorithm') == fuzzer
+            if fuzzer in curves and (focused[fuzzer] or not is_focus):
+                continue
+            times, bitmaps, bugs = [0.0], [0], [0]
+            for entry in entries:
+                if fuzzer not in entry['bitmap']:
+                    continue
+                times.append(max(entry['timestamp'] - start_time, times[-1]))
+                bitmaps.append(entry['bitmap'][fuzzer])
+                bugs.append(entry['unique_bugs'][fuzzer]['unique_bugs'])
+            curves[fuzzer] = (Curve(times, bitmaps), Curve(times, bugs))
+            focused[fuzzer] = is_focus
+            logger.info(f'{fuzzer}: {bitmaps[-1]} edges, {bugs[-1]} bugs '
+                        f'in {times[-1]:.0f}s from {log_path}')
+    return curves
+
+
+def noisy_orders(fuzzers: Fuzzers, universe: int, divergence: float,
+                 rng: np.random.Generator) -> Dict[Fuzzer, np.ndarray]:
+    ret = {}
+    base = np.arange(universe, dtype='float64')
+    for fuzzer in fuzzers:
+        noise = rng.normal(0, divergence * universe, size=universe)
+        ret[fuzzer] = np.argsort(base + noise, kind='stable')
+    return ret
+
+
+class FuzzerModel(object):
+    def __init__(self, bitmap_curve: Curve, bug_curve: Curve,
+                 edge_order: np.ndarray, bug_order: np.ndarray):
+        self.bitmap_curve = bitmap_curve
+        self.bug_curve = bug_curve
+        self.edge_order = edge_order
+        self.bug_order = bug_order
+        self.cpu_time = 0.0
+        # edges and bugs received by sync
+        self.synced_edges = np.zeros(Bitmap.BITMAP_SIZE, dtype='uint8')
+        self.synced_bugs: set = set()
+        # (# of own edges, synced edges) => bitmap, it is asked for often
+        # while nothing changed
+        self._cached: Optional[Tuple[int, np.ndarray, Bitmap]] = None
+
+    def bitmap(self) -> Bitmap:
+        n = min(self.bitmap_curve(self.cpu_time), len(self.edge_order))
+        cached = self._cached
+        if cached and cached[0] == n and cached[1] is self.synced_edges:
+            return cached[2]
+        edges = self.synced_edges.copy()
+        edges[self.edge_order[:n]] = 1
+        # NOTE: Bitmap operations return new objects, sharing is safe
+        bitmap = Bitmap(edges)
+        self._cached = (n, self.synced_edges, bitmap)
+        return bitmap
+
+    def bugs(self) -> set:
+        n = min(self.bug_curve(self.cpu_time), len(self.bug_order))
+        return self.synced_bugs | set(self.bug_order[:n].tolist())
+
+
+class VirtualClock(object):
+    '''
+    stands in for the time module of main.py
+    '''
+    def __init__(self, simulation: 'Simulation'):
+        self.simulation = simulation
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.simulation.advance(seconds)
+
+    # NOTE: scheduler decision latency is real computation, not simulated
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+
+
+class Simulation(object):
+    def __init__(self, curves: Dict[Fuzzer, Tuple[Curve, Curve]],
+                 divergence: float, seed: int):
+        self.fuzzers: Fuzzers = sorted(curves)
+        rng = np.random.default_rng(seed)
+        edge_universe = min(
+            Bitmap.BITMAP_SIZE,
+            max(1, int(sum(c[0].final for c in curves.values()))))
+        bug_universe = max(1, int(sum(c[1].final for c in curves.values())))
+        edge_orders = noisy_orders(self.fuzzers, edge_universe, divergence,
+                                   rng)
+        bug_orders = noisy_orders(self.fuzzers, bug_universe, divergence, rng)
+        self.models = {
+            fuzzer: FuzzerModel(curves[fuzzer][0], curves[fuzzer][1],
+                                edge_orders[fuzzer], bug_orders[fuzzer])
+            for fuzzer in self.fuzzers
+        }
+        self.cpu_assign: Dict[Fuzzer, float] = {f: 0 for f in self.fuzzers}
+        self.clock = VirtualClock(self)
+        self.next_sample = 0.0
+        # (time, global edges, global bugs)
+        self.curve: List[Tuple[float, int, int]] = []
+
+    def advance(self, seconds: float):
+        while seconds > 0:
+            step = min(seconds, max(self.next_sample - self.clock.now, 0))
+            if step == 0:
+                self.sample()
+                self.next_sample += SAMPLE_INTERVAL
+                continue
+            for fuzzer, cpu in self.cpu_assign.items():
+                self.models[fuzzer].cpu_time += step * cpu
+            self.clock.now += step
+            seconds -= step
+
+    def sample(self):
+        info = self.fuzzer_info()
+        self.curve.append(
+            (self.clock.now, info['global_coverage']['line'],
+             info['global_unique_bugs']['unique_bugs']))
+
+    def fuzzer_info(self):
+        info = nested_dict()
+        global_bitmap = Bitmap.empty()
+        global_bugs: set = set()
+        for fuzzer in self.fuzzers:
+            bitmap = self.models[fuzzer].bitmap()
+            bugs = self.models[fuzzer].bugs()
+            info['coverage'][fuzzer] = {
+                'line': int(np.count_nonzero(bitmap.bitmap))
+            }
+            info['unique_bugs'][fuzzer] = {kind: len(bugs) for kind in BUG_KINDS}
+            info['bitmap'][fuzzer] = bitmap
+            global_bitmap |= bitmap
+            global_bugs |= bugs
+        info['global_coverage'] = {
+            'line': int(np.count_nonzero(global_bitmap.bitmap))
+        }
+        info['global_unique_bugs'] = {
+            kind: len(global_bugs)
+            for kind in BUG_KINDS
+        }
+        info['global_bitmap'] = global_bitmap
+        return info
+
+    def sync(self, fuzzers: Fuzzers):
+        edges = np.zeros(Bitmap.BITMAP_SIZE, dtype='uint8')
+        bugs: set = set()
+        for fuzzer in fuzzers:
+            edges |= self.models[fuzzer].bitmap().bitmap
+            bugs |= self.models[fuzzer].bugs()
+        for fuzzer in fuzzers:
+            self.models[fuzzer].synced_edges = edges
+            self.models[fuzzer].synced_bugs = bugs
+
+    # replacements of main.py functions
+    def get_fuzzer_info(self, fuzzers):
+        return self.fuzzer_info()
+
+    def do_sync(self, fuzzers: Fuzzers, host_root_dir) -> bool:
+        self.sync(fuzzers)
+        return True
+
+    def update_fuzzer_limit(self, fuzzer, new_cpu):
+        self.cpu_assign[fuzzer] = new_cpu
+        main.CPU_ASSIGN[fuzzer] = new_cpu
+
+
+class SimulatedArgs(object):
+    def __init__(self, timeout: str):
+        self.timeout = timeout
+        self.focus_one = None
+        self.output = None
+
+
+def simulate(curves: Dict[Fuzzer, Tuple[Curve, Curve]],
+             policy: str,
+             timeout: str,
+             explore: int,
+             exploit: int,
+             diff: int,
+             threshold: int,
+             divergence: float,
+             seed: int) -> Dict:
+    '''
+    run one policy: 'rcfuzz' or 'focus:<fuzzer>'
+    '''
+    random.seed(seed)
+    np.random.seed(seed)
+    SingletonABCMeta._instances.clear()
+    simulation = Simulation(curves, divergence, seed)
+    fuzzers = simulation.fuzzers
+
+    patches = {
+        'time': simulation.clock,
+        'get_fuzzer_info': simulation.get_fuzzer_info,
+        'maybe_get_fuzzer_info': simulation.get_fuzzer_info,
+        'do_sync': simulation.do_sync,
+        'update_fuzzer_limit': simulation.update_fuzzer_limit,
+        'update_jobs': lambda: None,
+        'append_log': lambda key, val, do_copy=True: None,
+        'ARGS': SimulatedArgs(timeout),
+        'FUZZERS': fuzzers,
+        'JOBS': 1,
+        'CPU_ASSIGN': {f: 0 for f in fuzzers},
+        'START_TIME': 0.0,
+        'OUTPUT': None,
+    }
+    saved = {name: getattr(main, name, None) for name in patches}
+    for name, value in patches.items():
+        setattr(main, name, value)
+    try:
+        if policy == 'rcfuzz':
+            ts_fuzzers = {}
+            for fuzzer in fuzzers:
+                ts_fuzzers[fuzzer] = thompson.fuzzer()
+                ts_fuzzers[fuzzer].diff = diff
+                ts_fuzzers[fuzzer].threshold = threshold
+            scheduler = main.Schedule_RCFuzz(fuzzers=fuzzers,
+                                             tsFuzzers=ts_fuzzers,
+                                             explore_time=explore,
+                                             exploit_time=exploit,
+                                             diff_threshold=threshold)
+        else:
+            assert policy.startswith('focus:'), f'unknown policy {policy}'
+            focus = policy[len('focus:'):]
+            assert focus in fuzzers, f'no recorded curve for {focus}'
+            scheduler = main.Schedule_Focus(fuzzers=fuzzers, focus=focus)
+        scheduler.run()
+        end = utils.time_to_seconds(timeout)
+        if simulation.clock.now < end:
+            simulation.advance(end - simulation.clock.now)
+        simulation.sample()
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+        SingletonABCMeta._instances.clear()
+
+    picked = {}
+    if policy == 'rcfuzz':
+        picked = dict(scheduler.picked_times)
+    return {
+        'policy': policy,
+        'coverage': simulation.curve[-1][1],
+        'unique_bugs': simulation.curve[-1][2],
+        'cpu_time': {
+            fuzzer: simulation.models[fuzzer].cpu_time
+            for fuzzer in fuzzers
+        },
+        'picked_times': picked,
+        'curve': simulation.curve,
+    }
+
+
+class ArgsParser(Tap):
+    log: List[Path]
+    policy: List[str]
+    output: Optional[Path]
+    timeout: str
+    explore: int
+    exploit: int
+    diff: int
+    threshold: int
+    divergence: float
+    seed: int
+
+    def configure(self):
+        self.add_argument("--log",
+                          "-l",
+                          nargs='+',
+                          required=True,
+                          help="rcfuzz campaign json logs to replay")
+        self.add_argument("--policy",
+                          "-p",
+                          nargs='+',
+                          default=['rcfuzz'],
+                          help="rcfuzz, focus:<fuzzer> or focus:all")
+        self.add_argument("--output",
+                          "-o",
+                          default=None,
+                          help="write the curves of every policy as json")
+        self.add_argument("--timeout", "-T", default='24h')
+        self.add_argument("--explore", type=int, default=900)
+        self.add_argument("--exploit", type=int, default=900)
+        self.add_argument("--diff", type=int, default=100)
+        self.add_argument("--threshold", type=int, default=10)
+        self.add_argument(
+            "--divergence",
+            type=float,
+            default=0.1,
+            help="how differently fuzzers order the same edges and bugs")
+        self.add_argument("--seed", type=int, default=0)
+
+
+def main_simulator():
+    args = ArgsParser().parse_args()
+    # the schedulers log every decision
+    logging.getLogger('rcfuzz').setLevel(logging.WARNING)
+    logging.getLogger('autofz').setLevel(logging.WARNING)
+    curves = load_curves(args.log)
+    policies = []
+    for policy in args.policy:
+        if policy == 'focus:all':
+            policies += [f'focus:{fuzzer}' for fuzzer in sorted(curves)]
+        else:
+            policies.append(policy)
+    results = []
+    for policy in policies:
+        result = simulate(curves, policy, args.timeout, args.explore,
+                          args.exploit, args.diff, args.threshold,
+                          args.divergence, args.seed)
+        results.append(result)
+        print(f'{policy}: {result["coverage"]} edges, '
+              f'{result["unique_bugs"]} bugs')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f)
+
+
+def test():
+    hour = 3600
+    times = [0, hour, 6 * hour, 24 * hour]
+    curves = {
+        'afl': (Curve(times, [0, 3000, 5000, 6000]), Curve(times,
+                                                           [0, 1, 2, 3])),
+        'qsym': (Curve(times, [0, 1000, 6000, 9000]), Curve(times,
+                                                            [0, 0, 1, 4])),
+    }
+    logging.getLogger('rcfuzz').setLevel(logging.WARNING)
+    logging.getLogger('autofz').setLevel(logging.WARNING)
+    for policy in ['focus:afl', 'rcfuzz']:
+        result = simulate(curves, policy, '24h', 900, 900, 100, 10, 0.1, 0)
+        assert result['curve'][-1][0] >= 24 * hour
+        total = sum(result['cpu_time'].values())
+        # is_end() lets the schedulers run 300s past the timeout
+        assert 24 * hour <= total <= 24 * hour + 300 + SAMPLE_INTERVAL, total
+        print(policy, result['coverage'], result['unique_bugs'])
+    print('ok')
+
+
+if __name__ == '__main__':
+    main_simulator()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+'''
+fuzzer_stats aggregation
+
+every AFL-style instance (afl-master, afl-slave_N, angora, the AFL side of
+qsym) rewrites its fuzzer_stats every few seconds. files are only parsed
+again when their mtime or size changed, parsed records are typed and kept
+as a bounded time series per fuzzer and instance, so the scheduler and
+the policies can query execs/s, pending favourites etc. without I/O
+'''
+import logging
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .mytype import Fuzzer
+
+logger = logging.getLogger('rcfuzz.stats')
+
+# one record a minute for a day
+SERIES_LENGTH = 1440
+
+
+def _percent(value: str) -> float:
+    return float(value.rstrip('%'))
+
+
+class FuzzerStats(object):
+    # fuzzer_stats key => (attribute, type)
+    FIELDS: Dict[str, Tuple[str, Callable]] = {
+        'start_time': ('start_time', int),
+        'last_update': ('last_update', int),
+        'fuzzer_pid': ('fuzzer_pid', int),
+        'cycles_done': ('cycles_done', int),
+        'execs_done': ('execs_done', int),
+        'execs_per_sec': ('execs_per_sec', float),
+        'paths_total': ('paths_total', int),
+        'paths_favored': ('paths_favored', int),
+        'paths_found': ('paths_found', int),
+        'paths_imported': ('paths_imported', int),
+        'max_depth': ('max_depth', int),
+        'pending_favs': ('pending_favs', int),
+        'pending_total': ('pending_total', int),
+        'stability': ('stability', _percent),
+        'bitmap_cvg': ('bitmap_cvg', _percent),
+        'unique_crashes': ('unique_crashes', int),
+        'unique_hangs': ('unique_hangs', int),
+        'last_path': ('last_path', int),
+        'last_crash': ('last_crash', int),
+        'last_hang': ('last_hang', int),
+    }
+
+    def __init__(self, raw: Dict[str, str]):
+        # every key as written by the fuzzer, e.g. for fuzzer specific ones
+        self.raw = raw
+        self.start_time: Optional[int] = None
+        self.last_update: Optional[int] = None
+        self.fuzzer_pid: Optional[int] = None
+        self.cycles_done: Optional[int] = None
+        self.execs_done: Optional[int] = None
+        self.execs_per_sec: Optional[float] = None
+        self.paths_total: Optional[int] = None
+        self.paths_favored: Optional[int] = None
+        self.paths_found: Optional[int] = None
+        self.paths_imported: Optional[int] = None
+        self.max_depth: Optional[int] = None
+        self.pending_favs: Optional[int] = None
+        self.pending_total: Optional[int] = None
+        # percent
+        self.stability: Optional[float] = None
+        self.bitmap_cvg: Optional[float] = None
+        self.unique_crashes: Optional[int] = None
+        self.unique_hangs: Optional[int] = None
+        # unix time, 0 if nothing was found yet
+        self.last_path: Optional[int] = None
+        self.last_crash: Optional[int] = None
+        self.last_hang: Optional[int] = None
+        for key, (attr, convert) in FuzzerStats.FIELDS.items():
+            value = raw.get(key)
+            if value is None:
+                continue
+            try:
+                setattr(self, attr, convert(value))
+            except ValueError:
+                logger.debug(f'bad fuzzer_stats value {key}: {value}')
+
+    @classmethod
+    def parse(cls, text: str) -> Optional['FuzzerStats']:
+        raw = {}
+        for line in text.splitlines():
+            key, sep, value = line.partition(':')
+            if sep:
+                raw[key.strip()] = value.strip()
+        # NOTE: empty while the fuzzer rewrites it
+        if not raw:
+            return None
+        return cls(raw)
+
+    def toJSON(self):
+        return {
+            attr: getattr(self, attr)
+            for attr, _ in FuzzerStats.FIELDS.values()
+        }
+
+    def __repr__(self):
+        return f'FuzzerStats(pid={self.fuzzer_pid}, execs_per_sec={self.execs_per_sec}, paths_total={self.paths_total})'
+
+
+class StatsFile(object):
+    '''
+    one fuzzer_stats file, parsed again only after it changed
+    '''
+    def __init__(self, path):
+        self.path = Path(path)
+        self.stamp: Optional[Tuple[int, int]] = None
+        self.record: Optional[FuzzerStats] = None
+
+    def refresh(self) -> bool:
+        '''
+        return whether a new record was parsed
+        '''
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self.stamp:
+            return False
+        try:
+            with open(self.path) as f:
+                record = FuzzerStats.parse(f.read())
+        except FileNotFoundError:
+            return False
+        if record is None:
+            return False
+        self.stamp = stamp
+        self.record = record
+        return True
+
+
+# path => StatsFile, shared by read()
+FILES: Dict[str, StatsFile] = {}
+FILES_LOCK = threading.Lock()
+
+
+def read(path) -> Optional[FuzzerStats]:
+    '''
+    latest record of a fuzzer_stats file, a stat() when it did not change
+    '''
+    path = str(path)
+    with FILES_LOCK:
+        stats_file = FILES.get(path)
+        if stats_file is None:
+            stats_file = FILES[path] = StatsFile(path)
+    stats_file.refresh()
+    return stats_file.record
+
+
+class StatsAggregator(object):
+    def __init__(self, series_length=SERIES_LENGTH):
+        self.series_length = series_length
+        self.lock = threading.Lock()
+        # fuzzer => instance => fuzzer_stats
+        self.files: Dict[Fuzzer, Dict[str, StatsFile]] = {}
+        # (fuzzer, instance) => records, appended whenever the file changed
+        self.series: Dict[Tuple[Fuzzer, str], Deque[FuzzerStats]] = {}
+
+    def add_dir(self, fuzzer: Fuzzer, directory):
+        '''
+        directory is an instance output directory, e.g. afl/afl-master_1
+        '''
+        directory = Path(directory)
+        instance = directory.name
+        with self.lock:
+            instances = self.files.setdefault(fuzzer, {})
+            if instance not in instances:
+                instances[instance] = StatsFile(directory / 'fuzzer_stats')
+                self.series[(fuzzer, instance)] = deque(
+                    maxlen=self.series_length)
+
+    def add_dirs(self, dirs: Dict[Fuzzer, List[Path]]):
+        for fuzzer, directories in list(dirs.items()):
+            for directory in list(directories):
+                self.add_dir(fuzzer, directory)
+
+    def refresh(self) -> int:
+        '''
+        one stat() per instance, return # of records parsed
+        '''
+        updated = 0
+        with self.lock:
+            for fuzzer, instances in self.files.items():
+                for instance, stats_file in instances.items():
+                    if stats_file.refresh():
+                        self.series[(fuzzer, instance)].append(
+                            stats_file.record)
+                        updated += 1
+        return updated
+
+    def latest(self, fuzzer: Fuzzer) -> Dict[str, FuzzerStats]:
+        with self.lock:
+            instances = self.files.get(fuzzer, {})
+            return {
+                instance: stats_file.record
+                for instance, stats_file in instances.items()
+                if stats_file.record is not None
+            }
+
+    def get_series(self, fuzzer: Fuzzer,
+                   instance: Optional[str] = None) -> List[FuzzerStats]:
+        '''
+        records of one instance, or of every instance of fuzzer by
+        last_update
+        '''
+        with self.lock:
+            if instance is not None:
+                return list(self.series.get((fuzzer, instance), []))
+            ret = []
+            for (f, _), records in self.series.items():
+                if f == fuzzer:
+                    ret += records
+        return sorted(ret, key=lambda r: r.last_update or 0)
+
+    def execs_per_sec(self, fuzzer: Fuzzer) -> float:
+        return sum(r.execs_per_sec or 0
+                   for r in self.latest(fuzzer).values())
+
+    def summary(self, fuzzer: Fuzzer) -> Dict:
+        '''
+        instances of fuzzer added up, times and ratios use the latest or
+        the mean
+        '''
+        records = list(self.latest(fuzzer).values())
+        ret = {'instances': len(records)}
+        for key in [
+                'execs_done', 'execs_per_sec', 'paths_total', 'paths_found',
+                'paths_imported', 'pending_favs', 'pending_total',
+                'unique_crashes', 'unique_hangs'
+        ]:
+            ret[key] = sum(getattr(r, key) or 0 for r in records)
+        for key in ['last_path', 'last_crash', 'last_update']:
+            ret[key] = max((getattr(r, key) or 0 for r in records), default=0)
+        stability = [r.stability for r in records if r.stability is not None]
+        ret['stability'] = (sum(stability) / len(stability)
+                            if stability else None)
+        return ret
+
+
+AGGREGATOR = StatsAggregator()
+
+
+def test():
+    import tempfile
+    import time
+    with tempfile.TemporaryDirectory() as d:
+        master = Path(d) / 'afl' / 'afl-master_1'
+        slave = Path(d) / 'afl' / 'afl-slave_2'
+        for directory in [master, slave]:
+            os.makedirs(directory)
+        aggregator = StatsAggregator(series_length=2)
+        aggregator.add_dirs({'afl': [master, slave]})
+        assert aggregator.refresh() == 0
+
+        def write(directory, execs, paths, stability='100.00%'):
+            with open(directory / 'fuzzer_stats', 'w') as f:
+                f.write(f'start_time        : 1600000000\n'
+                        f'last_update       : {int(time.time())}\n'
+                        f'fuzzer_pid        : 42\n'
+                        f'execs_done        : {execs}\n'
+                        f'execs_per_sec     : {execs / 10:.2f}\n'
+                        f'paths_total       : {paths}\n'
+                        f'stability         : {stability}\n'
+                        f'afl_banner        : target\n')
+
+        write(master, 1000, 10)
+        write(slave, 500, 4, '90.00%')
+        assert aggregator.refresh() == 2
+        # unchanged files are not parsed again
+        assert aggregator.refresh() == 0
+        summary = aggregator.summary('afl')
+        assert summary['instances'] == 2
+        assert summary['execs_done'] == 1500
+        assert summary['paths_total'] == 14
+        assert abs(summary['stability'] - 95) < 1e-9
+        assert aggregator.execs_per_sec('afl') == 150
+        record = aggregator.latest('afl')['afl-master_1']
+        assert record.fuzzer_pid == 42 and record.raw['afl_banner'] == 'target'
+        for i in range(3):
+            write(master, 2000 + i, 11 + i)
+            os.utime(master / 'fuzzer_stats', ns=(i, i))
+            aggregator.refresh()
+        series = aggregator.get_series('afl', 'afl-master_1')
+        assert [r.execs_done for r in series] == [2001, 2002]
+        assert len(aggregator.get_series('afl')) == 3
+        assert read(master / 'fuzzer_stats').execs_done == 2002
+        assert read(Path(d) / 'missing') is None
+        assert FuzzerStats.parse('') is None
+    print('ok')
+
+
+if __name__ == '__main__':
+    test()
@@ -11,15 +11,19 @@ sync current inputs from one fuzzer to another fuzzer
 
 import glob
 import hashlib
+import heapq
+import itertools
 import logging
 import os
 import pathlib
 import time
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from . import config as Config
-from . import utils, watcher
+from . import cmin, evaluator, metrics, utils, watcher
 from .common import nested_dict
 from .mytype import Fuzzer, Fuzzers, FuzzerType
 
@@ -74,6 +78,13 @@ global_processed_checksum = set()
 
 processed_checksum = nested_dict()
 
+# --sync-mode coverage: seeds some fuzzer has neither received nor rejected
+CANDIDATES: Dict[str, TestCase] = {}
+# checksum => syncs waited for the evaluator to trace the seed
+TRACE_WAIT: Dict[str, int] = {}
+# seeds still not traced after this many syncs are forwarded blindly
+TRACE_WAIT_LIMIT = 3
+
 
 def init_dir(rcfuzz_dir: Path) -> None:
     '''
@@ -96,6 +107,28 @@ def init(target: str, fuzzers: Fuzzers, host_root_dir: Path) -> None:
         init_dir(rcfuzz_dir)
 
 
+def restore(target: str, fuzzers: Fuzzers, host_root_dir: Path) -> None:
+    '''
+    --resume: test cases synced by the earlier run are not synced again,
+    new ones are numbered after them
+    '''
+    for fuzzer in fuzzers:
+        processed_checksum[fuzzer] = set()
+        queue_dir = host_root_dir / target / fuzzer / 'rcfuzz' / 'queue'
+        if not queue_dir.is_dir():
+            continue
+        names = os.listdir(queue_dir)
+        index[fuzzer] = len(names)
+        for name in names:
+            try:
+                processed_checksum[fuzzer].add(checksum(
+                    str(queue_dir / name)))
+            except FileNotFoundError:
+                # the synced test case is gone
+                pass
+        logger.info(f'{fuzzer}: {len(names)} test cases synced before')
+
+
 def import_test_case_dirs(fuzzer_root_dir: Path, input_dir: str) -> List[Path]:
     ret: List[Path] = []
     for queue_dir in pathlib.Path(fuzzer_root_dir).rglob('**/%s' % input_dir):
@@ -143,9 +176,120 @@ def sync_test_case(target, fuzzer, host_root_dir, testcase):
 
     # NOTE: every fuzzer will copy file before executing (they should)
     os.symlink(rel_path, new_filename)
+    metrics.inc('rcfuzz_sync_test_cases_total', fuzzer=fuzzer)
+
 
+def select_seeds(
+    candidates: List[TestCase], bitmap: np.ndarray, budget: int,
+    get_edges: Callable[[str], Optional[np.ndarray]]
+) -> Tuple[List[TestCase], List[TestCase]]:
+    '''
+    lazy greedy set cover: pick up to budget (0: no limit) seeds by the
+    edges they add to bitmap and to the seeds picked before them
+    return (selected, rejected), rejected seeds add nothing to the fuzzer
+    '''
+    covered = None
+    selected: List[TestCase] = []
+    rejected: List[TestCase] = []
+    heap = []
+    seq = itertools.count()
+    for test_case in candidates:
+        edges = get_edges(test_case.checksum)
+        if edges is None:
+            if TRACE_WAIT.get(test_case.checksum, 0) < TRACE_WAIT_LIMIT:
+                continue
+            # NOTE: ranked last, never rejected
+            heapq.heappush(heap, (0, next(seq), test_case, None))
+            continue
+        gain = int(np.count_nonzero(bitmap[edges] == 0))
+        if not gain:
+            rejected.append(test_case)
+            continue
+        heapq.heappush(heap, (-gain, next(seq), test_case, edges))
+    while heap and (not budget or len(selected) < budget):
+        neg_gain, _, test_case, edges = heapq.heappop(heap)
+        if edges is None:
+            selected.append(test_case)
+            continue
+        if covered is not None:
+            gain = int(np.count_nonzero(covered[edges] == 0))
+            if not gain:
+                rejected.append(test_case)
+                continue
+            # gains only shrink, recheck against the next best
+            if heap and -gain > heap[0][0]:
+                heapq.heappush(heap, (-gain, next(seq), test_case, edges))
+                continue
+        else:
+            covered = np.array(bitmap, copy=True)
+        covered[edges] = 1
+        selected.append(test_case)
+    return selected, rejected
 
-def sync2(target: str, fuzzers: Fuzzers, host_root_dir: Path):
+
+def sync_coverage(target, fuzzers, host_root_dir, new_test_cases,
+                  budget) -> Dict[Fuzzer, List[str]]:
+    '''
+    forward a seed to a fuzzer only if it covers edges missing from the
+    evaluator bitmap of the fuzzer, best seeds first
+    '''
+    get_edges = evaluator.get_seed_edges
+    forwarded: Dict[Fuzzer, List[str]] = {}
+    for test_case in new_test_cases:
+        CANDIDATES[test_case.checksum] = test_case
+    # NOTE: the cheapest seed of each of their edges is in the minimised
+    # corpus, and is forwarded or rejected on its own
+    if cmin.MINIMIZER is not None:
+        redundant = [c for c in CANDIDATES if cmin.MINIMIZER.redundant(c)]
+        for c in redundant:
+            del CANDIDATES[c]
+            TRACE_WAIT.pop(c, None)
+            for fuzzer in fuzzers:
+                processed_checksum[fuzzer].add(c)
+        if redundant:
+            logger.debug(f'sync: {len(redundant)} candidates not in cmin')
+    for c in CANDIDATES:
+        if get_edges(c) is None:
+            TRACE_WAIT[c] = TRACE_WAIT.get(c, 0) + 1
+    for fuzzer in fuzzers:
+        candidates = [
+            test_case for c, test_case in CANDIDATES.items()
+            if c not in processed_checksum[fuzzer]
+        ]
+        selected, rejected = select_seeds(candidates,
+                                          evaluator.get_fuzzer_bitmap(fuzzer),
+                                          budget, get_edges)
+        forwarded[fuzzer] = []
+        for test_case in selected:
+            processed_checksum[fuzzer].add(test_case.checksum)
+            sync_test_case(target, fuzzer, host_root_dir, test_case)
+            forwarded[fuzzer].append(test_case.checksum)
+        for test_case in rejected:
+            processed_checksum[fuzzer].add(test_case.checksum)
+        metrics.inc('rcfuzz_sync_rejected_total', len(rejected), fuzzer=fuzzer)
+        logger.debug(f'sync {fuzzer}: {len(selected)} forwarded, '
+                     f'{len(rejected)} rejected, {len(candidates)} candidates')
+    # resolved for every fuzzer
+    done = [
+        c for c in CANDIDATES
+        if all(c in checksums for checksums in processed_checksum.values())
+    ]
+    for c in done:
+        del CANDIDATES[c]
+        TRACE_WAIT.pop(c, None)
+    return forwarded
+
+
+def sync2(target: str,
+          fuzzers: Fuzzers,
+          host_root_dir: Path,
+          mode='all',
+          budget=0) -> Dict[Fuzzer, List[str]]:
+    '''
+    mode all: every new seed goes to every fuzzer without it
+    mode coverage: see sync_coverage, at most budget seeds per fuzzer
+    return fuzzer => checksums of the seeds forwarded to it
+    '''
     global LAST_INDEX
     global WATCHERS
     # init observer
@@ -175,7 +319,7 @@ def sync2(target: str, fuzzers: Fuzzers, host_root_dir: Path):
             watcher.init_watcher(fuzzer, fuzzer_root_dir)
         # not ready
         if fuzzer not in watcher.WATCHERS:
-            return
+            return {}
 
         watchers = watcher.WATCHERS[fuzzer]
 
@@ -194,24 +338,58 @@ def sync2(target: str, fuzzers: Fuzzers, host_root_dir: Path):
                 if test_case.checksum not in global_processed_checksum:
                     global_new_test_cases.append(test_case)
                     global_processed_checksum.add(test_case.checksum)
-            LAST_INDEX[w] = queue_len
+            LAST_INDEX[w] = queue_len - 1
+
+    metrics.inc('rcfuzz_sync_new_test_cases_total',
+                len(global_new_test_cases))
 
     # 2. sync to each fuzzer
-    for fuzzer in fuzzers:
-        # handle new test cases only
-        for test_case in global_new_test_cases:
-            if test_case.checksum not in processed_checksum[fuzzer]:
-                processed_checksum[fuzzer].add(test_case.checksum)
-                # do sync!
-                sync_test_case(target, fuzzer, host_root_dir, test_case)
+    forwarded: Dict[Fuzzer, List[str]] = {}
+    if mode == 'coverage':
+        forwarded = sync_coverage(target, fuzzers, host_root_dir,
+                                  global_new_test_cases, budget)
+    else:
+        for fuzzer in fuzzers:
+            forwarded[fuzzer] = []
+            # handle new test cases only
+            for test_case in global_new_test_cases:
+                if test_case.checksum not in processed_checksum[fuzzer]:
+                    processed_checksum[fuzzer].add(test_case.checksum)
+                    # do sync!
+                    sync_test_case(target, fuzzer, host_root_dir, test_case)
+                    forwarded[fuzzer].append(test_case.checksum)
 
     del global_new_test_cases
     del new_test_cases
     # wait some file system writing, doesn't affect our symbolic link but for fuzzers
     time.sleep(0.1)
+    return forwarded
 
 
 def test():
+    bitmap = np.zeros(16, dtype=np.uint8)
+    bitmap[[0, 1]] = 1
+    edges = {
+        'a': np.array([0, 1], dtype=np.uint32),
+        'b': np.array([2, 3, 4], dtype=np.uint32),
+        'c': np.array([2, 3], dtype=np.uint32),
+        'd': np.array([5], dtype=np.uint32),
+    }
+    test_cases = []
+    for c in ['a', 'b', 'c', 'd', 'e']:
+        test_case = TestCase(Path(c))
+        test_case._TestCase__checksum = c
+        test_cases.append(test_case)
+    TRACE_WAIT['e'] = TRACE_WAIT_LIMIT
+    selected, rejected = select_seeds(test_cases, bitmap, 0, edges.get)
+    # c is covered by b once b is picked, e was never traced
+    assert [t.checksum for t in selected] == ['b', 'd', 'e']
+    assert [t.checksum for t in rejected] == ['a', 'c']
+    selected, rejected = select_seeds(test_cases, bitmap, 1, edges.get)
+    assert [t.checksum for t in selected] == ['b']
+    assert [t.checksum for t in rejected] == ['a']
+    TRACE_WAIT.clear()
+
     with open('/tmp/test_hash', 'w+') as f:
         f.write('a')
     hash_val = checksum('/tmp/test_hash')
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+'''
+span tracing of scheduler and evaluator phases
+
+spans are kept in a bounded ring buffer together with the id of the
+thread that recorded them and dumped as Chrome trace event JSON, which
+chrome://tracing and https://ui.perfetto.dev open directly
+
+enabled by PROFILE like the rest of the profiling output, a disabled
+span costs one attribute lookup
+'''
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from .common import IS_PROFILE
+
+logger = logging.getLogger('rcfuzz.tracing')
+
+ENABLED = IS_PROFILE
+
+# ~100 bytes per span, the oldest spans are dropped first
+RING_SIZE = 1 << 17
+
+# (name, start ns, duration ns, thread id, args)
+SPANS: Deque[Tuple[str, int, int, int, Dict[str, Any]]] = deque(
+    maxlen=RING_SIZE)
+
+# thread id => thread name, for the trace viewer
+THREAD_NAMES: Dict[int, str] = {}
+
+# every timestamp of a dump is relative to this
+EPOCH_NS = time.perf_counter_ns()
+
+NULL_SPAN = contextlib.nullcontext()
+
+
+def now() -> int:
+    return time.perf_counter_ns()
+
+
+def record(name, start_ns, end_ns, **args):
+    '''
+    add a finished span, for phases that do not fit a with block
+    '''
+    if not ENABLED:
+        return
+    tid = threading.get_native_id()
+    if tid not in THREAD_NAMES:
+        THREAD_NAMES[tid] = threading.current_thread().name
+    # NOTE: deque.append is atomic, no lock needed between threads
+    SPANS.append((name, start_ns, end_ns - start_ns, tid, args))
+
+
+@contextlib.contextmanager
+def _span(name, args):
+    start = now()
+    try:
+        yield
+    finally:
+        record(name, start, now(), **args)
+
+
+def span(name, **args):
+    '''
+    with span('do_sync', fuzzers=2): ...
+    '''
+    if not ENABLED:
+        return NULL_SPAN
+    return _span(name, args)
+
+
+def traced(name=None):
+    '''
+    decorator version of span, named after the function by default
+    '''
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _span(span_name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def chrome_trace() -> Dict:
+    pid = os.getpid()
+    events = []
+    for tid, thread_name in list(THREAD_NAMES.items()):
+        events.append({
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': pid,
+            'tid': tid,
+            'args': {
+                'name': thread_name
+            }
+        })
+    for name, start, duration, tid, args in list(SPANS):
+        events.append({
+            'name': name,
+            'ph': 'X',
+            'ts': (start - EPOCH_NS) / 1000,
+            'dur': duration / 1000,
+            'pid': pid,
+            'tid': tid,
+            'args': args
+        })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def dump(path):
+    '''
+    write the ring buffer to path, atomically since it is rewritten
+    periodically while the campaign runs
+    '''
+    if not ENABLED:
+        return
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(chrome_trace(), f, default=str)
+    os.replace(tmp_path, path)
+    logger.debug(f'dumped {len(SPANS)} spans to {path}')
+
+
+def reset():
+    SPANS.clear()
+    THREAD_NAMES.clear()
+
+
+def test():
+    import tempfile
+    global ENABLED
+    enabled = ENABLED
+    ENABLED = True
+    reset()
+
+    @traced()
+    def work(seconds):
+        time.sleep(seconds)
+
+    def worker():
+        with span('worker', i=1):
+            work(0.01)
+
+    try:
+        with span('outer'):
+            t = threading.Thread(target=worker, name='tracing-worker')
+            t.start()
+            work(0.02)
+            t.join()
+        start = now()
+        record('manual', start, start + 1000, files=3)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'trace.json')
+            dump(path)
+            with open(path) as f:
+                trace = json.load(f)
+        events = trace['traceEvents']
+        spans = {e['name']: e for e in events if e['ph'] == 'X'}
+        names = {e['args']['name'] for e in events if e['ph'] == 'M'}
+        assert len(events) == 5 + len(names)
+        assert 'tracing-worker' in names
+        assert spans['worker']['tid'] != spans['outer']['tid']
+        assert spans['worker']['args'] == {'i': 1}
+        assert spans['manual']['dur'] == 1
+        outer = spans['outer']
+        for e in spans.values():
+            if e['name'] == 'manual':
+                continue
+            assert outer['ts'] <= e['ts']
+            assert e['ts'] + e['dur'] <= outer['ts'] + outer['dur']
+        print('ok')
+    finally:
+        ENABLED = enabled
+        reset()
+
+
+if __name__ == '__main__':
+    test()
@@ -33,6 +33,10 @@ class WatcherException(Exception):
     pass
 
 
+# set whenever any watcher queues a new test case
+NEW_TEST_CASE = Event()
+
+
 class _NewTestCaseHandler(watchdog.events.FileSystemEventHandler):
     def __init__(
         self,
@@ -54,11 +58,93 @@ class _NewTestCaseHandler(watchdog.events.FileSystemEventHandler):
                     # logger.debug(f"Found new test case: {test_case_path}")
                     self._test_case_queue.append(test_case_path)
                     self._test_in_queue.notify()
+                    NEW_TEST_CASE.set()
+
+
+# re-check at least this often in case an event is missed, e.g. on file
+# systems without inotify
+WAIT_PATH_FALLBACK = 5
+
+
+class _PathEventHandler(watchdog.events.FileSystemEventHandler):
+    '''
+    wake up on events of path itself or of a missing directory on its way
+    from the watched directory
+    '''
+    def __init__(self, path: Path, watched: Path, changed: Event):
+        self._path = path
+        self._watched = watched
+        self._changed = changed
+
+    def on_any_event(self, event):
+        for event_path in (event.src_path, getattr(event, 'dest_path', '')):
+            if not event_path:
+                continue
+            event_path = Path(event_path)
+            if event_path == self._path or (event_path in self._path.parents
+                                            and self._watched
+                                            in event_path.parents):
+                self._changed.set()
+
+
+def _nearest_existing(path: Path) -> Path:
+    while not path.exists():
+        path = path.parent
+    return path
+
+
+def wait_until(ready, path, timeout: Optional[float] = None) -> bool:
+    '''
+    block until ready() holds, checked again whenever path, or a missing
+    directory on its way, is created, modified or moved
+    return False on timeout
+    '''
+    path = Path(path).absolute()
+    deadline = None if timeout is None else time.time() + timeout
+    changed = Event()
+    observer = Observer()
+    observer.daemon = True
+    observer.start()
+    watch = None
+    watched = None
+    try:
+        while True:
+            nearest = _nearest_existing(path.parent)
+            if nearest != watched:
+                if watch is not None:
+                    observer.unschedule(watch)
+                watch = observer.schedule(
+                    _PathEventHandler(path, nearest, changed), str(nearest))
+                watched = nearest
+            # NOTE: clear before checking, so no event gets lost
+            changed.clear()
+            if ready():
+                return True
+            if _nearest_existing(path.parent) != watched:
+                # a directory was created before it was watched
+                continue
+            wait = WAIT_PATH_FALLBACK
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            changed.wait(wait)
+    finally:
+        observer.stop()
+        observer.join()
+
+
+def wait_for_path(path, timeout: Optional[float] = None) -> bool:
+    '''
+    block until path exists, return False on timeout
+    '''
+    path = Path(path)
+    return wait_until(path.exists, path, timeout)
 
 
 class Watcher(ABC):
     QUEUE_POLL_TIMEOUT = 0.5  # Queue polling in seconds
-    WAIT_DIR_TIMEOUT = 0.5  # Directory waiting timeout in seconds
     FILE_READ_DELAY = 0.1  # Delay before reading a test case just created in seconds
 
     def __init__(self, target_directories: Iterable[Path]):
@@ -73,8 +159,7 @@ class Watcher(ABC):
     def _wait_for_dir(self, dir_path) -> None:
         # This is a helper function that can be used inside _manage_directories
         # to wait for a directory to be created.
-        while not dir_path.is_dir():
-            time.sleep(self.WAIT_DIR_TIMEOUT)
+        wait_until(dir_path.is_dir, dir_path)
 
     def _manage_directories(self) -> None:
         # When this function terminates, all the target directories should be
@@ -132,6 +217,7 @@ class Watcher(ABC):
             logger.debug("Scanning for existing test cases")
             self._scan_target_folders()
             self._test_in_queue.notify()
+            NEW_TEST_CASE.set()
 
         # _test_in_queue is released and the observer start queuing the paths
         # accumulated during initialization
@@ -396,6 +482,9 @@ watcher_lock = Lock()
 
 PROCESSED_DIR = set()
 
+# fuzzer => watched output directories, e.g. its afl-master and afl-slave
+OUTPUT_DIRS: Dict[Fuzzer, List[Path]] = {}
+
 
 def init_watcher(fuzzer: Fuzzer, fuzzer_output: Path) -> None:
     global WATCHERS, PROCESSED_DIR
@@ -413,6 +502,7 @@ def init_watcher(fuzzer: Fuzzer, fuzzer_output: Path) -> None:
         WATCHERS[fuzzer].append(w)
         w.start(daemon=True)
         PROCESSED_DIR.add(fuzzer_output)
+        OUTPUT_DIRS.setdefault(fuzzer, []).append(fuzzer_output)
 
 
 def parse_args(args=None):
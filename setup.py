@@ -24,7 +24,11 @@ setup(
     author_email="hyeonminmo@hanyang.ac.kr",
     install_requires=install_requires,
     entry_points={
-        'console_scripts': ['rcfuzz = rcfuzz.main:main'],
+        'console_scripts': [
+            'rcfuzz = rcfuzz.main:main',
+            'rcfuzz-campaign = rcfuzz.campaign:main',
+            'rcfuzz-coordinator = rcfuzz.distributed:main'
+        ],
     },
     package_data={'rcfuzz': ['aflforkserver.so']},
     python_requires=">=3.9.4",